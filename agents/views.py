@@ -2,7 +2,8 @@ from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
 from .models import AgentProfile, Team, Skill, ShiftType, ShiftTemplateActivity
 from django.shortcuts import render, redirect, get_object_or_404
-from calls.models import Queue
+from calls.models import Queue, ShrinkageRule, SpecialDay
+from calls.special_days import rerun_special_day
 from django.contrib import messages
 from django.db import transaction
 import json
@@ -10,6 +11,7 @@ from django.http import JsonResponse
 from .models import Department
 from django.core.paginator import Paginator
 from django.db.models import Q
+from django.utils.dateparse import parse_date
 
 @login_required
 def settings_view(request):
@@ -27,7 +29,12 @@ def settings_view(request):
         'teams': teams, 
         'skills': skills, 
         'queues': queues,
-        'shift_types': shift_types
+        'shift_types': shift_types,
+        'shrinkage_rules': ShrinkageRule.objects.select_related('team', 'queue'),
+        'weekdays': ShrinkageRule.WEEKDAYS,
+        'special_days': SpecialDay.objects.select_related('queue'),
+        'special_day_kinds': SpecialDay.KINDS,
+        'special_day_adjustments': SpecialDay.ADJUSTMENTS,
     })
 
 # Simple Create Actions
@@ -53,11 +60,108 @@ def create_skill(request):
 def create_queue(request):
     if request.method == 'POST':
         name = request.POST.get('name')
+        staffing_model = request.POST.get('staffing_model', 'erlang_c')
+        patience = request.POST.get('avg_patience_seconds')
+        interval = request.POST.get('interval_minutes', '15')
+        sla_seconds = request.POST.get('sla_target_seconds')
+        sla_percent = request.POST.get('sla_target_percent')
+        channel = request.POST.get('channel', 'voice')
+        concurrency = request.POST.get('concurrency')
         if name:
-            Queue.objects.create(name=name)
+            Queue.objects.create(
+                name=name,
+                staffing_model=staffing_model if staffing_model in dict(Queue.STAFFING_MODELS) else 'erlang_c',
+                avg_patience_seconds=int(patience) if patience and patience.isdigit() else 120,
+                interval_minutes=int(interval) if interval in ('15', '30', '60') else 15,
+                sla_target_seconds=int(sla_seconds) if sla_seconds and sla_seconds.isdigit() else 20,
+                sla_target_percent=float(sla_percent) / 100 if sla_percent and sla_percent.isdigit() else 0.80,
+                channel=channel if channel in dict(Queue.CHANNELS) else 'voice',
+                concurrency=max(int(concurrency), 1) if concurrency and concurrency.isdigit() else 1
+            )
             messages.success(request, f"Kuyruk '{name}' oluşturuldu.")
     return redirect('settings')
 
+def _row_id(model, value):
+    """(id, valid) for an optional select value: empty means none, anything else must be an existing row."""
+    if not value:
+        return None, True
+    if value.isdigit() and model.objects.filter(pk=int(value)).exists():
+        return int(value), True
+    return None, False
+
+def _weekday(value):
+    return int(value) if value and value.isdigit() and int(value) < 7 else None
+
+@login_required
+def create_shrinkage_rule(request):
+    if request.method == 'POST':
+        def pct(field):
+            value = request.POST.get(field, '')
+            return min(float(value), 90) / 100 if value.replace('.', '', 1).isdigit() else 0.0
+
+        team_id, team_ok = _row_id(Team, request.POST.get('team'))
+        queue_id, queue_ok = _row_id(Queue, request.POST.get('queue'))
+        if not (team_ok and queue_ok):
+            messages.error(request, "Geçersiz ekip veya kuyruk seçimi.")
+            return redirect('settings')
+        ShrinkageRule.objects.create(
+            name=request.POST.get('name', ''),
+            team_id=team_id,
+            queue_id=queue_id,
+            weekday=_weekday(request.POST.get('weekday')),
+            start_time=request.POST.get('start_time') or None,
+            end_time=request.POST.get('end_time') or None,
+            planned_percent=pct('planned_percent'),
+            unplanned_percent=pct('unplanned_percent'),
+        )
+        messages.success(request, "Kayıp oranı kuralı eklendi.")
+    return redirect('settings')
+
+@login_required
+def create_special_day(request):
+    if request.method == 'POST':
+        start_date = parse_date(request.POST.get('start_date', ''))
+        end_date = parse_date(request.POST.get('end_date', '')) or start_date
+        if not start_date or end_date < start_date:
+            messages.error(request, "Geçerli bir tarih aralığı girin.")
+            return redirect('settings')
+        kind = request.POST.get('kind') or 'holiday'
+        adjustment = request.POST.get('adjustment') or SpecialDay.ADJUST_MULTIPLY
+        if kind not in dict(SpecialDay.KINDS) or adjustment not in dict(SpecialDay.ADJUSTMENTS):
+            messages.error(request, "Geçersiz gün türü veya düzeltme yöntemi.")
+            return redirect('settings')
+        queue_id, queue_ok = _row_id(Queue, request.POST.get('queue'))
+        if not queue_ok:
+            messages.error(request, "Geçersiz kuyruk seçimi.")
+            return redirect('settings')
+        try:
+            factor = max(float(request.POST.get('factor') or 1), 0.0)
+        except ValueError:
+            factor = 1.0
+        day = SpecialDay.objects.create(
+            name=request.POST.get('name', ''),
+            kind=kind,
+            start_date=start_date,
+            end_date=end_date,
+            queue_id=queue_id,
+            adjustment=adjustment,
+            factor=factor,
+            like_weekday=_weekday(request.POST.get('like_weekday')),
+            exclude_from_history=bool(request.POST.get('exclude_from_history')),
+        )
+        rewritten = rerun_special_day(day)
+        messages.success(request, f"Özel gün eklendi. {len(rewritten)} günün tahmini güncellendi.")
+    return redirect('settings')
+
+@login_required
+def delete_special_day(request, pk):
+    if request.method == 'POST':
+        day = get_object_or_404(SpecialDay, pk=pk)
+        day.delete()
+        rewritten = rerun_special_day(day)
+        messages.success(request, f"Özel gün silindi. {len(rewritten)} günün tahmini güncellendi.")
+    return redirect('settings')
+
 @login_required
 def create_shift_type(request):
     if request.method == 'POST':
@@ -0,0 +1,236 @@
+"""
+Interval aggregation of raw Call rows into actual CallVolume.
+
+One grouped query counts calls per queue on the stored local call_date /
+call_interval columns of Call (no per-row time zone conversion). The buckets are streamed
+through the shared CallVolume writer (calls.volumes), which merges them on
+the unique key and removes actual rows whose bucket no longer has any
+calls. Nothing is looped per interval in Python, memory is bounded by the
+write batch and history outside the requested range is left alone.
+
+aggregate_dirty() is the incremental path: it re-aggregates only buckets
+marked in DirtyInterval (Call saves, see calls.signals) plus the buckets of
+calls inserted past the AggregationWatermark, through recount_buckets(),
+which calls.streaming also flushes with. Deleting calls is not
+tracked; run a full rebuild afterwards. Both paths refresh the hour / day /
+week rollups (calls.rollups) of what they wrote.
+"""
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Avg, Count, Max, Min, Q
+from django.utils import timezone
+
+from .models import AggregationWatermark, Call, CallVolume, DirtyInterval, PartitionArchive
+from .rollups import refresh_rollups
+from .volumes import replace_volumes, upsert_volumes
+
+BUCKET_MINUTES = Call.BUCKET_MINUTES
+WRITE_BATCH_SIZE = 2000
+WATERMARK = 'actuals'
+
+
+def _day_start(d):
+    return timezone.make_aware(datetime.combine(d, time.min))
+
+
+def _calls_in_range(start_date, end_date):
+    # Plain timestamp bounds so the database can use an index
+    calls = Call.objects.filter(queue__isnull=False)
+    if start_date:
+        calls = calls.filter(timestamp__gte=_day_start(start_date))
+    if end_date:
+        calls = calls.filter(timestamp__lt=_day_start(end_date + timedelta(days=1)))
+    return calls
+
+
+FILL_BATCH_SIZE = 50000
+_FILL_SQL = (
+    "UPDATE {table} SET call_date = (timestamp AT TIME ZONE %(tz)s)::date, "
+    "call_interval = (date_trunc('hour', timestamp AT TIME ZONE %(tz)s) + "
+    "floor(extract(minute FROM timestamp AT TIME ZONE %(tz)s) / %(minutes)s) * %(minutes)s * interval '1 minute')::time "
+    "WHERE id >= %(lo)s AND id < %(hi)s AND (call_date IS NULL OR call_interval IS NULL)"
+)
+
+
+def fill_call_buckets(batch_size=FILL_BATCH_SIZE, table=None, progress=None, calls=None):
+    """
+    Backfills Call.call_date / call_interval where they are empty, one id
+    range of batch_size per transaction. `calls` (a Call queryset) limits
+    the id range to its empty rows. Returns the rows updated.
+    """
+    table = connection.ops.quote_name(table or Call._meta.db_table)
+    with connection.cursor() as cursor:
+        if calls is not None:
+            span = calls.filter(Q(call_date__isnull=True) | Q(call_interval__isnull=True)).aggregate(
+                lo=Min('id'), high=Max('id'))
+            lo, high = span['lo'], span['high']
+        else:
+            cursor.execute(f'SELECT MIN(id), MAX(id) FROM {table} WHERE call_date IS NULL OR call_interval IS NULL')
+            lo, high = cursor.fetchone()
+        updated = 0
+        while lo is not None and lo <= high:
+            with transaction.atomic():
+                cursor.execute(_FILL_SQL.format(table=table), {
+                    'tz': settings.TIME_ZONE, 'minutes': BUCKET_MINUTES, 'lo': lo, 'hi': lo + batch_size})
+                updated += cursor.rowcount
+            lo += batch_size
+            if progress:
+                progress(updated)
+    return updated
+
+
+def interval_buckets(calls):
+    """
+    Grouped (queue, call_date, call_interval) counts and mean duration for
+    a Call queryset, evaluated as a single SQL statement. Rows without a
+    bucket are left out; the aggregation paths backfill them first.
+    """
+    return (
+        calls.filter(call_date__isnull=False, call_interval__isnull=False)
+        .values('queue_id', 'call_date', 'call_interval')
+        .annotate(calls=Count('id'), aht=Avg('duration'))
+        .order_by()
+    )
+
+
+def call_bucket(queue_id, timestamp):
+    """(queue_id, date, interval_start) a call is counted in, or None."""
+    if not queue_id or not timestamp:
+        return None
+    if timezone.is_naive(timestamp):
+        timestamp = timezone.make_aware(timestamp)
+    local = timezone.localtime(timestamp)
+    return queue_id, local.date(), time(local.hour, local.minute - local.minute % BUCKET_MINUTES)
+
+
+def mark_dirty(buckets):
+    """Flags (queue_id, date, interval_start) buckets for the next incremental run."""
+    rows = [DirtyInterval(queue_id=q, date=d, interval_start=t) for q, d, t in set(filter(None, buckets))]
+    for i in range(0, len(rows), WRITE_BATCH_SIZE):
+        # Re-marking bumps marked_at so a run already in progress keeps the row
+        DirtyInterval.objects.bulk_create(
+            rows[i:i + WRITE_BATCH_SIZE],
+            update_conflicts=True,
+            unique_fields=['queue', 'date', 'interval_start'],
+            update_fields=['marked_at'],
+        )
+
+
+def _volume_rows(buckets, keep=None):
+    """(queue_id, date, interval_start, calls, aht) writer rows from interval_buckets()."""
+    for b in buckets:
+        key = (b['queue_id'], b['call_date'], b['call_interval'])
+        if keep is None or key in keep:
+            yield key + (b['calls'], int(b['aht'] or 0))
+
+
+def aggregate_calls(start_date=None, end_date=None):
+    """
+    Rebuilds actual CallVolume for the date range (None = unbounded) from
+    Call. Returns the number of buckets, the rows inserted or changed and
+    the stale rows deleted.
+    """
+    with transaction.atomic():
+        calls = _calls_in_range(start_date, end_date)
+        # Rows from bulk inserts / raw SQL may not carry their bucket yet
+        fill_call_buckets(calls=calls)
+        rows = _volume_rows(interval_buckets(calls).iterator())
+        result = replace_volumes(rows, False, start_date, end_date)
+        refresh_rollups(start_date, end_date)
+
+    return {'buckets': result['rows'], 'changed': result['changed'], 'deleted': result['deleted']}
+
+
+def rebuild_all():
+    """
+    Full rebuild of all actuals; resets the dirty set and the watermark.
+    Months whose calls were archived (calls.partitions) keep their actuals.
+    """
+    with transaction.atomic():
+        high_water = Call.objects.aggregate(m=Max('id'))['m'] or 0
+        archived_until = PartitionArchive.objects.filter(table_name=Call._meta.db_table).aggregate(
+            m=Max('range_end'))['m']
+        result = aggregate_calls(timezone.localtime(archived_until).date() if archived_until else None)
+        DirtyInterval.objects.all().delete()
+        AggregationWatermark.objects.update_or_create(name=WATERMARK, defaults={'last_call_id': high_water})
+    return dict(result, touched=result['buckets'], start_date=None, end_date=None)
+
+
+def recount_buckets(keys):
+    """
+    Rewrites the actual CallVolume of the (queue_id, date, interval_start)
+    buckets exactly from Call, with one grouped query over their queue-days,
+    removes the rows of buckets left without any call and refreshes their
+    rollups. Returns the buckets written and the rows deleted.
+    """
+    keys = set(keys)
+    if not keys:
+        return 0, 0
+    with transaction.atomic():
+        # One grouped query over the queue-days, then keep just the buckets
+        queues_by_day = {}
+        for q, d, _ in keys:
+            queues_by_day.setdefault(d, set()).add(q)
+        days = Q()
+        for d, queue_ids in queues_by_day.items():
+            days |= Q(timestamp__gte=_day_start(d), timestamp__lt=_day_start(d + timedelta(days=1)),
+                      queue_id__in=queue_ids)
+        calls = Call.objects.filter(days)
+        fill_call_buckets(calls=calls)
+        rows = list(_volume_rows(interval_buckets(calls), keep=keys))
+
+        # Buckets left without any call lose their row
+        emptied = keys - {r[:3] for r in rows}
+        stale_ids = []
+        if emptied:
+            existing = CallVolume.objects.filter(
+                is_forecast=False, date__in={d for _, d, _ in emptied}, queue_id__in={q for q, _, _ in emptied})
+            stale_ids = [pk for pk, q, d, t in existing.values_list('id', 'queue_id', 'date', 'interval_start')
+                         if (q, d, t) in emptied]
+
+        upsert_volumes(rows, False)
+        CallVolume.objects.filter(id__in=stale_ids).delete()
+        refresh_rollups(min(queues_by_day), max(queues_by_day), {q for q, _, _ in keys})
+    return len(rows), len(stale_ids)
+
+
+def aggregate_dirty():
+    """
+    Incremental actuals: re-aggregates the dirty buckets and the buckets of
+    calls inserted since the watermark, then advances the watermark. The
+    first run (no watermark yet) rebuilds everything. Returns the touched
+    buckets, written / deleted row counts and the affected date span.
+    """
+    with transaction.atomic():
+        watermark = AggregationWatermark.objects.select_for_update().filter(name=WATERMARK).first()
+        high_water = Call.objects.aggregate(m=Max('id'))['m'] or 0
+
+        if watermark is None:
+            return rebuild_all()
+
+        dirty = list(DirtyInterval.objects.values_list('id', 'queue_id', 'date', 'interval_start', 'marked_at'))
+        keys = {(q, d, t) for _, q, d, t, _ in dirty}
+        # Inserts that bypassed the signal (bulk_create, raw SQL)
+        new_calls = Call.objects.filter(id__gt=watermark.last_call_id, id__lte=high_water, queue__isnull=False)
+        fill_call_buckets(calls=new_calls)
+        keys |= {r[:3] for r in _volume_rows(interval_buckets(new_calls))}
+
+        written, deleted = recount_buckets(keys)
+
+        if dirty:
+            # Rows re-marked while this run was going stay for the next one
+            snapshot = max(m for *_, m in dirty)
+            DirtyInterval.objects.filter(id__in=[pk for pk, *_ in dirty], marked_at__lte=snapshot).delete()
+        watermark.last_call_id = high_water
+        watermark.save()
+
+    dates = [d for _, d, _ in keys]
+    return {
+        'touched': len(keys),
+        'buckets': written,
+        'deleted': deleted,
+        'start_date': min(dates) if dates else None,
+        'end_date': max(dates) if dates else None,
+    }
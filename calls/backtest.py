@@ -0,0 +1,199 @@
+"""
+Rolling-origin backtests of the forecast models.
+
+The actual CallVolume history is cut at several origins (the last one a
+horizon before the newest actuals, the others step_days earlier each).
+Every model forecasts the horizon after each origin from the history up to
+it, and the forecast is compared interval by interval with the actuals:
+
+- WAPE: sum |forecast - actual| / sum actual
+- bias: sum (forecast - actual) / sum actual (positive = over-forecast)
+- MAPE: mean |forecast - actual| / actual over intervals with calls
+
+Intervals missing on one side count as 0 calls. Each (model, fold) pair is
+an independent job run in a process pool (serially inside daemon processes
+such as Celery workers); a job records its forecast wall time and its peak
+resident memory growth, sampled from /proc by a background thread
+(tracemalloc would slow the Holt-Winters recursion down several-fold and
+distort the timing). Holt-Winters is refitted in every fold, never read
+from ForecastFit.
+"""
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from django.utils import timezone
+
+from . import forecasting
+
+DEFAULT_FOLDS = 4
+DEFAULT_HORIZON_DAYS = 7
+# A fold needs at least one full week of training history
+MIN_TRAIN_DAYS = 7
+MEMORY_SAMPLE_SECONDS = 0.005
+
+KEYS = ['queue_id', 'date', 'slot']
+METRIC_COLUMNS = ['mape', 'wape', 'bias', 'actual', 'forecast', 'intervals']
+
+
+def fold_origins(history, folds=DEFAULT_FOLDS, horizon_days=DEFAULT_HORIZON_DAYS, step_days=None):
+    """
+    Last training day of each fold, oldest first. Origins leaving less than
+    MIN_TRAIN_DAYS of history are skipped.
+    """
+    if history.empty:
+        return []
+    step = pd.Timedelta(days=step_days or horizon_days)
+    last, first = history['date'].max(), history['date'].min()
+    origins = [last - pd.Timedelta(days=horizon_days) - i * step for i in range(folds)]
+    return sorted(o for o in origins if (o - first).days + 1 >= MIN_TRAIN_DAYS)
+
+
+def _rss():
+    """Resident set size of this process in bytes (0 where /proc is missing)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return 0
+
+
+class PeakMemory:
+    """Context manager sampling the peak RSS growth of the block into .peak (bytes)."""
+
+    def __enter__(self):
+        self.baseline = self.peak_rss = _rss()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def _sample(self):
+        while not self._stop.wait(MEMORY_SAMPLE_SECONDS):
+            self.peak_rss = max(self.peak_rss, _rss())
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_rss = max(self.peak_rss, _rss())
+        self.peak = self.peak_rss - self.baseline
+
+
+def _fold_job(args):
+    model_type, train, actual, start, end = args
+    with PeakMemory() as memory:
+        started = time.perf_counter()
+        forecast = forecasting.forecast_intervals(train, start, end, model_type, workers=1, use_cache=False)
+        seconds = time.perf_counter() - started
+    peak = memory.peak
+
+    forecast = forecast.assign(date=pd.to_datetime(forecast['date']))
+    pairs = actual[KEYS + ['calls']].merge(
+        forecast[KEYS + ['calls']], on=KEYS, how='outer', suffixes=('_actual', '_forecast'))
+    pairs = pairs.rename(columns={'calls_actual': 'actual', 'calls_forecast': 'forecast'})
+    pairs[['actual', 'forecast']] = pairs[['actual', 'forecast']].astype(float).fillna(0.0)
+    return model_type, pairs, seconds, peak
+
+
+def error_metrics(pairs, keys=None):
+    """
+    MAPE / WAPE / bias (with actual and forecast totals and the interval
+    count) of a pairs frame, overall or per `keys` group.
+    """
+    err = pairs['forecast'] - pairs['actual']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ape = np.where(pairs['actual'] > 0, err.abs() / pairs['actual'], np.nan)
+    frame = pairs.assign(abs_err=err.abs(), err=err, ape=ape)
+    grouped = frame.groupby(keys) if keys else frame.groupby(lambda _: 0)
+    sums = grouped[['abs_err', 'err', 'actual', 'forecast']].sum()
+    total = sums['actual'].where(sums['actual'] > 0)
+    out = pd.DataFrame({
+        'mape': grouped['ape'].mean(),
+        'wape': sums['abs_err'] / total,
+        'bias': sums['err'] / total,
+        'actual': sums['actual'],
+        'forecast': sums['forecast'],
+        'intervals': grouped.size(),
+    })[METRIC_COLUMNS]
+    return out if keys else out.iloc[0]
+
+
+def run_backtest(models=forecasting.MODELS, folds=DEFAULT_FOLDS, horizon_days=DEFAULT_HORIZON_DAYS,
+                 step_days=None, queue_ids=None, workers=None, history=None):
+    """
+    Backtests `models` over the tenant's actuals. Returns
+    {'origins': [...], 'history_end': date, 'models': {model_type: result}}
+    where each result has the overall metrics, 'seconds' (summed over
+    folds), 'peak_memory_mb' (largest fold), and 'by_queue' /
+    'by_interval' (15-min slot of day) metric frames.
+    """
+    if history is None:
+        history = forecasting.load_history(queue_ids)
+    origins = fold_origins(history, folds, horizon_days, step_days)
+    jobs = []
+    for origin in origins:
+        start, end = origin + pd.Timedelta(days=1), origin + pd.Timedelta(days=horizon_days)
+        train = history[history['date'] <= origin]
+        actual = history[(history['date'] >= start) & (history['date'] <= end)]
+        jobs += [(model_type, train, actual, start.date(), end.date()) for model_type in models]
+
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers > 1 and not multiprocessing.current_process().daemon:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            done = list(pool.map(_fold_job, jobs))
+    else:
+        done = [_fold_job(job) for job in jobs]
+
+    results = {}
+    for model_type in models:
+        runs = [r for r in done if r[0] == model_type]
+        if not runs:
+            continue
+        pairs = pd.concat([r[1] for r in runs], ignore_index=True)
+        results[model_type] = {
+            **error_metrics(pairs).to_dict(),
+            'folds': len(runs),
+            'seconds': sum(r[2] for r in runs),
+            'peak_memory_mb': max(r[3] for r in runs) / 2 ** 20,
+            'by_queue': error_metrics(pairs, ['queue_id']),
+            'by_interval': error_metrics(pairs, ['slot']),
+        }
+    return {
+        'origins': [o.date() for o in origins],
+        'history_end': history['date'].max().date() if not history.empty else None,
+        'horizon_days': horizon_days,
+        'models': results,
+    }
+
+
+def _json_frame(frame, key_format=str):
+    """Metric frame -> {key: {metric: value}} with NaN as None."""
+    frame = frame.astype(object).where(frame.notna(), None)
+    return {key_format(k): row for k, row in frame.to_dict(orient='index').items()}
+
+
+def _nan_none(value):
+    return None if value is None or np.isnan(value) else float(value)
+
+
+def save_backtest(report, label=''):
+    """Stores a run_backtest() report as ForecastBacktest rows (one per model)."""
+    from .models import ForecastBacktest
+
+    run_at = timezone.now()
+    times = forecasting.slot_time(range(forecasting.SLOTS_PER_DAY))
+    return ForecastBacktest.objects.bulk_create([
+        ForecastBacktest(
+            label=label, run_at=run_at, model_type=model_type, folds=result['folds'],
+            horizon_days=report['horizon_days'], history_end=report['history_end'],
+            mape=_nan_none(result['mape']), wape=_nan_none(result['wape']), bias=_nan_none(result['bias']),
+            seconds=result['seconds'], peak_memory_mb=result['peak_memory_mb'],
+            by_queue=_json_frame(result['by_queue']),
+            by_interval=_json_frame(result['by_interval'], lambda s: times[int(s)].strftime('%H:%M')),
+        )
+        for model_type, result in report['models'].items()
+    ])
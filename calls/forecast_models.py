@@ -0,0 +1,165 @@
+"""
+Series forecasting models on a queue's dense 15-min call history.
+
+A series is a (days, 96) array of calls for consecutive days; missing
+intervals are zero. Seasonal phases are anchored on the calendar (slot of
+the day, weekday * 96 + slot of the week), so a fitted state can forecast
+any later date without knowing where the series started.
+
+- seasonal_naive: each interval repeats the latest day in history with the
+  same weekday (the latest day at all when that weekday is missing).
+- Holt-Winters: additive double-seasonal exponential smoothing (Taylor) with
+  a damped trend, an intraday (96) and a weekly (672) seasonal cycle. The
+  smoothing parameters are chosen by a grid search whose candidates all run
+  through the recursion together as NumPy vectors, so fitting a queue is a
+  single pass over its history.
+- Top-down: daily totals are forecast (an exponentially weighted,
+  weekday-adjusted level times a weekday index) and spread over the day
+  with normalized intraday profiles per weekday. These two work on all
+  queues at once: (queues, days) and (queues, 7, 96) arrays.
+
+Functions here take and return plain arrays / dicts so they can run in
+worker processes.
+"""
+import itertools
+
+import numpy as np
+
+SLOTS_PER_DAY = 96
+SLOTS_PER_WEEK = 7 * SLOTS_PER_DAY
+DAMPING = 0.98
+# Smoothing grid: level, trend, intraday season, weekly season
+GRID = {
+    'alpha': (0.01, 0.05, 0.1, 0.2, 0.4),
+    'beta': (0.0, 0.01),
+    'gamma': (0.05, 0.1, 0.2, 0.4),
+    'omega': (0.05, 0.1, 0.2, 0.4),
+}
+# Holt-Winters needs a week to initialize and another to fit on
+MIN_FIT_DAYS = 14
+# Top-down: smoothing of the daily level, and the calls a weekday's own
+# intraday shape needs before it outweighs the queue's whole-week shape
+DAILY_ALPHA = 0.3
+PROFILE_PRIOR_CALLS = 200
+
+
+def _week_phase(weekdays, slots):
+    return np.asarray(weekdays) * SLOTS_PER_DAY + np.asarray(slots)
+
+
+def seasonal_naive(series, first_weekday, target_weekdays):
+    """Forecast (targets, 96) for the given target weekdays."""
+    days = len(series)
+    weekdays = (first_weekday + np.arange(days)) % 7
+    latest = np.full(7, days - 1)
+    for wd in range(7):
+        hits = np.nonzero(weekdays == wd)[0]
+        if len(hits):
+            latest[wd] = hits[-1]
+    return series[latest[np.asarray(target_weekdays)]]
+
+
+def fit_holt_winters(series, first_weekday, grid=GRID):
+    """
+    Grid-fits the smoothing parameters on one-step-ahead squared error and
+    returns the chosen parameters with the final state
+    (level, trend, intraday[96], weekly[672]).
+    """
+    y = np.asarray(series, dtype=float).ravel()
+    steps = len(y)
+    weekly_phase = _week_phase((first_weekday + np.arange(steps) // SLOTS_PER_DAY) % 7,
+                               np.arange(steps) % SLOTS_PER_DAY)
+
+    # Initial state from the first week
+    first = y[:SLOTS_PER_WEEK]
+    level0 = first.mean()
+    intraday0 = first.reshape(7, SLOTS_PER_DAY).mean(axis=0) - level0
+    weekly0 = np.zeros(SLOTS_PER_WEEK)
+    weekly0[weekly_phase[:SLOTS_PER_WEEK]] = first - level0 - np.tile(intraday0, 7)
+
+    candidates = np.array(list(itertools.product(*grid.values())))
+    alpha, beta, gamma, omega = candidates.T
+    k = len(candidates)
+    level, trend = np.full(k, level0), np.zeros(k)
+    intraday = np.tile(intraday0, (k, 1))
+    weekly = np.tile(weekly0, (k, 1))
+    sse = np.zeros(k)
+
+    for t in range(SLOTS_PER_WEEK, steps):
+        p1, p2, obs = t % SLOTS_PER_DAY, weekly_phase[t], y[t]
+        s1, s2 = intraday[:, p1], weekly[:, p2]
+        err = obs - (level + DAMPING * trend + s1 + s2)
+        sse += err * err
+        new_level = alpha * (obs - s1 - s2) + (1 - alpha) * (level + DAMPING * trend)
+        trend = beta * (new_level - level) + (1 - beta) * DAMPING * trend
+        intraday[:, p1] = gamma * (obs - new_level - s2) + (1 - gamma) * s1
+        weekly[:, p2] = omega * (obs - new_level - s1) + (1 - omega) * s2
+        level = new_level
+
+    best = int(np.argmin(sse))
+    return {
+        'params': dict(zip(grid.keys(), (float(v) for v in candidates[best]))),
+        'level': float(level[best]),
+        'trend': float(trend[best]),
+        'intraday': intraday[best].tolist(),
+        'weekly': weekly[best].tolist(),
+        'rmse': float(np.sqrt(sse[best] / max(steps - SLOTS_PER_WEEK, 1))),
+    }
+
+
+def holt_winters_forecast(fit, steps_ahead, weekdays, slots):
+    """
+    Forecast for target intervals `steps_ahead` steps after the last fitted
+    interval, on the given weekdays / slots (equal-length arrays).
+    """
+    h = np.asarray(steps_ahead, dtype=float)
+    damped = DAMPING * (1 - DAMPING ** h) / (1 - DAMPING)
+    forecast = (fit['level'] + damped * fit['trend'] + np.asarray(fit['intraday'])[np.asarray(slots)]
+                + np.asarray(fit['weekly'])[_week_phase(weekdays, slots)])
+    return np.clip(forecast, 0.0, None)
+
+
+def intraday_profiles(calls, prior_calls=PROFILE_PRIOR_CALLS):
+    """
+    Normalized (queues, 7, 96) intraday shares from history summed per
+    queue / weekday / slot. A weekday with little volume is shrunk towards
+    the queue's whole-week profile, which keeps small queues from following
+    noise.
+    """
+    calls = np.asarray(calls, dtype=float)
+    week = calls.sum(axis=1, keepdims=True)
+    week_share = week / np.maximum(week.sum(axis=2, keepdims=True), 1e-9)
+    volume = calls.sum(axis=2, keepdims=True)
+    day_share = calls / np.maximum(volume, 1e-9)
+    weight = volume / (volume + prior_calls)
+    return weight * day_share + (1 - weight) * week_share
+
+
+def daily_totals_forecast(totals, observed, weekdays, target_weekdays, alpha=DAILY_ALPHA):
+    """
+    Daily call forecasts (queues, targets) from daily totals (queues, days).
+    observed masks the days inside each queue's history and weekdays gives
+    the weekday of every column. The forecast is the weekday index times an
+    exponentially weighted level of the weekday-adjusted non-zero totals.
+    Days without a single call (missing data, holidays left out of the
+    history) are skipped by both; a weekday observed only at zero gets
+    index 0, one never observed index 1.
+    """
+    totals = np.asarray(totals, dtype=float)
+    observed = np.asarray(observed, dtype=bool)
+    days = totals.shape[1]
+    onehot = (np.asarray(weekdays)[:, None] == np.arange(7)).astype(float)
+    nonzero = (observed & (totals > 0)).astype(float)
+    count = nonzero @ onehot
+    overall = (totals * nonzero).sum(axis=1) / np.maximum(nonzero.sum(axis=1), 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        index = np.where((count > 0) & (overall[:, None] > 0),
+                         ((totals * nonzero) @ onehot) / np.maximum(count, 1) / overall[:, None],
+                         np.where(observed.astype(float) @ onehot > 0, 0.0, 1.0))
+
+    day_index = index[:, weekdays]
+    usable = observed & (day_index > 0) & (totals > 0)
+    weights = np.where(usable, (1 - alpha) ** (days - 1 - np.arange(days)), 0.0)
+    adjusted = totals / np.where(day_index > 0, day_index, 1.0)
+    level = (weights * adjusted).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-12)
+    return level[:, None] * index[:, np.asarray(target_weekdays)]
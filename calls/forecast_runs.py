@@ -0,0 +1,154 @@
+"""
+Versioned forecast runs.
+
+Every forecast is stored as a ForecastRun keyed by a hash of the model, its
+parameters, the special-day calendar, the actuals watermark and the date
+range. Generating a forecast
+whose hash already exists does not recompute anything: an active run is
+left as it is, an older one is written back to CallVolume from its stored
+intervals. The last KEEP_RUNS inactive runs are kept so planners can switch
+between versions.
+
+The actuals watermark is a fingerprint of all actual CallVolume (row count,
+call and handle-time sums, a position-weighted call sum and the date span),
+computed in one aggregate query, so any write to the actuals - batch
+aggregation, streaming, rebuilds - yields a new hash.
+"""
+import hashlib
+import json
+
+import numpy as np
+import pandas as pd
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import forecast_models, forecasting, special_days
+from .models import CallVolume, ForecastRun
+from .requirements import refresh_staffing_requirements
+from .rollups import refresh_rollups
+from .volumes import replace_volumes
+
+KEEP_RUNS = 10
+# Bump when a model changes its output for the same inputs
+ENGINE_VERSION = 1
+
+CREATED = 'created'
+RESTORED = 'restored'
+CURRENT = 'current'
+
+
+def model_params(model_type):
+    """The parameters a model's output depends on."""
+    params = {'engine': ENGINE_VERSION, 'model_type': model_type}
+    if model_type == forecasting.MODEL_WEIGHTED_AVG:
+        params['weights'] = forecasting.RECENCY_WEIGHTS.tolist()
+    elif model_type == forecasting.MODEL_HOLT_WINTERS:
+        params.update(grid=forecast_models.GRID, damping=forecast_models.DAMPING,
+                      fit_days=forecasting.FIT_HISTORY_DAYS, min_fit_days=forecast_models.MIN_FIT_DAYS)
+    elif model_type == forecasting.MODEL_TOP_DOWN:
+        params.update(alpha=forecast_models.DAILY_ALPHA, prior_calls=forecast_models.PROFILE_PRIOR_CALLS,
+                      fit_days=forecasting.FIT_HISTORY_DAYS)
+    return params
+
+
+def actuals_key():
+    """Fingerprint (md5 hex) of the actual CallVolume rows."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT COUNT(*), COALESCE(SUM(calls_offered), 0), "
+            f"COALESCE(SUM(calls_offered::bigint * aht_seconds), 0), "
+            f"COALESCE(SUM(calls_offered::bigint * ((date - DATE '2000-01-01') * 96 "
+            f"+ EXTRACT(HOUR FROM interval_start) * 4 + EXTRACT(MINUTE FROM interval_start) / 15)), 0), "
+            f"MIN(date), MAX(date) FROM {CallVolume._meta.db_table} WHERE NOT is_forecast"
+        )
+        return hashlib.md5(repr(cursor.fetchone()).encode()).hexdigest()
+
+
+def input_hash(model_type, params, actuals, start_date, end_date):
+    payload = json.dumps([model_type, params, actuals, str(start_date), str(end_date)], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def pack_intervals(forecast, start_date):
+    """forecast_intervals() frame -> column-wise dict of ints (day = offset from start_date)."""
+    days = (pd.to_datetime(forecast['date']) - pd.Timestamp(start_date)).dt.days
+    return {
+        'queue_id': forecast['queue_id'].astype(int).tolist(),
+        'day': days.astype(int).tolist(),
+        'slot': forecast['slot'].astype(int).tolist(),
+        'calls': np.rint(forecast['calls'].to_numpy(dtype=float)).astype(int).tolist(),
+        'aht': np.rint(forecast['aht'].to_numpy(dtype=float)).astype(int).tolist(),
+    }
+
+
+def run_rows(run):
+    """(queue_id, date, interval_start, calls, aht) writer rows of a run, generated lazily."""
+    data = run.intervals
+    dates = pd.date_range(run.start_date, run.end_date).date
+    times = forecasting.slot_time(range(forecasting.SLOTS_PER_DAY))
+    return (
+        (q, dates[d], times[s], c, a)
+        for q, d, s, c, a in zip(data['queue_id'], data['day'], data['slot'], data['calls'], data['aht'])
+    )
+
+
+def apply_run(run):
+    """
+    Merges the run's forecast into CallVolume (calls.volumes) and makes it
+    the active run for its range. Returns the rows inserted or changed.
+    """
+    with transaction.atomic():
+        result = replace_volumes(run_rows(run), True, run.start_date, run.end_date)
+        refresh_rollups(run.start_date, run.end_date)
+        refresh_staffing_requirements(run.start_date, run.end_date, is_forecast=True)
+        deactivate_runs(run.start_date, run.end_date, exclude=run.pk)
+        run.is_active = True
+        run.applied_at = timezone.now()
+        run.save(update_fields=['is_active', 'applied_at'])
+    return result['changed']
+
+
+def deactivate_runs(start_date, end_date, exclude=None):
+    """Marks runs overlapping the range inactive (their CallVolume rows were replaced)."""
+    runs = ForecastRun.objects.filter(is_active=True, start_date__lte=end_date, end_date__gte=start_date)
+    if exclude:
+        runs = runs.exclude(pk=exclude)
+    return runs.update(is_active=False)
+
+
+def prune_runs(keep=KEEP_RUNS):
+    """Deletes all but the newest `keep` inactive runs."""
+    stale = list(ForecastRun.objects.filter(is_active=False).order_by('-created_at')
+                 .values_list('pk', flat=True)[keep:])
+    return ForecastRun.objects.filter(pk__in=stale).delete()[0] if stale else 0
+
+
+def get_or_create_run(start_date, end_date, model_type=forecasting.MODEL_SIMPLE_AVG, keep=KEEP_RUNS):
+    """
+    The forecast for the range and model as an applied ForecastRun, and how
+    it was obtained: CURRENT (already in CallVolume), RESTORED (written
+    back from the stored run) or CREATED (computed).
+    """
+    calendar = special_days.load_calendar()
+    params = {**model_params(model_type), 'calendar': special_days.calendar_key(calendar)}
+    actuals = actuals_key()
+    key = input_hash(model_type, params, actuals, start_date, end_date)
+
+    run = ForecastRun.objects.filter(input_hash=key).first()
+    if run and run.is_active:
+        return run, CURRENT
+    if run:
+        apply_run(run)
+        return run, RESTORED
+
+    forecast = forecasting.forecast_intervals(forecasting.load_history(calendar=calendar), start_date, end_date,
+                                              model_type=model_type, calendar=calendar)
+    intervals = pack_intervals(forecast, start_date)
+    run, _ = ForecastRun.objects.update_or_create(input_hash=key, defaults={
+        'model_type': model_type, 'params': params, 'actuals_key': actuals,
+        'start_date': start_date, 'end_date': end_date, 'intervals': intervals,
+        'row_count': len(intervals['calls']), 'total_calls': sum(intervals['calls']),
+    })
+    apply_run(run)
+    prune_runs(keep)
+    return run, CREATED
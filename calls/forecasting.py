@@ -0,0 +1,338 @@
+"""
+Vectorized interval forecasting.
+
+All actual CallVolume is read once into a DataFrame. Each model turns it
+into a (queue, weekday, 15-min slot) profile with groupby operations, laid
+out as a dense array so the whole horizon is filled with one indexing step.
+Intervals whose weekday has no history fall back to the same slot on any
+weekday, as the original per-interval loop did.
+
+Models:
+- simple_avg: mean of all history for the weekday / slot.
+- weighted_avg: the last 4 occurrences weighted 40/30/20/10 %
+  (renormalized when fewer exist).
+- seasonal_naive / holt_winters: series models on each queue's dense
+  15-min history (calls.forecast_models). Holt-Winters is fitted per queue
+  in a process pool and the fit is stored in ForecastFit until the queue's
+  actuals change.
+- top_down: daily totals per queue are forecast and spread with normalized
+  intraday profiles per (queue, weekday), both as array operations over
+  all queues and the whole horizon. Profiles are cached in ForecastFit
+  like the Holt-Winters fits.
+The last three take AHT from the simple_avg profile.
+
+Special days (calls.special_days) are masked out of the history by
+load_history() and adjust the forecast of their dates.
+"""
+import hashlib
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import time
+
+import numpy as np
+import pandas as pd
+from django.utils import timezone
+
+from . import forecast_models, special_days
+from .models import CallVolume, ForecastFit
+
+SLOTS_PER_DAY = 96
+SLOT_MINUTES = 15
+
+MODEL_SIMPLE_AVG = 'simple_avg'
+MODEL_WEIGHTED_AVG = 'weighted_avg'
+MODEL_SEASONAL_NAIVE = 'seasonal_naive'
+MODEL_HOLT_WINTERS = 'holt_winters'
+MODEL_TOP_DOWN = 'top_down'
+MODELS = (MODEL_SIMPLE_AVG, MODEL_WEIGHTED_AVG, MODEL_SEASONAL_NAIVE, MODEL_HOLT_WINTERS, MODEL_TOP_DOWN)
+SERIES_MODELS = (MODEL_SEASONAL_NAIVE, MODEL_HOLT_WINTERS)
+# Models that forecast calls only; AHT comes from the simple_avg profile
+CALL_MODELS = SERIES_MODELS + (MODEL_TOP_DOWN,)
+# ForecastFit.model_type of the cached top-down intraday profiles
+INTRADAY_PROFILE = 'intraday_profile'
+# Holt-Winters and the top-down daily level use this much recent history
+FIT_HISTORY_DAYS = 84
+
+# Most recent occurrence first
+RECENCY_WEIGHTS = np.array([0.4, 0.3, 0.2, 0.1])
+
+HISTORY_COLUMNS = ['queue_id', 'date', 'slot', 'calls', 'aht']
+FORECAST_COLUMNS = ['queue_id', 'date', 'slot', 'calls', 'aht']
+
+
+def load_history(queue_ids=None, start_date=None, end_date=None, calendar=None, exclude_special_days=True):
+    """
+    Actual CallVolume as a frame with queue_id, date, slot, calls, aht.
+    Rows on special days excluded from history (calls.special_days) are
+    dropped; calendar defaults to the tenant's SpecialDay entries.
+    """
+    qs = CallVolume.objects.filter(is_forecast=False)
+    if queue_ids is not None:
+        qs = qs.filter(queue_id__in=queue_ids)
+    if start_date:
+        qs = qs.filter(date__gte=start_date)
+    if end_date:
+        qs = qs.filter(date__lte=end_date)
+    df = pd.DataFrame.from_records(
+        qs.values_list('queue_id', 'date', 'interval_start', 'calls_offered', 'aht_seconds'),
+        columns=['queue_id', 'date', 'interval_start', 'calls', 'aht'],
+    )
+    if df.empty:
+        return pd.DataFrame(columns=HISTORY_COLUMNS)
+    df['slot'] = [t.hour * 4 + t.minute // SLOT_MINUTES for t in df['interval_start']]
+    df['date'] = pd.to_datetime(df['date'])
+    if exclude_special_days:
+        calendar = special_days.load_calendar() if calendar is None else calendar
+        df = df[~special_days.history_mask(df, calendar)]
+    return df[HISTORY_COLUMNS].reset_index(drop=True)
+
+
+def slot_time(slots):
+    """15-min slot numbers as datetime.time objects."""
+    return [time(int(s) // 4, int(s) % 4 * SLOT_MINUTES) for s in slots]
+
+
+def _estimate(history, keys, model_type):
+    """Calls / aht per `keys` group with the model's estimator."""
+    if model_type == MODEL_WEIGHTED_AVG:
+        recent = history.sort_values('date', ascending=False)
+        rank = recent.groupby(keys).cumcount().to_numpy()
+        recent = recent[rank < len(RECENCY_WEIGHTS)].assign(w=RECENCY_WEIGHTS[rank[rank < len(RECENCY_WEIGHTS)]])
+        weighted = recent.assign(calls=recent['calls'] * recent['w'], aht=recent['aht'] * recent['w'])
+        sums = weighted.groupby(keys)[['calls', 'aht', 'w']].sum()
+        return sums[['calls', 'aht']].div(sums['w'], axis=0)
+    return history.groupby(keys)[['calls', 'aht']].mean()
+
+
+def weekday_profile(history, model_type=MODEL_SIMPLE_AVG):
+    """
+    (profile by queue/weekday/slot, fallback by queue/slot) estimates from a
+    load_history() frame.
+    """
+    history = history.assign(weekday=history['date'].dt.weekday)
+    return (_estimate(history, ['queue_id', 'weekday', 'slot'], model_type),
+            _estimate(history, ['queue_id', 'slot'], model_type))
+
+
+def _dense(estimate, queue_ids, shape):
+    """Estimate frame -> float array (queues, *shape, 2) of calls / aht, NaN where missing."""
+    out = np.full((len(queue_ids),) + shape + (2,), np.nan)
+    index = [estimate.index.get_level_values(i).to_numpy() for i in range(estimate.index.nlevels)]
+    index[0] = np.searchsorted(queue_ids, index[0])
+    out[tuple(index)] = estimate[['calls', 'aht']].to_numpy()
+    return out
+
+
+def _queue_series(history, queue_ids, last_date, max_days=None):
+    """
+    Dense (days, 96) call arrays per queue, from the queue's first history
+    day (at most max_days back) to last_date, with missing intervals as 0.
+    Days without any actuals (gaps, excluded special days) repeat the day a
+    week earlier. Returns {queue_id: (series, weekday of the first day)}.
+    """
+    out = {}
+    for queue_id, rows in history[history['queue_id'].isin(queue_ids)].groupby('queue_id'):
+        first = rows['date'].min()
+        if max_days:
+            first = max(first, last_date - pd.Timedelta(days=max_days - 1))
+            rows = rows[rows['date'] >= first]
+        series = np.zeros(((last_date - first).days + 1, SLOTS_PER_DAY))
+        days = (rows['date'] - first).dt.days.to_numpy()
+        np.add.at(series, (days, rows['slot'].to_numpy(dtype=int)), rows['calls'].to_numpy(dtype=float))
+        present = np.zeros(len(series), dtype=bool)
+        present[days] = True
+        for day in np.nonzero(~present[7:])[0] + 7:
+            series[day] = series[day - 7]
+        out[queue_id] = (series, first.weekday())
+    return out
+
+
+def _complete_history(history):
+    # Today's partial actuals would read as a drop in volume; fall back to
+    # everything when there is nothing before today
+    complete = history[history['date'] < pd.Timestamp(timezone.localdate())]
+    return history if complete.empty else complete
+
+
+def history_keys(history):
+    """Fingerprint of each queue's actuals (and the overall history end)."""
+    last_date = history['date'].max()
+    handle = history['calls'] * history['aht']
+    stats = history.assign(handle=handle).groupby('queue_id').agg(
+        rows=('calls', 'size'), first=('date', 'min'), last=('date', 'max'), calls=('calls', 'sum'),
+        handle=('handle', 'sum'))
+    return {
+        q: hashlib.md5(repr((tuple(r), last_date)).encode()).hexdigest()
+        for q, r in zip(stats.index, stats.itertuples(index=False, name=None))
+    }
+
+
+def _fit_job(args):
+    queue_id, series, first_weekday = args
+    return queue_id, forecast_models.fit_holt_winters(series, first_weekday)
+
+
+def _cached_fits(queue_ids, model_type, keys, last_date):
+    """Stored ForecastFit.fit per queue whose key and history end still match."""
+    fits = {}
+    for queue_id, key, fit in ForecastFit.objects.filter(
+            queue_id__in=queue_ids, model_type=model_type).values_list('queue_id', 'history_key', 'fit'):
+        if keys.get(queue_id) == key and fit.get('last_date') == last_date.date().isoformat():
+            fits[queue_id] = fit
+    return fits
+
+
+def _store_fit(queue_id, model_type, key, fit):
+    ForecastFit.objects.update_or_create(
+        queue_id=queue_id, model_type=model_type, defaults={'history_key': key, 'fit': fit})
+
+
+def fit_holt_winters(history, queue_ids, workers=None, use_cache=True):
+    """
+    Holt-Winters fit per queue ({queue_id: fit}). Queues whose ForecastFit
+    matches their current history are reused; the rest are fitted in a
+    process pool (serially inside daemon processes such as Celery
+    workers, which cannot start children). Fitted on the history before
+    today.
+    """
+    history = _complete_history(history)
+    last_date = history['date'].max()
+    keys = history_keys(history)
+    fits = _cached_fits(queue_ids, MODEL_HOLT_WINTERS, keys, last_date) if use_cache else {}
+
+    todo = [q for q in queue_ids if q not in fits]
+    series = _queue_series(history, todo, last_date, max_days=FIT_HISTORY_DAYS)
+    jobs = [(q, *series[q]) for q in todo if q in series and len(series[q][0]) >= forecast_models.MIN_FIT_DAYS]
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers > 1 and not multiprocessing.current_process().daemon:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            fitted = list(pool.map(_fit_job, jobs, chunksize=max(len(jobs) // (workers * 4), 1)))
+    else:
+        fitted = [_fit_job(job) for job in jobs]
+
+    for queue_id, fit in fitted:
+        fit['last_date'] = last_date.date().isoformat()
+        fits[queue_id] = fit
+        if use_cache:
+            _store_fit(queue_id, MODEL_HOLT_WINTERS, keys[queue_id], fit)
+    return fits
+
+
+def _series_calls(history, queue_ids, dates, model_type, workers, use_cache):
+    """Calls array (queues, days, 96) from a series model, on the history before today."""
+    history = _complete_history(history)
+    last_date = history['date'].max()
+    calls = np.zeros((len(queue_ids), len(dates), SLOTS_PER_DAY))
+    fits = {}
+    if model_type == MODEL_HOLT_WINTERS:
+        fits = fit_holt_winters(history, [int(q) for q in queue_ids], workers, use_cache)
+    # Seasonal naive, and Holt-Winters queues with too little history
+    naive = [q for q in queue_ids if q not in fits]
+    series = _queue_series(history, naive, last_date)
+
+    weekdays = dates.weekday.to_numpy()
+    slots = np.arange(SLOTS_PER_DAY)
+    steps = ((dates - last_date).days.to_numpy()[:, None] - 1) * SLOTS_PER_DAY + slots + 1
+    for i, queue_id in enumerate(queue_ids):
+        if queue_id in fits:
+            calls[i] = forecast_models.holt_winters_forecast(
+                fits[queue_id], np.clip(steps, 1, None), weekdays[:, None], slots[None, :])
+        elif queue_id in series:
+            calls[i] = forecast_models.seasonal_naive(*series[queue_id], weekdays)
+    return calls
+
+
+def intraday_profiles(history, queue_ids, use_cache=True):
+    """
+    Normalized intraday profiles (queues, 7, 96) for the sorted queue_ids,
+    reused from ForecastFit while a queue's actuals are unchanged.
+    """
+    last_date = history['date'].max()
+    keys = history_keys(history) if use_cache else {}
+    cached = _cached_fits([int(q) for q in queue_ids], INTRADAY_PROFILE, keys, last_date) if use_cache else {}
+    profiles = np.zeros((len(queue_ids), 7, SLOTS_PER_DAY))
+    todo = np.array([q for q in queue_ids if q not in cached], dtype=np.asarray(queue_ids).dtype)
+    if len(todo):
+        rows = history[history['queue_id'].isin(todo)]
+        sums = np.zeros((len(todo), 7, SLOTS_PER_DAY))
+        np.add.at(sums, (np.searchsorted(todo, rows['queue_id'].to_numpy()), rows['date'].dt.weekday.to_numpy(),
+                         rows['slot'].to_numpy(dtype=int)), rows['calls'].to_numpy(dtype=float))
+        fitted = forecast_models.intraday_profiles(sums)
+        profiles[np.searchsorted(queue_ids, todo)] = fitted
+        if use_cache:
+            for queue_id, profile in zip(todo, fitted):
+                if queue_id not in keys:
+                    continue
+                _store_fit(int(queue_id), INTRADAY_PROFILE, keys[queue_id],
+                           {'profile': profile.tolist(), 'last_date': last_date.date().isoformat()})
+    for queue_id, fit in cached.items():
+        profiles[np.searchsorted(queue_ids, queue_id)] = fit['profile']
+    return profiles
+
+
+def _top_down_calls(history, queue_ids, dates, use_cache):
+    """Calls array (queues, days, 96): daily totals spread by the intraday profiles."""
+    complete = _complete_history(history)
+    last_date = complete['date'].max()
+    start = max(complete['date'].min(), last_date - pd.Timedelta(days=FIT_HISTORY_DAYS - 1))
+    window = complete[complete['date'] >= start]
+    totals = np.zeros((len(queue_ids), (last_date - start).days + 1))
+    np.add.at(totals, (np.searchsorted(queue_ids, window['queue_id'].to_numpy()),
+                       (window['date'] - start).dt.days.to_numpy()), window['calls'].to_numpy(dtype=float))
+    # Days before a queue's first actuals are unknown, not zero
+    first = (complete.groupby('queue_id')['date'].min().reindex(queue_ids) - start).dt.days.clip(lower=0)
+    observed = np.arange(totals.shape[1]) >= first.to_numpy()[:, None]
+
+    daily = forecast_models.daily_totals_forecast(
+        totals, observed, pd.date_range(start, last_date).weekday.to_numpy(), dates.weekday.to_numpy())
+    profiles = intraday_profiles(complete, queue_ids, use_cache)
+    return daily[:, :, None] * profiles[:, dates.weekday.to_numpy()]
+
+
+def forecast_intervals(history, start_date, end_date, model_type=MODEL_SIMPLE_AVG, workers=None, use_cache=True,
+                       calendar=None):
+    """
+    Forecast frame (queue_id, date, slot, calls, aht) for every day in the
+    range and every queue with history. Intervals forecast at zero calls
+    are left out. workers applies to Holt-Winters fitting, use_cache to the
+    ForecastFit cache of Holt-Winters and top_down. A special-day calendar
+    (special_days.load_calendar()) adjusts the calls of its dates.
+    """
+    if model_type not in MODELS:
+        raise ValueError(f"Unknown forecast model: {model_type}")
+    if history.empty:
+        return pd.DataFrame(columns=FORECAST_COLUMNS)
+
+    queue_ids = np.sort(history['queue_id'].unique())
+    dates = pd.date_range(start_date, end_date)
+    weekdays = dates.weekday.to_numpy()
+
+    # (queue, day, slot, [calls, aht]) for the whole range at once
+    profile_model = MODEL_SIMPLE_AVG if model_type in CALL_MODELS else model_type
+    profile, fallback = weekday_profile(history, profile_model)
+    profile = _dense(profile, queue_ids, (7, SLOTS_PER_DAY))
+    fallback = _dense(fallback, queue_ids, (SLOTS_PER_DAY,))
+    exact = profile[:, weekdays]
+    values = np.where(np.isnan(exact[..., :1]), fallback[:, None], exact)
+    if model_type in CALL_MODELS:
+        if model_type == MODEL_TOP_DOWN:
+            values[..., 0] = _top_down_calls(history, queue_ids, dates, use_cache)
+        else:
+            values[..., 0] = _series_calls(history, queue_ids, dates, model_type, workers, use_cache)
+        # Slots never seen in history: the queue's call-weighted AHT
+        handle = (history['calls'] * history['aht']).groupby(history['queue_id']).sum()
+        queue_aht = (handle / history.groupby('queue_id')['calls'].sum().clip(lower=1)).reindex(queue_ids)
+        values[..., 1] = np.where(np.isnan(values[..., 1]), queue_aht.to_numpy()[:, None, None], values[..., 1])
+    if calendar is not None:
+        special_days.apply_adjustments(values, profile, fallback, queue_ids, dates, calendar)
+
+    q, d, s = np.nonzero(values[..., 0] > 0)
+    return pd.DataFrame({
+        'queue_id': queue_ids[q],
+        'date': dates.date[d],
+        'slot': s,
+        'calls': values[q, d, s, 0],
+        'aht': values[q, d, s, 1],
+    })[FORECAST_COLUMNS]
+
@@ -1,11 +1,15 @@
 
 from abc import ABC, abstractmethod
 import json
-from ..models import RealTimeEvent, RealTimeAgentState
+import logging
+from ..models import Queue, RealTimeEvent, RealTimeAgentState
+from ..streaming import record_completed_call
 from agents.models import AgentProfile
 from django.utils import timezone
 from datetime import datetime
 
+logger = logging.getLogger(__name__)
+
 class BaseConnector(ABC):
     def __init__(self, config):
         self.config = config
@@ -43,6 +47,28 @@ class AvayaConnector(BaseConnector):
 
 # ... Other connectors ...
 
+def _record_call_event(data):
+    # {"type": "call", "call_id": "...", "queue_id": "<id or name>", "duration": 120, "timestamp": "ISO..."}
+    try:
+        duration = int(float(data['duration']))
+    except (KeyError, TypeError, ValueError):
+        duration = -1
+    if duration < 0:
+        # Kept in RealTimeEvent, but not counted as a call
+        logger.warning("Skipping call event %s with invalid duration %r", data.get('call_id'), data.get('duration'))
+        return None
+    queue = None
+    queue_ref = data.get('queue_id') or data.get('queue')
+    if queue_ref:
+        queue = Queue.objects.filter(pk=queue_ref).first() if str(queue_ref).isdigit() else None
+        if queue is None:
+            queue, _ = Queue.objects.get_or_create(name=str(queue_ref))
+    try:
+        ts = datetime.fromisoformat(data.get('timestamp'))
+    except (TypeError, ValueError):
+        ts = timezone.now()
+    record_completed_call(data['call_id'], ts, duration, queue)
+
 def handle_incoming_event(config, raw_data):
     """
     Main entry point for incoming webhook data.
@@ -78,6 +104,10 @@ def handle_incoming_event(config, raw_data):
                 state.save()
             except AgentProfile.DoesNotExist:
                 pass # Log error
-                
+
+        # Completed call: store it and feed the intraday interval counters
+        if event.event_type == 'call' and normalized.get('call_id') and normalized.get('duration') is not None:
+            _record_call_event(normalized)
+
         return event
     return None
@@ -0,0 +1,126 @@
+"""
+Intraday reforecast: re-projects the rest of today from live actuals.
+
+For every queue, the actual calls of today's completed 15-min intervals
+(CallVolume, which the streaming counters keep current) are compared with
+the base forecast for the same intervals. The ratio, shrunk towards 1 while
+little volume has been seen and clipped, scales the base forecast of the
+current and later intervals, and only those rows are upserted.
+
+The base is the active ForecastRun covering today, never the CallVolume
+rows, so running every 15 minutes does not compound earlier adjustments.
+When today's forecast predates versioned runs it is first frozen into a
+'snapshot' run. A pass is a handful of small queries per tenant.
+"""
+import hashlib
+
+import numpy as np
+import pandas as pd
+from django.utils import timezone
+
+from . import forecast_runs
+from .forecasting import SLOT_MINUTES, SLOTS_PER_DAY, slot_time
+from .models import CallVolume, ForecastRun
+from .requirements import refresh_staffing_requirements
+from .rollups import refresh_rollups
+from .volumes import upsert_volumes
+
+MODEL_SNAPSHOT = 'snapshot'
+# Calls of pseudo-evidence pulling the ratio towards 1 early in the day
+PRIOR_CALLS = 20
+MIN_RATIO = 0.5
+MAX_RATIO = 2.0
+
+
+def _today_frame(today, is_forecast):
+    df = pd.DataFrame.from_records(
+        CallVolume.objects.filter(date=today, is_forecast=is_forecast)
+        .values_list('queue_id', 'interval_start', 'calls_offered', 'aht_seconds'),
+        columns=['queue_id', 'interval_start', 'calls', 'aht'],
+    )
+    df['slot'] = [t.hour * 4 + t.minute // SLOT_MINUTES for t in df['interval_start']]
+    return df[['queue_id', 'slot', 'calls', 'aht']]
+
+
+def _snapshot_run(today, current):
+    """Freezes today's CallVolume forecast into an active ForecastRun."""
+    stamp = timezone.now().isoformat()
+    run = ForecastRun(
+        input_hash=hashlib.sha256(f'{MODEL_SNAPSHOT}:{today}:{stamp}'.encode()).hexdigest(),
+        model_type=MODEL_SNAPSHOT, actuals_key='', start_date=today, end_date=today,
+        intervals=forecast_runs.pack_intervals(current.assign(date=today), today),
+        row_count=len(current), total_calls=int(current['calls'].sum()),
+        is_active=True, applied_at=timezone.now(),
+    )
+    run.save()
+    return run
+
+
+def base_forecast(today, current=None):
+    """
+    Today's base forecast (queue_id, slot, calls, aht) from the active run
+    covering it; empty when today has no forecast at all.
+    """
+    run = (ForecastRun.objects.filter(is_active=True, start_date__lte=today, end_date__gte=today)
+           .order_by('-applied_at').first())
+    if run is None:
+        current = _today_frame(today, True) if current is None else current
+        if current.empty:
+            return current
+        run = _snapshot_run(today, current)
+    data = pd.DataFrame(run.intervals)
+    if data.empty:
+        return pd.DataFrame(columns=['queue_id', 'slot', 'calls', 'aht'])
+    return data[data['day'] == (today - run.start_date).days][['queue_id', 'slot', 'calls', 'aht']]
+
+
+def scale_ratios(base, actual, elapsed_slots):
+    """Per-queue actual / forecast ratio over the elapsed slots, shrunk and clipped."""
+    forecast_sum = base[base['slot'] < elapsed_slots].groupby('queue_id')['calls'].sum()
+    actual_sum = actual[actual['slot'] < elapsed_slots].groupby('queue_id')['calls'].sum()
+    queues = base['queue_id'].unique()
+    forecast_sum = forecast_sum.reindex(queues, fill_value=0)
+    actual_sum = actual_sum.reindex(queues, fill_value=0)
+    ratio = (actual_sum + PRIOR_CALLS) / (forecast_sum + PRIOR_CALLS)
+    return ratio.clip(MIN_RATIO, MAX_RATIO)
+
+
+def reforecast_today(now=None, queue_ids=None):
+    """
+    Rescales today's remaining forecast intervals from the actuals so far.
+    Returns {'date', 'from_slot', 'ratios': {queue_id: ratio}, 'updated'}.
+    """
+    now = timezone.localtime(now)
+    today = now.date()
+    elapsed = (now.hour * 60 + now.minute) // SLOT_MINUTES
+    result = {'date': today, 'from_slot': elapsed, 'ratios': {}, 'updated': 0}
+    if elapsed >= SLOTS_PER_DAY:
+        return result
+
+    current = _today_frame(today, True)
+    base = base_forecast(today, current)
+    if queue_ids is not None:
+        base = base[base['queue_id'].isin(queue_ids)]
+    if base.empty:
+        return result
+    ratios = scale_ratios(base, _today_frame(today, False), elapsed)
+    result['ratios'] = {int(q): float(r) for q, r in ratios.items()}
+
+    future = base[base['slot'] >= elapsed]
+    future = future.assign(calls=np.rint(future['calls'] * future['queue_id'].map(ratios)).astype(int))
+    # Only rows whose value differs from what is stored
+    merged = future.merge(current[['queue_id', 'slot', 'calls']], on=['queue_id', 'slot'], how='left',
+                          suffixes=('', '_stored'))
+    changed = merged[merged['calls'] != merged['calls_stored']]
+    if changed.empty:
+        return result
+
+    times = slot_time(range(SLOTS_PER_DAY))
+    upsert_volumes((
+        (int(q), today, times[s], int(c), int(a))
+        for q, s, c, a in changed[['queue_id', 'slot', 'calls', 'aht']].itertuples(index=False, name=None)
+    ), True)
+    refresh_rollups(today, today, [int(q) for q in changed['queue_id'].unique()])
+    refresh_staffing_requirements(today, today, is_forecast=True)
+    result['updated'] = len(changed)
+    return result
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand, CommandError
+
+
+def _pct(value):
+    return '     -' if value is None or value != value else f"{value:6.1%}"
+
+
+class Command(BaseCommand):
+    help = 'Rolling-origin backtest of the forecast models over actual CallVolume (run per tenant schema).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--models', nargs='+', default=None, help='Models to test (default: all)')
+        parser.add_argument('--folds', type=int, default=4)
+        parser.add_argument('--horizon', type=int, default=7, help='Forecast horizon per fold in days')
+        parser.add_argument('--step', type=int, default=None, help='Days between fold origins (default: horizon)')
+        parser.add_argument('--queue', type=int, action='append', default=None, help='Only this queue (repeatable)')
+        parser.add_argument('--workers', type=int, default=None)
+        parser.add_argument('--by-queue', action='store_true', help='Also print the metrics per queue')
+        parser.add_argument('--label', type=str, default='', help='Release tag stored with the results')
+        parser.add_argument('--no-save', action='store_true', help='Do not store the results in ForecastBacktest')
+
+    def handle(self, *args, **options):
+        from calls.backtest import run_backtest, save_backtest
+        from calls.forecasting import MODELS
+        from calls.models import ForecastBacktest
+
+        models = options['models'] or list(MODELS)
+        unknown = set(models) - set(MODELS)
+        if unknown:
+            raise CommandError(f"Unknown model(s): {', '.join(sorted(unknown))}. Choices: {', '.join(MODELS)}")
+
+        report = run_backtest(models, folds=options['folds'], horizon_days=options['horizon'],
+                              step_days=options['step'], queue_ids=options['queue'], workers=options['workers'])
+        if not report['models']:
+            self.stdout.write(self.style.WARNING("Not enough actual history for a single fold."))
+            return
+        self.stdout.write(f"Origins: {', '.join(str(o) for o in report['origins'])} "
+                          f"(horizon {report['horizon_days']} days, history to {report['history_end']})")
+
+        previous = {}
+        for row in ForecastBacktest.objects.filter(model_type__in=models).order_by('model_type', '-run_at'):
+            previous.setdefault(row.model_type, row)
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{'model':<16}{'MAPE':>8}{'WAPE':>8}{'bias':>8}{'time s':>9}{'peak MB':>9}  previous WAPE"))
+        for model_type, r in sorted(report['models'].items(), key=lambda item: item[1]['wape']):
+            last = previous.get(model_type)
+            since = f"{_pct(last.wape)} ({last.label or f'{last.run_at:%Y-%m-%d}'})" if last else ''
+            self.stdout.write(
+                f"{model_type:<16}{_pct(r['mape']):>8}{_pct(r['wape']):>8}{_pct(r['bias']):>8}"
+                f"{r['seconds']:9.2f}{r['peak_memory_mb']:9.1f}  {since}")
+            if options['by_queue']:
+                for queue_id, q in r['by_queue'].iterrows():
+                    self.stdout.write(f"  queue {queue_id:<8}{_pct(q['mape']):>8}{_pct(q['wape']):>8}"
+                                      f"{_pct(q['bias']):>8}")
+
+        if not options['no_save']:
+            save_backtest(report, label=options['label'])
+            self.stdout.write(self.style.SUCCESS(f"Stored {len(report['models'])} result(s) in ForecastBacktest."))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Backfills Call.call_date / call_interval in id batches (current tenant schema).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50000)
+
+    def handle(self, *args, **options):
+        from calls.aggregation import fill_call_buckets
+
+        updated = fill_call_buckets(
+            batch_size=options['batch_size'],
+            progress=lambda n: self.stdout.write(f"{n} calls updated..."),
+        )
+        self.stdout.write(self.style.SUCCESS(f"Backfilled {updated} calls."))
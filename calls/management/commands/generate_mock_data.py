@@ -174,5 +174,6 @@ class Command(BaseCommand):
             # 4. Aggregate Data for Forecasts
             self.stdout.write("Aggregating actuals for forecasting...")
             from calls.utils import aggregate_actuals
-            aggregate_actuals()
+            # Deleted calls are not tracked incrementally, so rebuild after --delete
+            aggregate_actuals(full=delete)
             self.stdout.write(self.style.SUCCESS("Aggregation Complete. Data ready for forecasting."))
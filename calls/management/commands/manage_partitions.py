@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django_tenants.utils import get_public_schema_name, get_tenant_model, schema_context
+
+
+class Command(BaseCommand):
+    help = 'Creates upcoming monthly Call / RealTimeEvent partitions and archives old ones, per tenant schema.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--schema', type=str, default=None, help='Only this tenant schema (default: all tenants)')
+        parser.add_argument('--months-ahead', type=int, default=3)
+        parser.add_argument('--retain-months', type=int, default=None,
+                            help='Detach partitions older than this many months (default: keep everything)')
+        parser.add_argument('--archive-dir', type=str, default=None, help='Write detached partitions as .csv.gz here')
+        parser.add_argument('--keep-tables', action='store_true', help='Keep detached partitions as plain tables')
+
+    def handle(self, *args, **options):
+        from calls.models import Call, RealTimeEvent
+        from calls.partitions import archive_partitions, ensure_partitions
+
+        if options['retain_months'] is not None and not options['archive_dir'] and not options['keep_tables']:
+            self.stdout.write(self.style.WARNING("No --archive-dir or --keep-tables: old partitions will be dropped."))
+
+        schemas = [options['schema']] if options['schema'] else list(
+            get_tenant_model().objects.exclude(schema_name=get_public_schema_name())
+            .values_list('schema_name', flat=True))
+        tables = [Call._meta.db_table, RealTimeEvent._meta.db_table]
+
+        for schema in schemas:
+            with schema_context(schema):
+                for table in tables:
+                    created = ensure_partitions(table, months_ahead=options['months_ahead'])
+                    if created:
+                        self.stdout.write(f"{schema}: created {', '.join(created)}")
+                    if options['retain_months'] is None:
+                        continue
+                    for archive in archive_partitions(table, options['retain_months'],
+                                                      archive_dir=options['archive_dir'],
+                                                      keep_tables=options['keep_tables']):
+                        where = archive.archive_path or ('kept' if not archive.dropped else 'dropped')
+                        self.stdout.write(f"{schema}: archived {archive.partition} ({archive.rows} rows, {where})")
+
+        self.stdout.write(self.style.SUCCESS(f"Partitions up to date for {len(schemas)} schema(s)."))
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.10 on 2026-10-18 09:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calls', '0003_call_customer_number'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='queue',
+            name='avg_patience_seconds',
+            field=models.IntegerField(default=120, help_text='Average caller patience before abandoning (Erlang A)'),
+        ),
+        migrations.AddField(
+            model_name='queue',
+            name='staffing_model',
+            field=models.CharField(choices=[('erlang_c', 'Erlang C'), ('erlang_a', 'Erlang A (Abandon)')], default='erlang_c', max_length=20),
+        ),
+    ]
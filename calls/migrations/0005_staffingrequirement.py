@@ -0,0 +1,38 @@
+# Generated by Django 5.2.10 on 2026-10-18 09:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calls', '0004_queue_staffing_model'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StaffingRequirement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('interval_start', models.TimeField()),
+                ('is_forecast', models.BooleanField(default=True)),
+                ('interval_seconds', models.IntegerField(default=900)),
+                ('calls_offered', models.IntegerField(default=0)),
+                ('aht_seconds', models.IntegerField(default=180)),
+                ('traffic_erlangs', models.FloatField(default=0)),
+                ('sla_target_seconds', models.IntegerField(default=20)),
+                ('sla_target_percent', models.FloatField(default=0.8)),
+                ('staffing_model', models.CharField(default='erlang_c', max_length=20)),
+                ('patience_seconds', models.IntegerField(blank=True, null=True)),
+                ('required_agents', models.IntegerField(default=0)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+                ('queue', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='calls.queue')),
+            ],
+            options={
+                'ordering': ['date', 'interval_start'],
+                'unique_together': {('queue', 'date', 'interval_start', 'is_forecast')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.10 on 2026-10-18 09:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calls', '0005_staffingrequirement'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='queue',
+            name='interval_minutes',
+            field=models.IntegerField(choices=[(15, '15 min'), (30, '30 min'), (60, '60 min')], default=15, help_text='Planning interval used when sizing this queue'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.10 on 2026-10-18 09:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agents', '0005_agentprofile_managed_teams'),
+        ('calls', '0006_queue_interval_minutes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShrinkageRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(blank=True, max_length=100)),
+                ('weekday', models.IntegerField(blank=True, choices=[(0, 'Pazartesi'), (1, 'Salı'), (2, 'Çarşamba'), (3, 'Perşembe'), (4, 'Cuma'), (5, 'Cumartesi'), (6, 'Pazar')], null=True)),
+                ('start_time', models.TimeField(blank=True, help_text='Interval range start (inclusive)', null=True)),
+                ('end_time', models.TimeField(blank=True, help_text='Interval range end (exclusive)', null=True)),
+                ('planned_percent', models.FloatField(default=0.0, help_text='Meetings, training, coaching (0-1)')),
+                ('unplanned_percent', models.FloatField(default=0.0, help_text='Absence, sick leave (0-1)')),
+                ('is_active', models.BooleanField(default=True)),
+                ('queue', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='shrinkage_rules', to='calls.queue')),
+                ('team', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='shrinkage_rules', to='agents.team')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
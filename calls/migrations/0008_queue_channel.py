@@ -0,0 +1,33 @@
+# Generated by Django 5.2.10 on 2026-10-18 09:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calls', '0007_shrinkagerule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='queue',
+            name='channel',
+            field=models.CharField(choices=[('voice', 'Voice'), ('chat', 'Chat'), ('email', 'Email')], default='voice', help_text='Email is deferred work: sla_target_seconds is the response-time target', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='queue',
+            name='concurrency',
+            field=models.IntegerField(default=1, help_text='Contacts an agent handles at the same time (e.g. 3 chats)'),
+        ),
+        migrations.AddField(
+            model_name='staffingrequirement',
+            name='channel',
+            field=models.CharField(default='voice', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='staffingrequirement',
+            name='concurrency',
+            field=models.IntegerField(default=1),
+        ),
+    ]
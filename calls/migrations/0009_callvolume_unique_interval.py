@@ -0,0 +1,27 @@
+# Generated by Django 5.2.10 on 2026-10-18 09:24
+
+from django.db import migrations
+from django.db.models import Max
+
+
+def merge_duplicate_intervals(apps, schema_editor):
+    # Keep the newest row of each (queue, date, interval, is_forecast)
+    CallVolume = apps.get_model('calls', 'CallVolume')
+    keep = (CallVolume.objects.values('queue', 'date', 'interval_start', 'is_forecast')
+            .annotate(keep_id=Max('id')).values_list('keep_id', flat=True))
+    CallVolume.objects.exclude(id__in=list(keep)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calls', '0008_queue_channel'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_intervals, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='callvolume',
+            unique_together={('queue', 'date', 'interval_start', 'is_forecast')},
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.10 on 2026-10-18 09:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calls', '0009_callvolume_unique_interval'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AggregationWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_call_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='DirtyInterval',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('interval_start', models.TimeField()),
+                ('marked_at', models.DateTimeField(auto_now=True)),
+                ('queue', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='calls.queue')),
+            ],
+            options={
+                'unique_together': {('queue', 'date', 'interval_start')},
+            },
+        ),
+    ]
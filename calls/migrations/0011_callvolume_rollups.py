@@ -0,0 +1,53 @@
+# Generated by Django 5.2.10 on 2026-10-18 09:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_rollups(apps, schema_editor):
+    # Same statements as calls.rollups.refresh_rollups over the whole table
+    CallVolume = apps.get_model('calls', 'CallVolume')
+    CallVolumeRollup = apps.get_model('calls', 'CallVolumeRollup')
+    grains = {
+        'hour': ('date', 'EXTRACT(HOUR FROM interval_start)::int'),
+        'day': ('date', '0'),
+        'week': ("date_trunc('week', date)::date", '0'),
+    }
+    with schema_editor.connection.cursor() as cursor:
+        for grain, (date_sql, hour_sql) in grains.items():
+            cursor.execute(
+                f'INSERT INTO {CallVolumeRollup._meta.db_table} '
+                '(queue_id, grain, date, hour, calls_offered, handle_seconds, is_forecast) '
+                f'SELECT queue_id, %s, {date_sql}, {hour_sql}, SUM(calls_offered), '
+                'SUM(calls_offered::bigint * aht_seconds), is_forecast '
+                f'FROM {CallVolume._meta.db_table} GROUP BY 1, 3, 4, 7',
+                [grain],
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calls', '0010_incremental_aggregation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CallVolumeRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('grain', models.CharField(choices=[('hour', 'Saatlik'), ('day', 'Günlük'), ('week', 'Haftalık')], max_length=4)),
+                ('date', models.DateField()),
+                ('hour', models.SmallIntegerField(default=0)),
+                ('calls_offered', models.IntegerField(default=0)),
+                ('handle_seconds', models.BigIntegerField(default=0, help_text='Sum of calls * AHT')),
+                ('is_forecast', models.BooleanField(default=False)),
+                ('queue', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='calls.queue')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['grain', 'is_forecast', 'date'], name='calls_callv_grain_d73982_idx')],
+                'unique_together': {('queue', 'grain', 'date', 'hour', 'is_forecast')},
+            },
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.10 on 2026-10-18 09:32
+
+from django.db import migrations, models
+
+from calls.partitions import convert_to_partitioned
+
+
+def partition_tables(apps, schema_editor):
+    # Irreversible, so no reverse is given: rebuilding the plain tables
+    # would also need the global UNIQUE(call_id), which rows accepted under
+    # UNIQUE(call_id, timestamp) may violate.
+    with schema_editor.connection.cursor() as cursor:
+        convert_to_partitioned(
+            cursor, 'calls_call',
+            indexes=[('call_id',), ('queue_id',), ('agent_id',), ('timestamp',)],
+            unique=[('call_id',)],
+        )
+        convert_to_partitioned(cursor, 'calls_realtimeevent', indexes=[('timestamp',)])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calls', '0011_callvolume_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PartitionArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('table_name', models.CharField(max_length=63)),
+                ('partition', models.CharField(max_length=63)),
+                ('range_start', models.DateTimeField()),
+                ('range_end', models.DateTimeField()),
+                ('rows', models.BigIntegerField(default=0)),
+                ('archive_path', models.CharField(blank=True, max_length=500)),
+                ('dropped', models.BooleanField(default=True, help_text='Detached table dropped after archiving')),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        # The database swaps UNIQUE(call_id) for UNIQUE(call_id, timestamp)
+        # plus a plain call_id index; the model state records that
+        migrations.SeparateDatabaseAndState(
+            database_operations=[migrations.RunPython(partition_tables)],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='call',
+                    name='call_id',
+                    field=models.CharField(db_index=True, max_length=100),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.10 on 2026-10-18 09:34
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_buckets(apps, schema_editor):
+    # Same statement as calls.aggregation.fill_call_buckets, in committed id batches
+    table = apps.get_model('calls', 'Call')._meta.db_table
+    batch = 50000
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'SELECT MIN(id), MAX(id) FROM {table} WHERE call_date IS NULL')
+        lo, high = cursor.fetchone()
+        while lo is not None and lo <= high:
+            cursor.execute(
+                f"UPDATE {table} SET call_date = (timestamp AT TIME ZONE %(tz)s)::date, "
+                "call_interval = (date_trunc('hour', timestamp AT TIME ZONE %(tz)s) + "
+                "floor(extract(minute FROM timestamp AT TIME ZONE %(tz)s) / 15) * 15 * interval '1 minute')::time "
+                "WHERE id >= %(lo)s AND id < %(hi)s AND call_date IS NULL",
+                {'tz': settings.TIME_ZONE, 'lo': lo, 'hi': lo + batch},
+            )
+            lo += batch
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('agents', '0005_agentprofile_managed_teams'),
+        ('calls', '0012_partition_call_tables'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='call',
+            name='call_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='call',
+            name='call_interval',
+            field=models.TimeField(blank=True, null=True),
+        ),
+        # Fill before indexing
+        migrations.RunPython(fill_buckets, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='call',
+            index=models.Index(fields=['call_date', 'call_interval'], name='calls_call_call_da_cdf7cf_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='call',
+            index=models.Index(fields=['queue', 'call_date', 'call_interval'], name='calls_call_queue_i_78fa13_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.10 on 2026-10-18 09:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calls', '0013_call_date_interval'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ForecastFit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_type', models.CharField(max_length=30)),
+                ('history_key', models.CharField(max_length=64)),
+                ('fit', models.JSONField()),
+                ('fitted_at', models.DateTimeField(auto_now=True)),
+                ('queue', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='calls.queue')),
+            ],
+            options={
+                'unique_together': {('queue', 'model_type')},
+            },
+        ),
+    ]
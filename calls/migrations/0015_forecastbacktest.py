@@ -0,0 +1,36 @@
+# Generated by Django 5.2.10 on 2026-10-18 09:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calls', '0014_forecastfit'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ForecastBacktest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('label', models.CharField(blank=True, max_length=50)),
+                ('run_at', models.DateTimeField()),
+                ('model_type', models.CharField(max_length=30)),
+                ('folds', models.PositiveIntegerField()),
+                ('horizon_days', models.PositiveIntegerField()),
+                ('history_end', models.DateField()),
+                ('mape', models.FloatField(blank=True, null=True)),
+                ('wape', models.FloatField(blank=True, null=True)),
+                ('bias', models.FloatField(blank=True, null=True)),
+                ('seconds', models.FloatField(help_text='Total forecast wall time over all folds')),
+                ('peak_memory_mb', models.FloatField(help_text='Largest resident memory growth of a fold')),
+                ('by_queue', models.JSONField(default=dict)),
+                ('by_interval', models.JSONField(default=dict)),
+            ],
+            options={
+                'ordering': ['-run_at', 'model_type'],
+                'indexes': [models.Index(fields=['model_type', 'run_at'], name='calls_forec_model_t_ae6563_idx')],
+            },
+        ),
+    ]
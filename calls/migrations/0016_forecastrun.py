@@ -0,0 +1,34 @@
+# Generated by Django 5.2.10 on 2026-10-18 09:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calls', '0015_forecastbacktest'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ForecastRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('input_hash', models.CharField(max_length=64, unique=True)),
+                ('model_type', models.CharField(max_length=30)),
+                ('params', models.JSONField(default=dict)),
+                ('actuals_key', models.CharField(max_length=64)),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+                ('intervals', models.JSONField(default=dict, help_text='Forecast column-wise: queue_id, day, slot, calls, aht')),
+                ('row_count', models.IntegerField(default=0)),
+                ('total_calls', models.IntegerField(default=0)),
+                ('is_active', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('applied_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.10 on 2026-10-18 09:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calls', '0016_forecastrun'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpecialDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('kind', models.CharField(choices=[('holiday', 'Resmi Tatil / Bayram'), ('campaign', 'Kampanya'), ('outlier', 'Olağandışı Gün')], default='holiday', max_length=10)),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+                ('adjustment', models.CharField(choices=[('multiply', 'Çarpan'), ('replace', 'Başka Günün Profili'), ('none', 'Yalnızca Geçmişten Çıkar')], default='multiply', max_length=10)),
+                ('factor', models.FloatField(default=1.0, help_text='Volume multiplier (e.g. 0.3 on a holiday, 1.5 on a campaign)')),
+                ('like_weekday', models.IntegerField(blank=True, choices=[(0, 'Pazartesi'), (1, 'Salı'), (2, 'Çarşamba'), (3, 'Perşembe'), (4, 'Cuma'), (5, 'Cumartesi'), (6, 'Pazar')], help_text="Replace: forecast the day with this weekday's profile", null=True)),
+                ('exclude_from_history', models.BooleanField(default=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('queue', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='special_days', to='calls.queue')),
+            ],
+            options={
+                'ordering': ['start_date'],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+from django.db import migrations
+
+from calls.partitions import add_partition_unique
+
+
+def add_call_id_unique(apps, schema_editor):
+    table = apps.get_model('calls', 'Call')._meta.db_table
+    with schema_editor.connection.cursor() as cursor:
+        # Keep the first delivery of a call_id per day; later copies were
+        # counted twice, so rebuild the actuals if any are removed
+        cursor.execute(
+            f'DELETE FROM {table} c USING {table} d '
+            f'WHERE c.call_id = d.call_id AND c.call_date = d.call_date AND c.id > d.id'
+        )
+        add_partition_unique(cursor, table, ('call_date', 'call_id'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calls', '0017_specialday'),
+    ]
+
+    operations = [
+        # Per-partition index only (calls.partitions); the model state has no
+        # constraint for it, like UNIQUE(call_id, timestamp)
+        migrations.RunPython(add_call_id_unique, migrations.RunPython.noop),
+    ]
@@ -1,12 +1,32 @@
+from datetime import time
+
 from django.db import models
+from django.utils import timezone
 from tenants.models import TenantAwareModel
 from agents.models import Skill
 
 class Queue(TenantAwareModel):
+    STAFFING_MODELS = (
+        ('erlang_c', 'Erlang C'),
+        ('erlang_a', 'Erlang A (Abandon)'),
+    )
+    CHANNELS = (
+        ('voice', 'Voice'),
+        ('chat', 'Chat'),
+        ('email', 'Email'),
+    )
+
     name = models.CharField(max_length=100)
     required_skill = models.ForeignKey(Skill, on_delete=models.SET_NULL, null=True, blank=True)
     sla_target_seconds = models.IntegerField(default=20) # e.g., 80/20 rule
     sla_target_percent = models.FloatField(default=0.8)
+    staffing_model = models.CharField(max_length=20, choices=STAFFING_MODELS, default='erlang_c')
+    avg_patience_seconds = models.IntegerField(default=120, help_text="Average caller patience before abandoning (Erlang A)")
+    interval_minutes = models.IntegerField(default=15, choices=((15, '15 min'), (30, '30 min'), (60, '60 min')),
+                                           help_text="Planning interval used when sizing this queue")
+    channel = models.CharField(max_length=10, choices=CHANNELS, default='voice',
+                               help_text="Email is deferred work: sla_target_seconds is the response-time target")
+    concurrency = models.IntegerField(default=1, help_text="Contacts an agent handles at the same time (e.g. 3 chats)")
 
     def __str__(self):
         return self.name
@@ -20,19 +40,320 @@ class CallVolume(TenantAwareModel):
     is_forecast = models.BooleanField(default=False)
 
     class Meta:
+        unique_together = ('queue', 'date', 'interval_start', 'is_forecast')
+        ordering = ['date', 'interval_start']
+
+class CallVolumeRollup(TenantAwareModel):
+    """
+    CallVolume summed per queue at hour, day or ISO-week grain, kept in
+    step by calls.rollups.refresh_rollups. Week rows are dated on their
+    Monday; hour is 0 except at hour grain.
+    """
+    GRAINS = (
+        ('hour', 'Saatlik'),
+        ('day', 'Günlük'),
+        ('week', 'Haftalık'),
+    )
+
+    queue = models.ForeignKey(Queue, on_delete=models.CASCADE)
+    grain = models.CharField(max_length=4, choices=GRAINS)
+    date = models.DateField()
+    hour = models.SmallIntegerField(default=0)
+    calls_offered = models.IntegerField(default=0)
+    handle_seconds = models.BigIntegerField(default=0, help_text="Sum of calls * AHT")
+    is_forecast = models.BooleanField(default=False)
+
+    class Meta:
+        unique_together = ('queue', 'grain', 'date', 'hour', 'is_forecast')
+        indexes = [models.Index(fields=['grain', 'is_forecast', 'date'])]
+
+class ForecastFit(TenantAwareModel):
+    """
+    Fitted parameters and final state of a series forecast model for one
+    queue (calls.forecasting). Reused while history_key, a fingerprint of
+    the queue's actuals, is unchanged.
+    """
+    queue = models.ForeignKey(Queue, on_delete=models.CASCADE)
+    model_type = models.CharField(max_length=30)
+    history_key = models.CharField(max_length=64)
+    fit = models.JSONField()
+    fitted_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('queue', 'model_type')
+
+class ForecastRun(TenantAwareModel):
+    """
+    A stored forecast version (calls.forecast_runs). input_hash covers the
+    model, its parameters, the actuals watermark and the date range; a
+    request with the same hash reuses the run instead of recomputing it.
+    is_active marks the run whose rows are in CallVolume for its range.
+    """
+    input_hash = models.CharField(max_length=64, unique=True)
+    model_type = models.CharField(max_length=30)
+    params = models.JSONField(default=dict)
+    actuals_key = models.CharField(max_length=64)
+    start_date = models.DateField()
+    end_date = models.DateField()
+    intervals = models.JSONField(default=dict, help_text="Forecast column-wise: queue_id, day, slot, calls, aht")
+    row_count = models.IntegerField(default=0)
+    total_calls = models.IntegerField(default=0)
+    is_active = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    applied_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.model_type} {self.start_date} - {self.end_date} ({self.input_hash[:8]})"
+
+class ForecastBacktest(TenantAwareModel):
+    """
+    One model's result in a rolling-origin backtest run (calls.backtest).
+    Rows of the same run share run_at; label tags the release it ran on.
+    """
+    label = models.CharField(max_length=50, blank=True)
+    run_at = models.DateTimeField()
+    model_type = models.CharField(max_length=30)
+    folds = models.PositiveIntegerField()
+    horizon_days = models.PositiveIntegerField()
+    history_end = models.DateField()
+    mape = models.FloatField(null=True, blank=True)
+    wape = models.FloatField(null=True, blank=True)
+    bias = models.FloatField(null=True, blank=True)
+    seconds = models.FloatField(help_text="Total forecast wall time over all folds")
+    peak_memory_mb = models.FloatField(help_text="Largest resident memory growth of a fold")
+    by_queue = models.JSONField(default=dict)
+    by_interval = models.JSONField(default=dict)
+
+    class Meta:
+        ordering = ['-run_at', 'model_type']
+        indexes = [models.Index(fields=['model_type', 'run_at'])]
+
+    def __str__(self):
+        return f"{self.model_type} @ {self.run_at:%Y-%m-%d %H:%M} {self.label}".rstrip()
+
+class StaffingRequirement(TenantAwareModel):
+    """
+    Required agents per queue and 15-min interval, computed once from
+    CallVolume by calls.requirements.refresh_staffing_requirements.
+    The stored inputs let a refresh skip intervals whose volume did not change.
+    """
+    queue = models.ForeignKey(Queue, on_delete=models.CASCADE)
+    date = models.DateField()
+    interval_start = models.TimeField()
+    is_forecast = models.BooleanField(default=True)
+    interval_seconds = models.IntegerField(default=900)
+    calls_offered = models.IntegerField(default=0)
+    aht_seconds = models.IntegerField(default=180)
+    traffic_erlangs = models.FloatField(default=0)
+    sla_target_seconds = models.IntegerField(default=20)
+    sla_target_percent = models.FloatField(default=0.8)
+    staffing_model = models.CharField(max_length=20, default='erlang_c')
+    patience_seconds = models.IntegerField(null=True, blank=True)
+    channel = models.CharField(max_length=10, default='voice')
+    concurrency = models.IntegerField(default=1)
+    required_agents = models.IntegerField(default=0)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('queue', 'date', 'interval_start', 'is_forecast')
         ordering = ['date', 'interval_start']
 
+class ShrinkageRule(TenantAwareModel):
+    """
+    Planned (meetings, training, coaching) and unplanned (absence) shrinkage
+    as a share of paid time. Empty team / queue / weekday / time fields match
+    everything; when several rules match an interval the most specific wins.
+    """
+    WEEKDAYS = (
+        (0, 'Pazartesi'), (1, 'Salı'), (2, 'Çarşamba'), (3, 'Perşembe'),
+        (4, 'Cuma'), (5, 'Cumartesi'), (6, 'Pazar'),
+    )
+
+    name = models.CharField(max_length=100, blank=True)
+    team = models.ForeignKey('agents.Team', on_delete=models.CASCADE, null=True, blank=True,
+                             related_name='shrinkage_rules')
+    queue = models.ForeignKey(Queue, on_delete=models.CASCADE, null=True, blank=True,
+                              related_name='shrinkage_rules')
+    weekday = models.IntegerField(choices=WEEKDAYS, null=True, blank=True)
+    start_time = models.TimeField(null=True, blank=True, help_text="Interval range start (inclusive)")
+    end_time = models.TimeField(null=True, blank=True, help_text="Interval range end (exclusive)")
+    planned_percent = models.FloatField(default=0.0, help_text="Meetings, training, coaching (0-1)")
+    unplanned_percent = models.FloatField(default=0.0, help_text="Absence, sick leave (0-1)")
+    is_active = models.BooleanField(default=True)
+
+    def __str__(self):
+        return self.name or f"Shrinkage {self.planned_percent + self.unplanned_percent:.0%}"
+
+class SpecialDay(TenantAwareModel):
+    """
+    Holiday / campaign calendar entry (calls.special_days). Its actuals are
+    left out of forecast history, and forecasts for its dates are scaled by
+    factor (multiply) or rebuilt from another weekday's intraday profile
+    times factor (replace). Empty queue = all queues.
+    """
+    KINDS = (
+        ('holiday', 'Resmi Tatil / Bayram'),
+        ('campaign', 'Kampanya'),
+        ('outlier', 'Olağandışı Gün'),
+    )
+    ADJUST_MULTIPLY = 'multiply'
+    ADJUST_REPLACE = 'replace'
+    ADJUST_NONE = 'none'
+    ADJUSTMENTS = (
+        (ADJUST_MULTIPLY, 'Çarpan'),
+        (ADJUST_REPLACE, 'Başka Günün Profili'),
+        (ADJUST_NONE, 'Yalnızca Geçmişten Çıkar'),
+    )
+
+    name = models.CharField(max_length=100)
+    kind = models.CharField(max_length=10, choices=KINDS, default='holiday')
+    start_date = models.DateField()
+    end_date = models.DateField()
+    queue = models.ForeignKey(Queue, on_delete=models.CASCADE, null=True, blank=True, related_name='special_days')
+    adjustment = models.CharField(max_length=10, choices=ADJUSTMENTS, default=ADJUST_MULTIPLY)
+    factor = models.FloatField(default=1.0, help_text="Volume multiplier (e.g. 0.3 on a holiday, 1.5 on a campaign)")
+    like_weekday = models.IntegerField(choices=ShrinkageRule.WEEKDAYS, null=True, blank=True,
+                                       help_text="Replace: forecast the day with this weekday's profile")
+    exclude_from_history = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['start_date']
+
+    def __str__(self):
+        return f"{self.name} ({self.start_date} - {self.end_date})"
+
+# Advisory lock namespace of the call_id ingest lock
+CALL_ID_LOCK = 4201
+
+class CallQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for call in objs:
+            call.set_bucket()
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def update_or_create_by_call_id(self, call_id, defaults=None):
+        """
+        update_or_create() on call_id, serialized per call_id with a
+        transaction-level advisory lock. The partitioned table only enforces
+        uniqueness per (call_id, timestamp) and per day (calls.partitions), so
+        this is what merges redeliveries of a call instead of rejecting them.
+        """
+        from django.db import connection, transaction
+
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_xact_lock(%s, hashtext(%s))', [CALL_ID_LOCK, call_id])
+            return self.update_or_create(call_id=call_id, defaults=defaults)
+
+    def between(self, start_date, end_date):
+        """Calls on local days start_date..end_date (dates or 'YYYY-MM-DD')."""
+        from .partitions import timestamp_bounds
+
+        # call_date uses its index; the timestamp bounds let Postgres prune partitions
+        return self.filter(call_date__range=(start_date, end_date), **timestamp_bounds(start_date, end_date))
+
 class Call(TenantAwareModel):
-    call_id = models.CharField(max_length=100, unique=True)
+    BUCKET_MINUTES = 15
+
+    # Unique per (call_id, timestamp) and per (call_date, call_id) in the
+    # partitioned table; ingest goes through Call.objects.update_or_create_by_call_id()
+    call_id = models.CharField(max_length=100, db_index=True)
     timestamp = models.DateTimeField()
     duration = models.IntegerField(help_text="Duration in seconds")
     queue = models.ForeignKey(Queue, on_delete=models.SET_NULL, null=True, blank=True)
     agent = models.ForeignKey('agents.AgentProfile', on_delete=models.SET_NULL, null=True, blank=True)
     customer_number = models.CharField(max_length=50, blank=True, null=True, help_text="Caller Phone Number")
-    
+    # Local date and 15-min interval of timestamp, kept in step on save / bulk_create
+    call_date = models.DateField(null=True, blank=True)
+    call_interval = models.TimeField(null=True, blank=True)
+
+    objects = CallQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['call_date', 'call_interval']),
+            models.Index(fields=['queue', 'call_date', 'call_interval']),
+        ]
+
     def __str__(self):
         return self.call_id
 
+    def set_bucket(self):
+        if self.timestamp is None:
+            return
+        ts = self.timestamp
+        if isinstance(ts, str):
+            ts = self.timestamp = models.DateTimeField().to_python(ts)
+        if timezone.is_naive(ts):
+            ts = timezone.make_aware(ts)
+        local = timezone.localtime(ts)
+        self.call_date = local.date()
+        self.call_interval = time(local.hour, local.minute - local.minute % self.BUCKET_MINUTES)
+
+    def save(self, *args, **kwargs):
+        self.set_bucket()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'timestamp' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'call_date', 'call_interval'}
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember where the call was counted so a later save can mark the old bucket dirty
+        instance._loaded_bucket = (instance.__dict__.get('queue_id'), instance.__dict__.get('timestamp'))
+        return instance
+
+class DirtyInterval(TenantAwareModel):
+    """
+    A (queue, date, 15-min interval) whose actual CallVolume is out of date
+    because Call rows in it were inserted or changed. Consumed by
+    calls.aggregation.aggregate_dirty.
+    """
+    queue = models.ForeignKey(Queue, on_delete=models.CASCADE)
+    date = models.DateField()
+    interval_start = models.TimeField()
+    marked_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('queue', 'date', 'interval_start')
+
+class AggregationWatermark(TenantAwareModel):
+    """
+    High-water mark of the incremental actuals aggregation: every Call with
+    id <= last_call_id has been counted. Catches inserts that bypass
+    DirtyInterval (bulk_create, raw SQL).
+    """
+    name = models.CharField(max_length=50, unique=True)
+    last_call_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.last_call_id}"
+
+class PartitionArchive(TenantAwareModel):
+    """
+    A monthly partition of Call / RealTimeEvent detached by
+    calls.partitions.archive_partitions. Rows before range_end are no longer
+    in the live table.
+    """
+    table_name = models.CharField(max_length=63)
+    partition = models.CharField(max_length=63)
+    range_start = models.DateTimeField()
+    range_end = models.DateTimeField()
+    rows = models.BigIntegerField(default=0)
+    archive_path = models.CharField(max_length=500, blank=True)
+    dropped = models.BooleanField(default=True, help_text="Detached table dropped after archiving")
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.partition
+
 class IntegrationConfig(TenantAwareModel):
     INTEGRATION_TYPES = (
         ('generic', 'Generic API'),
@@ -0,0 +1,257 @@
+"""
+Monthly range partitioning of Call and RealTimeEvent.
+
+Both tables are partitioned on `timestamp` by local calendar month
+(`<table>_pYYYYMM`) with a `<table>_default` catch-all, in every tenant
+schema (migration 0012 converts existing tables). Postgres only scans the
+months a query's timestamp bounds touch, so date-bounded queries should
+filter on plain timestamp bounds (timestamp_bounds()) rather than
+`timestamp__date`, which hides the column behind a cast.
+
+ensure_partitions() creates the coming months and moves rows that landed in
+the default partition into their own month; archive_partitions() detaches
+months older than the retention window, optionally writes them to gzipped
+CSV and drops them. Both are driven by the manage_partitions command.
+
+Unique constraints on a partitioned table must include the partition key, so
+Call.call_id is unique per (call_id, timestamp) on the parent (and a plain
+indexed field in the model). Each partition also carries its own unique
+index on (call_date, call_id) (add_partition_unique(); new months copy the
+default partition's), so any insert path - create(), bulk_create(), raw SQL
+- is rejected for a call_id already stored that day. The ingest paths write
+through Call.objects.update_or_create_by_call_id(), which holds an advisory
+lock on the call_id while it looks the call up and merges into it.
+"""
+import gzip
+import os
+from datetime import date, datetime, time, timedelta
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+PARTITION_COLUMN = 'timestamp'
+
+
+def _month_start(d):
+    return date(d.year, d.month, 1)
+
+
+def _add_months(d, months):
+    m = d.month - 1 + months
+    return date(d.year + m // 12, m % 12 + 1, 1)
+
+
+def _local_midnight(d):
+    return timezone.make_aware(datetime.combine(d, time.min))
+
+
+def timestamp_bounds(start_date, end_date, field=PARTITION_COLUMN):
+    """
+    Filter kwargs selecting whole local days start_date..end_date (dates or
+    'YYYY-MM-DD') with plain bounds on `field`, so partitions are pruned.
+    """
+    if isinstance(start_date, str):
+        start_date = date.fromisoformat(start_date)
+    if isinstance(end_date, str):
+        end_date = date.fromisoformat(end_date)
+    return {
+        f'{field}__gte': _local_midnight(start_date),
+        f'{field}__lt': _local_midnight(end_date + timedelta(days=1)),
+    }
+
+
+def partition_name(table, month):
+    return f'{table}_p{month:%Y%m}'
+
+
+def is_partitioned(cursor, table):
+    cursor.execute(
+        "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = %s AND c.relnamespace = current_schema()::regnamespace",
+        [table],
+    )
+    return cursor.fetchone() is not None
+
+
+def attached_partitions(cursor, table):
+    """Names of the monthly partitions currently attached to `table`."""
+    cursor.execute(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = %s AND p.relnamespace = current_schema()::regnamespace",
+        [table],
+    )
+    return sorted(name for (name,) in cursor.fetchall() if name != f'{table}_default')
+
+
+def _create_month(cursor, table, month):
+    """
+    Adds the partition for `month`, taking over any of its rows from the
+    default partition (a range overlapping default rows cannot be created
+    directly).
+    """
+    name, qn = partition_name(table, month), connection.ops.quote_name
+    lo, hi = _local_midnight(month), _local_midnight(_add_months(month, 1))
+    cursor.execute(f'CREATE TABLE {qn(name)} (LIKE {qn(table)} INCLUDING DEFAULTS INCLUDING STORAGE)')
+    cursor.execute(
+        f'WITH moved AS (DELETE FROM {qn(table + "_default")} WHERE {PARTITION_COLUMN} >= %s '
+        f'AND {PARTITION_COLUMN} < %s RETURNING *) INSERT INTO {qn(name)} SELECT * FROM moved',
+        [lo, hi],
+    )
+    cursor.execute(f'ALTER TABLE {qn(table)} ATTACH PARTITION {qn(name)} FOR VALUES FROM (%s) TO (%s)', [lo, hi])
+    for columns in local_unique_indexes(cursor, f'{table}_default'):
+        _create_unique(cursor, name, columns)
+    return name
+
+
+def local_unique_indexes(cursor, partition):
+    """Column tuples of the unique indexes a partition has of its own (not inherited from the parent)."""
+    cursor.execute(
+        "SELECT array_agg(a.attname ORDER BY k.ord) FROM pg_index x "
+        "CROSS JOIN unnest(x.indkey) WITH ORDINALITY k(attnum, ord) "
+        "JOIN pg_attribute a ON a.attrelid = x.indrelid AND a.attnum = k.attnum "
+        "WHERE x.indrelid = %s::regclass AND x.indisunique "
+        "AND NOT EXISTS (SELECT 1 FROM pg_inherits i WHERE i.inhrelid = x.indexrelid) "
+        "GROUP BY x.indexrelid ORDER BY x.indexrelid",
+        [partition],
+    )
+    return [tuple(columns) for (columns,) in cursor.fetchall()]
+
+
+def _create_unique(cursor, partition, columns):
+    qn = connection.ops.quote_name
+    cursor.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS {qn(partition + "_" + "_".join(columns) + "_uniq")} '
+                   f'ON {qn(partition)} ({", ".join(map(qn, columns))})')
+
+
+def add_partition_unique(cursor, table, columns):
+    """
+    Unique index on `columns` in every partition of `table` (the months and
+    the default), or on the table itself when it is not partitioned. Postgres
+    only allows unique indexes on the parent that include the partition key;
+    this enforces uniqueness within each month instead.
+    """
+    if not is_partitioned(cursor, table):
+        _create_unique(cursor, table, columns)
+        return
+    for name in attached_partitions(cursor, table) + [f'{table}_default']:
+        _create_unique(cursor, name, columns)
+
+
+def ensure_partitions(table, months_ahead=3):
+    """
+    Creates the monthly partitions from the current month to
+    `months_ahead` months out, plus any month that has rows sitting in the
+    default partition. Returns the partitions created.
+    """
+    qn = connection.ops.quote_name
+    today = timezone.localdate()
+    created = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        if not is_partitioned(cursor, table):
+            return created
+        existing = set(attached_partitions(cursor, table))
+        months = {_add_months(_month_start(today), i) for i in range(months_ahead + 1)}
+        cursor.execute(
+            f"SELECT DISTINCT date_trunc('month', {PARTITION_COLUMN} AT TIME ZONE %s)::date "
+            f"FROM {qn(table + '_default')}",
+            [timezone.get_current_timezone_name()],
+        )
+        months |= {m for (m,) in cursor.fetchall()}
+        for month in sorted(months):
+            if partition_name(table, month) not in existing:
+                created.append(_create_month(cursor, table, month))
+    return created
+
+
+def convert_to_partitioned(cursor, table, indexes=(), unique=(), months_ahead=3):
+    """
+    Rebuilds `table` as a monthly range-partitioned table holding the same
+    rows. The primary key becomes (id, timestamp), `unique` column tuples
+    get the timestamp appended, `indexes` are recreated and foreign keys
+    are copied. Used by the partitioning migration.
+    """
+    qn = connection.ops.quote_name
+    legacy = f'{table}_legacy'
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = %s::regclass AND contype = 'f'",
+        [table],
+    )
+    foreign_keys = cursor.fetchall()
+    cursor.execute(f'ALTER TABLE {qn(table)} RENAME TO {qn(legacy)}')
+    # Frees the <table>_id_seq name for the sequence of the new table
+    cursor.execute(f'ALTER TABLE {qn(legacy)} ALTER COLUMN id DROP IDENTITY IF EXISTS')
+    cursor.execute(
+        f'CREATE TABLE {qn(table)} (LIKE {qn(legacy)} INCLUDING DEFAULTS INCLUDING STORAGE) '
+        f'PARTITION BY RANGE ({PARTITION_COLUMN})'
+    )
+    # Identity columns are not allowed on partitioned tables (before PG 17): use a sequence
+    seq = f'{table}_id_seq'
+    cursor.execute(f'CREATE SEQUENCE {qn(seq)} OWNED BY {qn(table)}.id')
+    cursor.execute(f"ALTER TABLE {qn(table)} ALTER COLUMN id SET DEFAULT nextval('{seq}')")
+    cursor.execute(f'SELECT setval(%s, COALESCE((SELECT MAX(id) FROM {qn(legacy)}), 0) + 1, false)', [seq])
+    cursor.execute(f'CREATE TABLE {qn(table + "_default")} PARTITION OF {qn(table)} DEFAULT')
+
+    cursor.execute(f'SELECT MIN({PARTITION_COLUMN}) FROM {qn(legacy)}')
+    first = cursor.fetchone()[0]
+    month = _month_start(timezone.localtime(first).date() if first else timezone.localdate())
+    last = _add_months(_month_start(timezone.localdate()), months_ahead)
+    while month <= last:
+        _create_month(cursor, table, month)
+        month = _add_months(month, 1)
+
+    cursor.execute(f'INSERT INTO {qn(table)} SELECT * FROM {qn(legacy)}')
+    cursor.execute(f'DROP TABLE {qn(legacy)}')
+
+    cursor.execute(f'ALTER TABLE {qn(table)} ADD PRIMARY KEY (id, {PARTITION_COLUMN})')
+
+    for columns in unique:
+        cols = ', '.join(list(columns) + [PARTITION_COLUMN])
+        cursor.execute(f'ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(table + "_" + "_".join(columns) + "_uniq")} '
+                       f'UNIQUE ({cols})')
+    for columns in indexes:
+        cursor.execute(f'CREATE INDEX {qn(table + "_" + "_".join(columns) + "_idx")} '
+                       f'ON {qn(table)} ({", ".join(columns)})')
+    for name, definition in foreign_keys:
+        cursor.execute(f'ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(name)} {definition}')
+
+
+def archive_partitions(table, retain_months, archive_dir=None, keep_tables=False):
+    """
+    Detaches monthly partitions that end before the last `retain_months`
+    months. With archive_dir each one is written to
+    `<archive_dir>/<schema>/<partition>.csv.gz`; unless keep_tables, the
+    detached table is then dropped. Every archived month is recorded in
+    PartitionArchive. Returns those records.
+    """
+    from .models import PartitionArchive
+
+    qn = connection.ops.quote_name
+    cutoff = _add_months(_month_start(timezone.localdate()), -retain_months)
+    archived = []
+    with connection.cursor() as cursor:
+        if not is_partitioned(cursor, table):
+            return archived
+        for name in attached_partitions(cursor, table):
+            month = datetime.strptime(name.rsplit('_p', 1)[1], '%Y%m').date()
+            if _add_months(month, 1) > cutoff:
+                continue
+            with transaction.atomic():
+                cursor.execute(f'ALTER TABLE {qn(table)} DETACH PARTITION {qn(name)}')
+                cursor.execute(f'SELECT COUNT(*) FROM {qn(name)}')
+                rows = cursor.fetchone()[0]
+                path = ''
+                if archive_dir:
+                    path = os.path.join(archive_dir, connection.schema_name, f'{name}.csv.gz')
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    with gzip.open(path, 'wb') as out:
+                        cursor.copy_expert(f'COPY {qn(name)} TO STDOUT WITH CSV HEADER', out)
+                if not keep_tables:
+                    cursor.execute(f'DROP TABLE {qn(name)}')
+                archived.append(PartitionArchive.objects.create(
+                    table_name=table, partition=name, range_start=_local_midnight(month),
+                    range_end=_local_midnight(_add_months(month, 1)), rows=rows, archive_path=path,
+                    dropped=not keep_tables,
+                ))
+    return archived
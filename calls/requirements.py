@@ -0,0 +1,436 @@
+"""
+Persisted interval staffing requirements.
+
+refresh_staffing_requirements() keeps the StaffingRequirement table in sync
+with CallVolume in one vectorized pass, recomputing only the intervals whose
+inputs (volume, AHT or the queue's SLA / interval / staffing settings)
+changed. Each queue is sized with its own SLA targets on its own planning
+interval. Voice and chat go through the Erlang engine (chat with its AHT
+split over the agent's concurrent sessions); email is deferred work sized
+with a backlog model against its response-time target, in the same batched
+pass, on every slot its response window reaches. load_requirements() is the read side used by the scheduler,
+forecast page, heatmap and reports; combine_requirements() merges queues of
+the same skill group by simple sum or pooled Erlang.
+"""
+from datetime import time, timedelta
+
+import numpy as np
+import pandas as pd
+from django.db import transaction
+from django.db.models import Q
+
+from . import staffing
+from .models import CallVolume, Queue, StaffingRequirement
+
+INTERVAL_SECONDS = 900
+WRITE_BATCH_SIZE = 2000
+
+# How queues sharing a skill group are combined
+POOLING_SUM = 'sum'
+POOLING_POOLED = 'pooled'
+
+# Channels whose work can wait in a backlog instead of a live queue
+DEFERRED_CHANNELS = ('email',)
+
+KEY_COLUMNS = ['queue_id', 'date', 'interval_start', 'is_forecast']
+# When these are unchanged the stored requirement is still valid
+INPUT_COLUMNS = ['calls_offered', 'aht_seconds', 'interval_seconds', 'sla_target_seconds', 'sla_target_percent',
+                 'staffing_model', 'patience_seconds', 'channel', 'concurrency']
+
+
+def _filtered(qs, start_date, end_date, is_forecast):
+    if start_date:
+        qs = qs.filter(date__gte=start_date)
+    if end_date:
+        qs = qs.filter(date__lte=end_date)
+    if is_forecast is not None:
+        qs = qs.filter(is_forecast=is_forecast)
+    return qs
+
+
+def _queue_frame():
+    """Sizing settings of every queue, one row per queue_id."""
+    queues = pd.DataFrame.from_records(
+        Queue.objects.values_list('id', 'interval_minutes', 'sla_target_seconds', 'sla_target_percent',
+                                  'staffing_model', 'avg_patience_seconds', 'channel', 'concurrency'),
+        columns=['queue_id', 'interval_minutes', 'sla_target_seconds', 'sla_target_percent', 'staffing_model',
+                 'patience_seconds', 'channel', 'concurrency'],
+    )
+    queues['interval_seconds'] = (queues['interval_minutes'] * 60).clip(lower=INTERVAL_SECONDS)
+    queues['concurrency'] = queues['concurrency'].clip(lower=1)
+    # Patience only matters (and is only stored) for Erlang A queues
+    queues['patience_seconds'] = queues['patience_seconds'].where(queues['staffing_model'] == staffing.ERLANG_A)
+    return queues.drop(columns='interval_minutes')
+
+
+def _volume_frame(start_date, end_date, is_forecast, queues):
+    qs = _filtered(CallVolume.objects.filter(queue_id__in=queues['queue_id'].tolist()),
+                   start_date, end_date, is_forecast)
+    df = pd.DataFrame.from_records(
+        qs.values_list(*KEY_COLUMNS, 'calls_offered', 'aht_seconds'),
+        columns=KEY_COLUMNS + ['calls_offered', 'aht_seconds'],
+    )
+    if df.empty:
+        return df
+
+    # Collapse duplicate rows of the same interval with a volume-weighted AHT
+    df['handle'] = df['calls_offered'] * df['aht_seconds']
+    df = df.groupby(KEY_COLUMNS, as_index=False).agg(
+        calls_offered=('calls_offered', 'sum'), handle=('handle', 'sum'))
+    df['aht_seconds'] = np.where(
+        df['calls_offered'] > 0, np.round(df['handle'] / df['calls_offered'].clip(lower=1)), 0).astype(int)
+    return df.drop(columns='handle').merge(queues, on='queue_id', how='inner')
+
+
+SLOT_TIMES = np.array([time(s // 4, s % 4 * 15) for s in range(96)], dtype=object)
+
+
+def _slots(times):
+    return np.array([t.hour * 4 + t.minute // 15 for t in times], dtype=int)
+
+
+def _fill_buckets(df):
+    """
+    Adds the 15-min slots of each planning interval that have no CallVolume
+    row (no calls), so the interval's requirement lands on all its slots.
+    """
+    width = (df['interval_seconds'] // INTERVAL_SECONDS).to_numpy(dtype=int)
+    if (width <= 1).all():
+        return df
+    slot = _slots(df['interval_start'])
+    source = np.repeat(np.arange(len(df)), width)
+    offset = np.arange(len(source)) - np.repeat(np.cumsum(width) - width, width)
+    slots = np.repeat(slot - slot % width, width) + offset
+    keep = slots < len(SLOT_TIMES)
+    filler = df.iloc[source[keep]].assign(interval_start=SLOT_TIMES[slots[keep]], calls_offered=0, aht_seconds=0)
+    # Rows with volume come first and win over their filler copy
+    return pd.concat([df, filler], ignore_index=True).drop_duplicates(KEY_COLUMNS).reset_index(drop=True)
+
+
+def _planning_buckets(df):
+    """
+    Rolls each 15-min row up to its queue's planning interval: returns the
+    bucket key and the bucket's total volume and volume-weighted AHT.
+    """
+    bucket = _slots(df['interval_start']) // (df['interval_seconds'].to_numpy() // INTERVAL_SECONDS)
+    keys = [df['queue_id'], df['date'], df['is_forecast'], pd.Series(bucket, index=df.index)]
+    calls = df.groupby(keys)['calls_offered'].transform('sum')
+    handle = (df['calls_offered'] * df['aht_seconds']).groupby(keys).transform('sum')
+    aht = np.where(calls > 0, handle / calls.clip(lower=1), df['aht_seconds'].groupby(keys).transform('max'))
+    return bucket, calls, aht
+
+
+def _response_window(df):
+    return np.maximum(df['sla_target_seconds'], df['interval_seconds']).to_numpy(dtype=np.int64)
+
+
+def _backlog_reach(queues):
+    """Whole days the longest response window of the deferred queues spans."""
+    deferred = queues[queues['channel'].isin(DEFERRED_CHANNELS)]
+    return timedelta(days=int(-(-_response_window(deferred).max(initial=0) // 86400)))
+
+
+def _backlog_traffic(df):
+    """
+    Backlog model for deferred work: everything that arrived within the
+    response window up to an interval is worked off evenly over that window,
+    so the load is the window's work divided by its length. Vectorized over
+    all queues with one cumulative sum and a sorted search; forecast and
+    actual rows of a queue are separate backlogs.
+    """
+    window = _response_window(df)
+    day = pd.to_datetime(df['date']).to_numpy().astype('datetime64[s]').astype(np.int64)
+    ts = day + np.array([t.hour * 3600 + t.minute * 60 for t in df['interval_start']], dtype=np.int64)
+    queue_rank = df.groupby(['queue_id', 'is_forecast'], sort=False).ngroup().to_numpy(dtype=np.int64)
+    key = queue_rank * 10 ** 11 + ts
+
+    order = np.argsort(key, kind='stable')
+    key, window = key[order], window[order]
+    work = (df['calls_offered'] * df['aht_seconds']).to_numpy(dtype=float)[order]
+    cum = np.concatenate([[0.0], np.cumsum(work)])
+    # First row of the same queue / flag inside (t - window, t]
+    first = np.searchsorted(key, key - window + 1, side='left')
+    load = np.empty(len(df))
+    load[order] = (cum[1:] - cum[first]) / window
+    return load
+
+
+def _backlog_frame(start_date, end_date, is_forecast, queues):
+    """
+    Deferred-channel rows for the range with their backlog load in
+    'backlog_erlangs': every 15-min slot from start_date to one response
+    window past end_date, per queue and forecast flag, so work carried into
+    slots without arrivals (overnight, the next morning) is staffed too.
+    Arrivals up to one window before start_date count towards the load.
+    Slots with neither arrivals nor load are left out.
+    """
+    reach = _backlog_reach(queues)
+    df = _volume_frame(start_date and start_date - reach, end_date and end_date + reach, is_forecast, queues)
+    if df.empty:
+        return df
+
+    grids = []
+    for (queue_id, flag), rows in df.groupby(['queue_id', 'is_forecast']):
+        days = pd.date_range(rows['date'].min(), end_date + reach if end_date else rows['date'].max() + reach).date
+        grids.append(pd.DataFrame({
+            'queue_id': queue_id, 'is_forecast': flag,
+            'date': np.repeat(days, len(SLOT_TIMES)), 'interval_start': np.tile(SLOT_TIMES, len(days)),
+        }))
+    grid = pd.concat(grids, ignore_index=True).merge(
+        df[KEY_COLUMNS + ['calls_offered', 'aht_seconds']], on=KEY_COLUMNS, how='left')
+    grid[['calls_offered', 'aht_seconds']] = grid[['calls_offered', 'aht_seconds']].fillna(0).astype(int)
+    grid = grid.merge(queues, on='queue_id', how='inner')
+    grid['backlog_erlangs'] = _backlog_traffic(grid)
+
+    keep = (np.round(grid['backlog_erlangs'], 6) > 0) | (grid['calls_offered'] > 0)
+    if start_date:
+        keep &= grid['date'] >= start_date
+    return grid[keep].reset_index(drop=True)
+
+
+def offered_traffic(df):
+    """
+    Seat traffic in Erlangs for every row, rolled up to each queue's planning
+    interval. Returns (bucket, bucket AHT, traffic); AHT is per contact, the
+    traffic already accounts for concurrency.
+    """
+    bucket, calls, aht = _planning_buckets(df)
+    concurrency = df['concurrency'].clip(lower=1).to_numpy()
+    traffic = staffing.traffic_intensity(calls, aht / concurrency, df['interval_seconds'])
+    deferred = df['channel'].isin(DEFERRED_CHANNELS).to_numpy()
+    if deferred.any():
+        # _backlog_frame() rows carry the load of their whole window
+        load = df['backlog_erlangs'].to_numpy(dtype=float)[deferred] if 'backlog_erlangs' in df \
+            else _backlog_traffic(df[deferred])
+        traffic[deferred] = load / concurrency[deferred]
+    return bucket, aht, traffic
+
+
+def compute_required(df, traffic, staffing_model=None):
+    """
+    Batched required agents for a frame of intervals and their seat traffic,
+    one engine call per staffing model. Deferred channels need just enough
+    agents to carry the backlog load. staffing_model overrides each row's
+    own model.
+    """
+    traffic = np.asarray(traffic, dtype=float)
+    required = np.zeros(len(df), dtype=int)
+    deferred = df['channel'].isin(DEFERRED_CHANNELS).to_numpy()
+    required[deferred] = np.ceil(np.round(traffic[deferred], 6))
+
+    # A chat agent with N sessions is one seat working at N times the rate
+    aht = df['aht_seconds'].to_numpy(dtype=float) / df['concurrency'].clip(lower=1).to_numpy()
+    patience = pd.to_numeric(df['patience_seconds'], errors='coerce').fillna(np.inf).to_numpy()
+    models = df['staffing_model'] if staffing_model is None else pd.Series(staffing_model, index=df.index)
+    for model in models[~deferred].unique():
+        mask = (models == model).to_numpy() & ~deferred
+        required[mask] = staffing.required_agents(
+            traffic[mask],
+            aht[mask],
+            df['sla_target_seconds'].to_numpy()[mask],
+            df['sla_target_percent'].to_numpy()[mask],
+            model=model,
+            patience=patience[mask],
+        )
+    return required
+
+
+def refresh_staffing_requirements(start_date=None, end_date=None, is_forecast=None):
+    """
+    Brings StaffingRequirement in line with CallVolume for the given range
+    (None = unbounded) and forecast flag (None = both). Returns counts of
+    computed / unchanged / deleted intervals. Deferred channels are brought
+    in line up to one response window past end_date.
+    """
+    queues = _queue_frame()
+    deferred = queues['channel'].isin(DEFERRED_CHANNELS)
+    live = _volume_frame(start_date, end_date, is_forecast, queues[~deferred])
+    parts = [part for part in (live if live.empty else _fill_buckets(live),
+                               _backlog_frame(start_date, end_date, is_forecast, queues[deferred]))
+             if not part.empty]
+    volumes = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+    if not volumes.empty:
+        bucket, bucket_aht, offered = offered_traffic(volumes)
+        # Every slot of a planning interval stores the interval's AHT and
+        # traffic, the pair it was sized with
+        volumes = volumes.assign(aht_seconds=np.round(bucket_aht).astype(int), traffic=offered, bucket=bucket)
+
+    existing_qs = _filtered(StaffingRequirement.objects.all(), start_date, None, is_forecast)
+    if end_date:
+        existing_qs = existing_qs.filter(
+            Q(date__lte=end_date)
+            | Q(queue_id__in=queues.loc[deferred, 'queue_id'].tolist(), date__lte=end_date + _backlog_reach(queues)))
+    existing = pd.DataFrame.from_records(
+        existing_qs.values_list('id', *KEY_COLUMNS, *INPUT_COLUMNS, 'traffic_erlangs'),
+        columns=['id'] + KEY_COLUMNS + INPUT_COLUMNS + ['traffic_erlangs'],
+    )
+
+    if volumes.empty:
+        stale_ids = existing['id'].tolist()
+        changed = volumes
+    else:
+        merged = volumes.merge(existing, on=KEY_COLUMNS, how='outer', suffixes=('', '_stored'), indicator=True)
+        stale_ids = merged.loc[merged['_merge'] == 'right_only', 'id'].astype(int).tolist()
+
+        current = merged[merged['_merge'] != 'right_only'].reset_index(drop=True)
+        differs = current['_merge'] == 'left_only'
+        for col in INPUT_COLUMNS:
+            new, old = current[col], current[f'{col}_stored']
+            differs |= ~((new == old) | (new.isna() & old.isna()))
+
+        # A change anywhere in a planning interval resizes the whole interval
+        differs = differs.groupby(
+            [current['queue_id'], current['date'], current['is_forecast'], current['bucket']]).transform('any')
+        # Backlog load also moves when a neighbouring interval changed
+        differs |= ~np.isclose(current['traffic'].to_numpy(dtype=float),
+                               pd.to_numeric(current['traffic_erlangs']).fillna(-1).to_numpy(dtype=float))
+        changed = current.loc[differs.to_numpy(), KEY_COLUMNS + INPUT_COLUMNS].reset_index(drop=True)
+        traffic = current.loc[differs.to_numpy(), 'traffic'].to_numpy(dtype=float)
+
+    rows = []
+    if not changed.empty:
+        required = compute_required(changed, traffic)
+        patience = changed['patience_seconds'].astype(object).where(changed['patience_seconds'].notna(), None)
+        for rec, a, n, p in zip(changed.itertuples(index=False), traffic, required, patience):
+            rows.append(StaffingRequirement(
+                queue_id=rec.queue_id,
+                date=rec.date,
+                interval_start=rec.interval_start,
+                is_forecast=rec.is_forecast,
+                interval_seconds=int(rec.interval_seconds),
+                calls_offered=int(rec.calls_offered),
+                aht_seconds=int(rec.aht_seconds),
+                traffic_erlangs=float(a),
+                sla_target_seconds=int(rec.sla_target_seconds),
+                sla_target_percent=float(rec.sla_target_percent),
+                staffing_model=rec.staffing_model,
+                patience_seconds=int(p) if p is not None else None,
+                channel=rec.channel,
+                concurrency=int(rec.concurrency),
+                required_agents=int(n),
+            ))
+
+    with transaction.atomic():
+        if stale_ids:
+            StaffingRequirement.objects.filter(id__in=stale_ids).delete()
+        for i in range(0, len(rows), WRITE_BATCH_SIZE):
+            StaffingRequirement.objects.bulk_create(
+                rows[i:i + WRITE_BATCH_SIZE],
+                update_conflicts=True,
+                unique_fields=['queue', 'date', 'interval_start', 'is_forecast'],
+                update_fields=['interval_seconds', 'calls_offered', 'aht_seconds', 'traffic_erlangs',
+                               'sla_target_seconds', 'sla_target_percent', 'staffing_model',
+                               'patience_seconds', 'channel', 'concurrency', 'required_agents', 'computed_at'],
+            )
+
+    return {
+        'computed': len(rows),
+        'unchanged': len(volumes) - len(rows),
+        'deleted': len(stale_ids),
+    }
+
+
+def load_requirements(start_date, end_date, queue_id=None, prefer_forecast=True):
+    """
+    Stored requirements for the range as a DataFrame, one row per
+    (queue, date, interval). With prefer_forecast, dates that have forecast
+    rows use them and the remaining dates fall back to actuals.
+    """
+    qs = StaffingRequirement.objects.filter(date__range=(start_date, end_date))
+    if queue_id:
+        qs = qs.filter(queue_id=queue_id)
+    columns = KEY_COLUMNS + INPUT_COLUMNS + ['traffic_erlangs', 'required_agents']
+    df = pd.DataFrame.from_records(
+        qs.values_list(*columns, 'queue__required_skill_id'), columns=columns + ['skill_id'])
+    if df.empty:
+        return df.assign(slot=pd.Series(dtype=int))
+
+    if prefer_forecast:
+        forecast_dates = df.loc[df['is_forecast'], 'date'].unique()
+        df = df[df['is_forecast'] | ~df['date'].isin(forecast_dates)]
+
+    df = df.reset_index(drop=True)
+    df['slot'] = _slots(df['interval_start'])
+    return df
+
+
+def combine_requirements(reqs, pooling=POOLING_SUM, staffing_model=None):
+    """
+    Requirement per skill group (queues sharing Queue.required_skill; queues
+    without a skill form one general group), date and 15-min slot.
+
+    sum:    per-queue requirements added up.
+    pooled: the group's traffic is sized as one Erlang queue with the
+            strictest SLA of its members (Erlang A only if every member is).
+    staffing_model overrides the stored per-queue model.
+
+    When reqs carries a 'shrinkage' column (calls.shrinkage.apply_shrinkage)
+    the group gets the workload-weighted shrinkage of its queues and a
+    'gross_agents' column.
+    """
+    if reqs.empty:
+        return pd.DataFrame(columns=['skill_id', 'date', 'slot', 'required_agents'])
+
+    reqs = reqs.assign(skill_id=pd.to_numeric(reqs['skill_id']).fillna(-1).astype(int))
+    if staffing_model:
+        reqs = reqs.assign(staffing_model=staffing_model)
+        reqs = reqs.assign(required_agents=compute_required(reqs, reqs['traffic_erlangs']))
+    keys = ['skill_id', 'date', 'slot']
+
+    if pooling != POOLING_POOLED:
+        groups = reqs.groupby(keys, as_index=False)['required_agents'].sum()
+        return _with_shrinkage(groups, reqs, reqs['required_agents'], keys)
+
+    # Backlog work is not pooled; live channels pool per skill and channel
+    deferred = reqs['channel'].isin(DEFERRED_CHANNELS)
+    groups = reqs[deferred].groupby(keys, as_index=False)['required_agents'].sum()
+    live = reqs[~deferred]
+    if not live.empty:
+        groups = pd.concat([groups, _pooled(live, keys)]).groupby(keys, as_index=False)['required_agents'].sum()
+    return _with_shrinkage(groups, reqs, reqs['traffic_erlangs'], keys)
+
+
+def _pooled(reqs, keys):
+    # Traffic adds up across queues; AHT and patience are traffic-weighted
+    seat_aht = reqs['aht_seconds'] / reqs['concurrency'].clip(lower=1)
+    reqs = reqs.assign(
+        rate=reqs['traffic_erlangs'] / seat_aht.clip(lower=1),
+        patience_weight=reqs['traffic_erlangs'] * pd.to_numeric(reqs['patience_seconds'], errors='coerce').fillna(0),
+        is_erlang_a=reqs['staffing_model'] == staffing.ERLANG_A,
+    )
+    pooled = reqs.groupby(keys + ['channel'], as_index=False).agg(
+        traffic=('traffic_erlangs', 'sum'),
+        rate=('rate', 'sum'),
+        patience_weight=('patience_weight', 'sum'),
+        sla_target_seconds=('sla_target_seconds', 'min'),
+        sla_target_percent=('sla_target_percent', 'max'),
+        all_erlang_a=('is_erlang_a', 'all'),
+    )
+    with np.errstate(divide='ignore', invalid='ignore'):
+        aht = np.where(pooled['rate'] > 0, pooled['traffic'] / pooled['rate'], 0)
+        patience = np.where(pooled['traffic'] > 0, pooled['patience_weight'] / pooled['traffic'], np.inf)
+
+    required = np.zeros(len(pooled), dtype=int)
+    for model, mask in ((staffing.ERLANG_A, pooled['all_erlang_a'].to_numpy()),
+                        (staffing.ERLANG_C, ~pooled['all_erlang_a'].to_numpy())):
+        if mask.any():
+            required[mask] = staffing.required_agents(
+                pooled['traffic'].to_numpy()[mask], aht[mask],
+                pooled['sla_target_seconds'].to_numpy()[mask], pooled['sla_target_percent'].to_numpy()[mask],
+                model=model, patience=patience[mask],
+            )
+    pooled['required_agents'] = required
+    return pooled[keys + ['required_agents']]
+
+
+def _with_shrinkage(groups, reqs, weight, keys):
+    if 'shrinkage' not in reqs.columns:
+        return groups
+    from .shrinkage import gross_agents
+
+    weighted = reqs.assign(w=weight, ws=weight * reqs['shrinkage'], s=reqs['shrinkage'])
+    agg = weighted.groupby(keys, as_index=False).agg(w=('w', 'sum'), ws=('ws', 'sum'), s=('s', 'mean'))
+    groups = groups.merge(agg, on=keys, how='left')
+    groups['shrinkage'] = np.where(groups['w'] > 0, groups['ws'] / groups['w'].where(groups['w'] > 0, 1), groups['s'])
+    groups['gross_agents'] = gross_agents(groups['required_agents'], groups['shrinkage'])
+    return groups.drop(columns=['w', 'ws', 's'])
@@ -0,0 +1,138 @@
+"""
+Hour / day / ISO-week rollups of CallVolume.
+
+refresh_rollups() rebuilds CallVolumeRollup for a date range with one
+INSERT ... SELECT per grain, straight from the 15-min CallVolume rows: hour
+and day rows for the days in the range, week rows for the ISO weeks
+touching it. It is called wherever CallVolume is written: the
+actuals aggregation, the streaming counters and forecast generation.
+
+volume_totals() answers "calls and AHT per hour / day / week / whole range"
+from the coarsest rollup that fits: full ISO weeks come from week rows and
+only the partial weeks at the edges from day rows, so a 30-day report reads
+a few dozen rows instead of thousands of intervals or raw calls.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import connection, transaction
+
+from .models import CallVolume, CallVolumeRollup
+
+GRAIN_HOUR = 'hour'
+GRAIN_DAY = 'day'
+GRAIN_WEEK = 'week'
+GRAIN_TOTAL = 'total'
+
+# Postgres date_trunc('week') is the ISO week start (Monday)
+_GRAIN_SQL = {
+    GRAIN_HOUR: ('v.date', 'EXTRACT(HOUR FROM v.interval_start)::int'),
+    GRAIN_DAY: ('v.date', '0'),
+    GRAIN_WEEK: ("date_trunc('week', v.date)::date", '0'),
+}
+
+
+def week_start(d):
+    return d - timedelta(days=d.weekday())
+
+
+def _ranges(start_date, end_date, grain):
+    """Date range a grain's rows are rebuilt for: week rows cover whole ISO weeks."""
+    if grain != GRAIN_WEEK:
+        return start_date, end_date
+    return (start_date and week_start(start_date),
+            end_date and week_start(end_date) + timedelta(days=6))
+
+
+def refresh_rollups(start_date=None, end_date=None, queue_ids=None):
+    """
+    Recomputes the rollups of the range (None = unbounded) and the given
+    queues (None = all): hour and day rows for the touched days only, week
+    rows for the ISO weeks touching the range.
+    """
+    rollup_table = connection.ops.quote_name(CallVolumeRollup._meta.db_table)
+    volume_table = connection.ops.quote_name(CallVolume._meta.db_table)
+    with transaction.atomic(), connection.cursor() as cursor:
+        for grain, (date_sql, hour_sql) in _GRAIN_SQL.items():
+            lo, hi = _ranges(start_date, end_date, grain)
+            where, params = [], []
+            stale = CallVolumeRollup.objects.filter(grain=grain)
+            if lo:
+                where.append('v.date >= %s')
+                params.append(lo)
+                stale = stale.filter(date__gte=lo)
+            if hi:
+                where.append('v.date <= %s')
+                params.append(hi)
+                stale = stale.filter(date__lte=hi)
+            if queue_ids is not None:
+                where.append('v.queue_id = ANY(%s)')
+                params.append(list(queue_ids))
+                stale = stale.filter(queue_id__in=queue_ids)
+            where_sql = ('WHERE ' + ' AND '.join(where)) if where else ''
+
+            stale.delete()
+            cursor.execute(
+                f'INSERT INTO {rollup_table} '
+                '(queue_id, grain, date, hour, calls_offered, handle_seconds, is_forecast) '
+                f'SELECT v.queue_id, %s, {date_sql}, {hour_sql}, SUM(v.calls_offered), '
+                'SUM(v.calls_offered::bigint * v.aht_seconds), v.is_forecast '
+                f'FROM {volume_table} v {where_sql} '
+                'GROUP BY 1, 3, 4, 7',
+                [grain] + params,
+            )
+
+
+def _plan(start_date, end_date, grain):
+    """
+    (stored grain, first date, last date) pieces covering the range with
+    the coarsest rows that still fit the requested grain.
+    """
+    if grain in (GRAIN_HOUR, GRAIN_DAY):
+        return [(grain, start_date, end_date)]
+    first_week = week_start(start_date + timedelta(days=6))
+    last_week = week_start(end_date + timedelta(days=1)) - timedelta(days=7)
+    if first_week > last_week:
+        return [(GRAIN_DAY, start_date, end_date)]
+    pieces = [(GRAIN_WEEK, first_week, last_week)]
+    if start_date < first_week:
+        pieces.append((GRAIN_DAY, start_date, first_week - timedelta(days=1)))
+    if end_date > last_week + timedelta(days=6):
+        pieces.append((GRAIN_DAY, last_week + timedelta(days=7), end_date))
+    return pieces
+
+
+def volume_totals(start_date, end_date, grain=GRAIN_DAY, queue_id=None, is_forecast=False, by_queue=False):
+    """
+    Calls offered and call-weighted AHT per period, ordered by period.
+
+    grain is 'hour' (period = (date, hour)), 'day' (date), 'week' (Monday
+    of the ISO week; edge weeks are partial) or 'total' (one row, period
+    None). by_queue splits each period per queue_id.
+    """
+    totals = defaultdict(lambda: [0, 0])
+    for stored, lo, hi in _plan(start_date, end_date, grain):
+        rows = CallVolumeRollup.objects.filter(grain=stored, is_forecast=is_forecast, date__range=(lo, hi))
+        if queue_id:
+            rows = rows.filter(queue_id=queue_id)
+        for q, d, hour, calls, handle in rows.values_list(
+                'queue_id', 'date', 'hour', 'calls_offered', 'handle_seconds').iterator():
+            if grain == GRAIN_HOUR:
+                period = (d, hour)
+            elif grain == GRAIN_WEEK:
+                period = week_start(d)
+            elif grain == GRAIN_TOTAL:
+                period = None
+            else:
+                period = d
+            counter = totals[(period, q if by_queue else None)]
+            counter[0] += calls
+            counter[1] += handle
+
+    result = []
+    for (period, q), (calls, handle) in sorted(totals.items(), key=lambda kv: (kv[0][0] or 0, kv[0][1] or 0)):
+        row = {'period': period, 'calls_offered': calls, 'aht_seconds': round(handle / calls) if calls else 0}
+        if by_queue:
+            row['queue_id'] = q
+        result.append(row)
+    return result
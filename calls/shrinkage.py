@@ -0,0 +1,124 @@
+"""
+Net-to-gross staffing.
+
+Erlang requirements are net seats: agents that must be logged in and taking
+calls. build_shrinkage_grid() resolves ShrinkageRule rows (plus template
+breaks) into one (queue, weekday, 15-min slot) array, and apply_shrinkage()
+looks every requirement row of the horizon up in it at once to get the gross
+headcount that has to be rostered.
+"""
+import numpy as np
+import pandas as pd
+from django.db.models import Count
+
+from agents.models import AgentProfile, ShiftTemplateActivity
+from .models import ShrinkageRule
+
+SLOTS_PER_DAY = 96
+# Never plan for more than this share of paid time being lost
+MAX_SHRINKAGE = 0.9
+BREAK_ACTIVITIES = ('BREAK', 'LUNCH')
+
+
+def _slot(t):
+    return t.hour * 4 + t.minute // 15
+
+
+def _specificity(rule):
+    return ((rule.team_id is not None) * 8 + (rule.queue_id is not None) * 4
+            + (rule.weekday is not None) * 2 + (rule.start_time is not None or rule.end_time is not None))
+
+
+def break_shrinkage():
+    """
+    Share of paid time spent on template breaks and lunches, averaged over
+    active agents by their shift type.
+    """
+    agents = pd.DataFrame.from_records(
+        AgentProfile.objects.filter(user__is_active=True, shift_type__isnull=False)
+        .values_list('shift_type_id', 'shift_type__duration_hours'),
+        columns=['shift_type_id', 'duration_hours'],
+    )
+    if agents.empty:
+        return 0.0
+    breaks = pd.DataFrame.from_records(
+        ShiftTemplateActivity.objects.filter(activity_type__in=BREAK_ACTIVITIES)
+        .values_list('shift_type_id', 'duration_minutes'),
+        columns=['shift_type_id', 'duration_minutes'],
+    )
+    minutes = agents['shift_type_id'].map(breaks.groupby('shift_type_id')['duration_minutes'].sum()).fillna(0)
+    return float((minutes / (agents['duration_hours'] * 60).clip(lower=1)).mean())
+
+
+def _paint(rules, queue_pos, grid):
+    # Less specific rules first so more specific ones overwrite them
+    slots = np.arange(SLOTS_PER_DAY)
+    for rule in sorted(rules, key=_specificity):
+        if rule.queue_id is not None and rule.queue_id not in queue_pos:
+            continue
+        q = slice(None) if rule.queue_id is None else queue_pos[rule.queue_id]
+        d = slice(None) if rule.weekday is None else rule.weekday
+        lo = _slot(rule.start_time) if rule.start_time else 0
+        hi = _slot(rule.end_time) if rule.end_time else SLOTS_PER_DAY
+        # A range like 22:00-06:00 wraps past midnight
+        in_range = (slots >= lo) & (slots < hi) if lo < hi else (slots >= lo) | (slots < hi)
+        grid[q, d, in_range] = rule.planned_percent + rule.unplanned_percent
+    return grid
+
+
+def build_shrinkage_grid(queue_ids, include_breaks=True):
+    """
+    Total shrinkage per (queue, weekday, slot), shape (len(queue_ids), 7, 96).
+    Team rules apply to their team's agents only, so the grid blends each
+    team's view by active headcount.
+    """
+    queue_pos = {qid: i for i, qid in enumerate(queue_ids)}
+    shape = (len(queue_ids), 7, SLOTS_PER_DAY)
+    rules = list(ShrinkageRule.objects.filter(is_active=True))
+    general = [r for r in rules if r.team_id is None]
+
+    grid = _paint(general, queue_pos, np.zeros(shape))
+    team_ids = {r.team_id for r in rules if r.team_id is not None}
+    if team_ids:
+        headcount = dict(
+            AgentProfile.objects.filter(user__is_active=True)
+            .values('team_id').annotate(n=Count('id')).values_list('team_id', 'n')
+        )
+        total = sum(headcount.values())
+        if total:
+            blended = grid * sum(n for t, n in headcount.items() if t not in team_ids)
+            for team_id in team_ids:
+                if headcount.get(team_id):
+                    team_rules = general + [r for r in rules if r.team_id == team_id]
+                    blended += headcount[team_id] * _paint(team_rules, queue_pos, np.zeros(shape))
+            grid = blended / total
+
+    if include_breaks:
+        grid = grid + break_shrinkage()
+    return np.clip(grid, 0.0, MAX_SHRINKAGE)
+
+
+def gross_agents(net, shrinkage):
+    gross = np.asarray(net, dtype=float) / (1.0 - np.asarray(shrinkage, dtype=float))
+    # Round first so 8 / 0.8 stays 10 instead of ceiling to 11
+    return np.ceil(np.round(gross, 6)).astype(int)
+
+
+def apply_shrinkage(reqs, include_breaks=True):
+    """
+    Adds 'shrinkage' and 'gross_agents' columns to a requirement frame from
+    load_requirements() (needs queue_id, date, slot, required_agents).
+    include_breaks=False leaves template breaks out, for callers whose
+    coverage already takes agents off the phone during breaks.
+    """
+    if reqs.empty:
+        return reqs.assign(shrinkage=pd.Series(dtype=float), gross_agents=pd.Series(dtype=int))
+
+    queue_ids = np.sort(reqs['queue_id'].unique())
+    grid = build_shrinkage_grid(queue_ids, include_breaks=include_breaks)
+    shrinkage = grid[
+        np.searchsorted(queue_ids, reqs['queue_id'].to_numpy()),
+        pd.to_datetime(reqs['date']).dt.weekday.to_numpy(),
+        reqs['slot'].to_numpy(),
+    ]
+    return reqs.assign(shrinkage=shrinkage, gross_agents=gross_agents(reqs['required_agents'], shrinkage))
@@ -0,0 +1,17 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .aggregation import call_bucket, mark_dirty
+from .models import Call
+
+
+@receiver(post_save, sender=Call)
+def call_saved(sender, instance, **kwargs):
+    # Both the bucket the call is in now and the one it was counted in before
+    buckets = [call_bucket(instance.queue_id, instance.timestamp)]
+    loaded = getattr(instance, '_loaded_bucket', None)
+    if loaded:
+        buckets.append(call_bucket(*loaded))
+    mark_dirty(buckets)
+    instance._loaded_bucket = (instance.queue_id, instance.timestamp)
+
@@ -0,0 +1,181 @@
+"""
+Special-day calendar (holidays, campaigns, outlier days) for forecasting.
+
+- History: actuals on SpecialDay dates flagged exclude_from_history are
+  dropped by load_history() through one boolean mask built per calendar
+  entry over the whole frame. Models see those days as missing: averages
+  skip them, the series models fill them from the week before and the
+  top-down level ignores them.
+- Forecast: each entry's adjustment is laid out once as (queues, days)
+  arrays - a factor and an optional replacement weekday - and applied to
+  the forecast array in forecast_intervals(). Queue-specific entries win
+  over all-queue ones.
+- Reruns: after a calendar change, rerun_dates() recomputes only the
+  affected future dates of the active forecast runs and writes just those
+  dates back (rerun_special_day() picks them: the entry's own dates, or
+  every future date of its queues when its history exclusion changes the
+  models' input).
+
+The calendar is passed around as a plain DataFrame (load_calendar()) so
+forecasting stays usable without the database.
+"""
+import hashlib
+from datetime import date
+
+import numpy as np
+import pandas as pd
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ForecastRun, SpecialDay
+
+CALENDAR_COLUMNS = ['queue_id', 'start_date', 'end_date', 'adjustment', 'factor', 'like_weekday',
+                    'exclude_from_history']
+
+
+def load_calendar():
+    """All SpecialDay entries as a frame (dates as datetime64)."""
+    df = pd.DataFrame.from_records(SpecialDay.objects.values_list(*CALENDAR_COLUMNS), columns=CALENDAR_COLUMNS)
+    df['start_date'] = pd.to_datetime(df['start_date'])
+    df['end_date'] = pd.to_datetime(df['end_date'])
+    return df
+
+
+def calendar_key(calendar):
+    """Fingerprint of a load_calendar() frame, for forecast run hashes."""
+    rows = sorted(map(repr, calendar[CALENDAR_COLUMNS].itertuples(index=False, name=None)))
+    return hashlib.md5('|'.join(rows).encode()).hexdigest()
+
+
+def _by_scope(calendar):
+    # All-queue entries first so queue-specific ones override them
+    return calendar.assign(_scoped=calendar['queue_id'].notna()).sort_values('_scoped', kind='stable')
+
+
+def history_mask(history, calendar):
+    """Boolean array marking load_history() rows that fall on excluded special days."""
+    mask = np.zeros(len(history), dtype=bool)
+    if history.empty or calendar.empty:
+        return mask
+    dates = history['date'].to_numpy()
+    queues = history['queue_id'].to_numpy()
+    for entry in calendar[calendar['exclude_from_history']].itertuples(index=False):
+        hit = (dates >= entry.start_date.to_datetime64()) & (dates <= entry.end_date.to_datetime64())
+        if not pd.isna(entry.queue_id):
+            hit &= queues == entry.queue_id
+        mask |= hit
+    return mask
+
+
+def adjustment_arrays(calendar, queue_ids, dates):
+    """
+    (factor, like_weekday) arrays of shape (queues, days) for the forecast
+    range; like_weekday is -1 where the day keeps its own profile.
+    """
+    factor = np.ones((len(queue_ids), len(dates)))
+    like = np.full((len(queue_ids), len(dates)), -1)
+    if calendar is None or calendar.empty:
+        return factor, like
+    days = dates.to_numpy()
+    for entry in _by_scope(calendar).itertuples(index=False):
+        cols = (days >= entry.start_date.to_datetime64()) & (days <= entry.end_date.to_datetime64())
+        rows = np.ones(len(queue_ids), dtype=bool) if pd.isna(entry.queue_id) else queue_ids == entry.queue_id
+        if not cols.any() or not rows.any():
+            continue
+        cells = np.ix_(rows, cols)
+        if entry.adjustment == SpecialDay.ADJUST_NONE:
+            factor[cells], like[cells] = 1.0, -1
+        else:
+            factor[cells] = entry.factor
+            replace = entry.adjustment == SpecialDay.ADJUST_REPLACE and not pd.isna(entry.like_weekday)
+            like[cells] = int(entry.like_weekday) if replace else -1
+    return factor, like
+
+
+def apply_adjustments(values, profile, fallback, queue_ids, dates, calendar):
+    """
+    Applies the calendar to a forecast array (queues, days, 96, [calls, aht])
+    in place. Replacement days take the calls of the queue's weekday
+    profile (queues, 7, 96, 2) for like_weekday (fallback where missing).
+    """
+    factor, like = adjustment_arrays(calendar, queue_ids, dates)
+    q, d = np.nonzero(like >= 0)
+    if len(q):
+        shape = profile[q, like[q, d], :, 0]
+        values[q, d, :, 0] = np.where(np.isnan(shape), fallback[q, :, 0], shape)
+    values[..., 0] *= factor[:, :, None]
+    return values
+
+
+def rerun_dates(start_date, end_date, queue_id=None):
+    """
+    Recomputes the active forecast runs for the future dates in the range
+    (one queue or all) with the current calendar and writes only those
+    dates back. The rest of each run is left as stored. Returns the dates
+    rewritten.
+    """
+    from . import forecast_runs, forecasting
+    from .intraday import MODEL_SNAPSHOT
+    from .requirements import refresh_staffing_requirements
+    from .rollups import refresh_rollups
+    from .volumes import replace_volumes
+
+    start_date = max(start_date, timezone.localdate())
+    if start_date > end_date:
+        return []
+    runs = list(ForecastRun.objects.filter(is_active=True, start_date__lte=end_date, end_date__gte=start_date)
+                .exclude(model_type=MODEL_SNAPSHOT))
+    if not runs:
+        return []
+    calendar = load_calendar()
+    history = forecasting.load_history(calendar=calendar)
+    key = calendar_key(calendar)
+    # The rerun reads today's actuals, so the runs are re-keyed to them too
+    actuals = forecast_runs.actuals_key()
+    queue_ids = None if queue_id is None else [queue_id]
+    times = forecasting.slot_time(range(forecasting.SLOTS_PER_DAY))
+    columns = ['queue_id', 'day', 'slot', 'calls', 'aht']
+    rewritten = set()
+
+    for run in runs:
+        lo, hi = max(start_date, run.start_date), min(end_date, run.end_date)
+        run_dates = pd.date_range(run.start_date, run.end_date).date
+        stored = pd.DataFrame(run.intervals, columns=columns)
+        drop = stored['day'].between((lo - run.start_date).days, (hi - run.start_date).days)
+        if queue_id is not None:
+            drop &= stored['queue_id'] == queue_id
+        parts = [stored[~drop]]
+
+        with transaction.atomic():
+            forecast = forecasting.forecast_intervals(history, lo, hi, run.model_type, calendar=calendar)
+            if queue_id is not None:
+                forecast = forecast[forecast['queue_id'] == queue_id]
+            packed = pd.DataFrame(forecast_runs.pack_intervals(forecast, run.start_date), columns=columns)
+            parts.append(packed)
+            replace_volumes(
+                ((q, run_dates[d], times[s], c, a) for q, d, s, c, a in packed.itertuples(index=False, name=None)),
+                True, lo, hi, queue_ids=queue_ids,
+            )
+            refresh_rollups(lo, hi, queue_ids)
+            refresh_staffing_requirements(lo, hi, is_forecast=True)
+
+            merged = pd.concat(parts, ignore_index=True).sort_values(['day', 'queue_id', 'slot'])
+            run.intervals = {col: merged[col].astype(int).tolist() for col in columns}
+            run.row_count = len(merged)
+            run.total_calls = sum(run.intervals['calls'])
+            # Re-keyed to the calendar and actuals it now reflects, replacing any stored run with that key
+            run.params = {**run.params, 'calendar': key}
+            run.actuals_key = actuals
+            run.input_hash = forecast_runs.input_hash(run.model_type, run.params, actuals,
+                                                      run.start_date, run.end_date)
+            ForecastRun.objects.filter(input_hash=run.input_hash).exclude(pk=run.pk).delete()
+            run.save(update_fields=['intervals', 'row_count', 'total_calls', 'params', 'actuals_key', 'input_hash'])
+        rewritten.update(pd.date_range(lo, hi).date)
+    return sorted(rewritten)
+
+
+def rerun_special_day(day):
+    """Reruns the forecast dates a created or deleted SpecialDay affects."""
+    if day.exclude_from_history and day.start_date < timezone.localdate():
+        return rerun_dates(timezone.localdate(), date.max, day.queue_id)
+    return rerun_dates(day.start_date, day.end_date, day.queue_id)
@@ -0,0 +1,376 @@
+"""
+Batched staffing engine.
+
+Erlang C evaluated over NumPy arrays of traffic intensities and agent counts.
+The Erlang B term is computed in log space through the Poisson pmf / cdf
+identity, so large queues (hundreds of Erlangs) never overflow and a whole
+forecast horizon is evaluated in one call instead of one Python loop per
+interval and candidate agent count.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from scipy.special import gammainc, gammaincc, gammaln, hyp1f1
+
+# Safety cap, same as the legacy iterative solver
+MAX_AGENTS = 1000
+
+
+def _as_float_arrays(*values):
+    return np.broadcast_arrays(*[np.asarray(v, dtype=float) for v in values])
+
+
+def erlang_b(traffic, agents):
+    """
+    Blocking probability B(N, A) for arrays of traffic A and agents N.
+    B = pmf(N; A) / cdf(N; A) of a Poisson(A) variable, evaluated in log space.
+    """
+    A, N = _as_float_arrays(traffic, agents)
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore', under='ignore'):
+        log_pmf = N * np.log(A) - A - gammaln(N + 1)
+        log_cdf = np.log(gammaincc(N + 1, A))
+        b = np.exp(log_pmf - log_cdf)
+        # Deep overload: pmf and cdf both underflow, B tends to 1 - N/A
+        fallback = np.clip(1.0 - N / A, 0.0, 1.0)
+    b = np.where(np.isfinite(b), b, fallback)
+    b = np.where(N <= 0, 1.0, b)
+    b = np.where(A <= 0, 0.0, b)
+    return np.clip(b, 0.0, 1.0)
+
+
+def erlang_c(traffic, agents):
+    """
+    Probability of waiting C(N, A). 1.0 wherever N <= A (unstable queue).
+    """
+    A, N = _as_float_arrays(traffic, agents)
+    b = erlang_b(A, N)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        c = N * b / (N - A * (1.0 - b))
+    c = np.where(N > A, c, 1.0)
+    c = np.where(A <= 0, 0.0, c)
+    return np.clip(c, 0.0, 1.0)
+
+
+def service_level(traffic, agents, target_time, aht):
+    """
+    P(wait <= target_time) = 1 - C(N, A) * exp(-(N - A) * target_time / AHT).
+    """
+    A, N, t, h = _as_float_arrays(traffic, agents, target_time, aht)
+    c = erlang_c(A, N)
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        sl = 1.0 - c * np.exp(-(N - A) * t / h)
+    sl = np.where((N > A) & (h > 0), sl, 0.0)
+    sl = np.where(A <= 0, 1.0, sl)
+    return np.clip(sl, 0.0, 1.0)
+
+
+def average_speed_of_answer(traffic, agents, aht):
+    """
+    ASA in seconds = C(N, A) * AHT / (N - A). inf for unstable intervals.
+    """
+    A, N, h = _as_float_arrays(traffic, agents, aht)
+    c = erlang_c(A, N)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        asa = c * h / (N - A)
+    asa = np.where(N > A, asa, np.inf)
+    return np.where(A <= 0, 0.0, asa)
+
+
+def occupancy(traffic, agents):
+    A, N = _as_float_arrays(traffic, agents)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        occ = A / N
+    occ = np.where(N > 0, occ, 0.0)
+    return np.clip(occ, 0.0, 1.0)
+
+
+def traffic_intensity(calls, aht, interval_seconds):
+    """Erlangs = calls * AHT / interval length."""
+    calls, aht, interval_seconds = _as_float_arrays(calls, aht, interval_seconds)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        a = calls * aht / interval_seconds
+    return np.where(interval_seconds > 0, a, 0.0)
+
+
+class StaffingCache:
+    """
+    Bounded LRU table of solved staffing requirements keyed on quantized
+    (traffic, AHT, target time, target SLA). Hit/miss counters are exposed
+    through info() so the quantization steps can be tuned.
+    """
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        found = {}
+        with self._lock:
+            for key in keys:
+                value = self._data.get(key)
+                if value is not None:
+                    self._data.move_to_end(key)
+                    found[key] = value
+        return found
+
+    def set_many(self, items):
+        with self._lock:
+            for key, value in items:
+                self._data[key] = value
+                self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def record(self, hits, misses):
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+    def info(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._data), 'maxsize': self.maxsize}
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+# Quantization steps for cache keys. Traffic and SLA are rounded up, so a
+# cached answer is never under-staffed for the request it serves.
+TRAFFIC_QUANTUM = 0.01   # Erlangs
+AHT_QUANTUM = 1.0        # seconds
+TARGET_TIME_QUANTUM = 1.0  # seconds
+SLA_QUANTUM = 0.001
+
+_cache = StaffingCache(maxsize=100_000)
+
+
+def cache_info():
+    return _cache.info()
+
+
+def clear_cache():
+    _cache.clear()
+
+
+# Staffing models selectable per queue
+ERLANG_C = 'erlang_c'
+ERLANG_A = 'erlang_a'
+PATIENCE_QUANTUM = 1.0   # seconds
+
+
+def erlang_a_metrics(traffic, agents, aht, patience, target_time):
+    """
+    Erlang A (M/M/N+M) with exponential caller patience, batched.
+    Uses the Mandelbaum & Zeltyn closed forms with x = N*mu/theta,
+    y = lambda/theta and A(x, y) = 1F1(1; x + 1; y). Returns a dict of arrays:
+    p_wait, abandon_rate, service_level (P(offered wait <= target_time)) and
+    asa (mean wait of all offered calls, = P(abandon) * patience).
+    Elements without finite positive patience fall back to Erlang C.
+    """
+    A, N, h, pat, t = _as_float_arrays(traffic, agents, aht, patience, target_time)
+    erlang_a = (A > 0) & (N > 0) & (h > 0) & np.isfinite(pat) & (pat > 0)
+
+    p_wait = np.array(erlang_c(A, N), dtype=float)
+    abandon = np.zeros(A.shape)
+    sl = np.array(service_level(A, N, t, h), dtype=float)
+    asa = np.array(average_speed_of_answer(A, N, h), dtype=float)
+
+    if erlang_a.any():
+        a, n, ht, pt, tt = (v[erlang_a] for v in (A, N, h, pat, t))
+        theta = 1.0 / pt
+        lam = a / ht
+        x = n / ht / theta
+        y = lam / theta
+        z = y * np.exp(-theta * tt)
+        b = erlang_b(a, n)
+
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore', under='ignore'):
+            # x > y: convergent hypergeometric series; otherwise the incomplete gamma form
+            series = x > y
+            big_a = np.where(
+                series,
+                hyp1f1(1.0, x + 1.0, y),
+                np.exp(np.log(x) + y - x * np.log(y) + gammaln(x) + np.log(gammainc(x, y))),
+            )
+            tail_ratio = np.where(
+                series,
+                np.exp(-theta * tt * x + y - z) * hyp1f1(1.0, x + 1.0, z) / big_a,
+                gammainc(x, z) / gammainc(x, y),
+            )
+            pw = big_a * b / (1.0 + (big_a - 1.0) * b)
+            rho = lam * ht / n
+            pab = (1.0 / (rho * big_a) + 1.0 - 1.0 / rho) * pw
+
+        pw = np.clip(np.nan_to_num(pw, nan=1.0), 0.0, 1.0)
+        pab = np.clip(np.nan_to_num(pab, nan=1.0), 0.0, 1.0)
+        tail_ratio = np.clip(np.nan_to_num(tail_ratio, nan=1.0), 0.0, 1.0)
+
+        p_wait[erlang_a] = pw
+        abandon[erlang_a] = pab
+        sl[erlang_a] = 1.0 - pw * tail_ratio
+        asa[erlang_a] = pab * pt
+
+    # Nobody to answer: every caller waits and eventually abandons
+    no_agents = (A > 0) & (N <= 0) & np.isfinite(pat) & (pat > 0)
+    abandon[no_agents] = 1.0
+    asa[no_agents] = pat[no_agents]
+
+    return {
+        'p_wait': p_wait,
+        'abandon_rate': abandon,
+        'service_level': np.clip(sl, 0.0, 1.0),
+        'asa': asa,
+    }
+
+
+def _bisect_agents(lo, hi, is_feasible):
+    """
+    Vectorized bisection on N; lo infeasible, hi feasible for every element.
+    is_feasible(idx, n) evaluates the elements idx at staffing n.
+    """
+    active = hi - lo > 1
+    while active.any():
+        idx = np.flatnonzero(active)
+        mid = np.floor((lo[idx] + hi[idx]) / 2)
+        ok = is_feasible(idx, mid)
+        hi[idx[ok]] = mid[ok]
+        lo[idx[~ok]] = mid[~ok]
+        active[idx] = hi[idx] - lo[idx] > 1
+    return hi
+
+
+def _solve_required_agents(A, h, t, sla, max_agents):
+    """
+    Bisection on N using monotonicity of service level in N.
+    Lower bound floor(A) (unstable, never feasible); upper bound from
+    square-root staffing A + 3*sqrt(A) + 3, doubled until feasible.
+    """
+    lo = np.floor(A)
+    hi = np.minimum(np.ceil(A + 3.0 * np.sqrt(A) + 3.0), max_agents + 1)
+
+    # Expand upper bound where square-root staffing is not enough
+    pending = (hi <= max_agents) & (service_level(A, hi, t, h) < sla)
+    while pending.any():
+        gap = hi[pending] - lo[pending]
+        lo[pending] = hi[pending]
+        hi[pending] = np.minimum(hi[pending] + 2 * gap, max_agents + 1)
+        idx = np.flatnonzero(pending)
+        still = (hi[idx] <= max_agents) & (service_level(A[idx], hi[idx], t[idx], h[idx]) < sla[idx])
+        pending[idx[~still]] = False
+
+    # hi is feasible (or the max_agents + 1 sentinel), lo is not
+    return _bisect_agents(
+        lo, hi, lambda idx, n: service_level(A[idx], n, t[idx], h[idx]) >= sla[idx]
+    )
+
+
+def _solve_required_agents_erlang_a(A, h, t, sla, patience, max_agents):
+    """
+    Abandonment only shortens waits, so the Erlang C requirement is a feasible
+    upper bound; zero agents is the infeasible lower bound.
+    """
+    hi = _solve_required_agents(A, h, t, sla, max_agents)
+    lo = np.zeros(A.shape)
+    return _bisect_agents(
+        lo, hi,
+        lambda idx, n: erlang_a_metrics(A[idx], n, h[idx], patience[idx], t[idx])['service_level'] >= sla[idx],
+    )
+
+
+def required_agents(traffic, aht, target_time, target_sla, max_agents=MAX_AGENTS, use_cache=True,
+                    model=ERLANG_C, patience=np.inf):
+    """
+    Minimum agents meeting target_sla for every element of the input arrays.
+    model is ERLANG_C or ERLANG_A (the latter uses `patience` seconds).
+    Identical quantized inputs are solved once per batch and remembered in
+    the module-level LRU cache across calls.
+    """
+    A, h, t, sla, pat = _as_float_arrays(traffic, aht, target_time, target_sla, patience)
+    A = np.nan_to_num(A)
+    result = np.zeros(A.shape, dtype=int)
+    busy = A > 0
+    if not busy.any():
+        return result
+
+    if model == ERLANG_A:
+        # Infinite patience is plain Erlang C
+        pat = np.where(np.isfinite(pat) & (pat > 0), pat, 0.0)
+        def solve(a, ht, tt, s, p):
+            out = _solve_required_agents(a, ht, tt, s, max_agents)
+            patient = p > 0
+            if patient.any():
+                out[patient] = _solve_required_agents_erlang_a(
+                    a[patient], ht[patient], tt[patient], s[patient], p[patient], max_agents)
+            return out
+    else:
+        pat = np.zeros(A.shape)
+        def solve(a, ht, tt, s, p):
+            return _solve_required_agents(a, ht, tt, s, max_agents)
+
+    if not use_cache:
+        result[busy] = solve(A[busy], h[busy], t[busy], sla[busy], pat[busy])
+        return result
+
+    keys = np.stack([
+        np.ceil(A[busy] / TRAFFIC_QUANTUM - 1e-9),
+        np.round(h[busy] / AHT_QUANTUM),
+        np.round(t[busy] / TARGET_TIME_QUANTUM),
+        np.ceil(sla[busy] / SLA_QUANTUM - 1e-9),
+        np.round(pat[busy] / PATIENCE_QUANTUM),
+    ], axis=1).astype(np.int64)
+    unique_keys, inverse = np.unique(keys, axis=0, return_inverse=True)
+    key_tuples = [(*map(int, k), max_agents) for k in unique_keys]
+
+    found = _cache.get_many(key_tuples)
+    solved = np.array([found.get(k, -1) for k in key_tuples], dtype=float)
+    missing = np.flatnonzero(solved < 0)
+    if missing.size:
+        q = unique_keys[missing].astype(float)
+        solved[missing] = solve(
+            q[:, 0] * TRAFFIC_QUANTUM, q[:, 1] * AHT_QUANTUM,
+            q[:, 2] * TARGET_TIME_QUANTUM, q[:, 3] * SLA_QUANTUM,
+            q[:, 4] * PATIENCE_QUANTUM,
+        )
+        _cache.set_many((key_tuples[i], int(solved[i])) for i in missing)
+    _cache.record(hits=int(busy.sum()) - missing.size, misses=int(missing.size))
+
+    result[busy] = solved[inverse.ravel()].astype(int)
+    return result
+
+
+def evaluate_intervals(calls, aht, interval_seconds, target_time, target_sla, agents=None,
+                       model=ERLANG_C, patience=np.inf):
+    """
+    One batched pass over a whole horizon of intervals (any shape, e.g.
+    queues x days x 96 slots). Returns a dict of arrays:
+    traffic, required_agents, and service_level / asa / occupancy /
+    abandon_rate at the given `agents` (or at the required staffing if none given).
+    """
+    traffic = traffic_intensity(calls, aht, interval_seconds)
+    traffic, aht, target_time, target_sla, patience = _as_float_arrays(
+        traffic, aht, target_time, target_sla, patience)
+    required = required_agents(traffic, aht, target_time, target_sla, model=model, patience=patience)
+    staffed = required if agents is None else np.broadcast_to(np.asarray(agents, dtype=float), traffic.shape)
+
+    if model == ERLANG_A:
+        metrics = erlang_a_metrics(traffic, staffed, aht, patience, target_time)
+        sl, asa, abandon = metrics['service_level'], metrics['asa'], metrics['abandon_rate']
+    else:
+        sl = service_level(traffic, staffed, target_time, aht)
+        asa = average_speed_of_answer(traffic, staffed, aht)
+        abandon = np.zeros(traffic.shape)
+
+    return {
+        'traffic': traffic,
+        'required_agents': required,
+        'service_level': sl,
+        'asa': asa,
+        # Abandoned calls never reach an agent
+        'occupancy': occupancy(traffic * (1.0 - abandon), staffed),
+        'abandon_rate': abandon,
+    }
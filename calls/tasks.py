@@ -1,6 +1,9 @@
 from celery import shared_task
-from django_tenants.utils import schema_context
-from .models import Call, Queue
+from django_tenants.utils import get_public_schema_name, schema_context
+from .models import Queue
+from .streaming import record_completed_call
+from .intraday import reforecast_today
+from .utils import aggregate_actuals
 from tenants.models import Client
 from datetime import datetime
 
@@ -25,12 +28,24 @@ def process_webhook_call(tenant_schema, call_data):
         if queue_name:
             queue_obj, _ = Queue.objects.get_or_create(name=queue_name)
 
-        Call.objects.update_or_create(
-            call_id=call_id,
-            defaults={
-                'timestamp': ts,
-                'duration': duration,
-                'queue': queue_obj,
-            }
-        )
+        record_completed_call(call_id, ts, duration, queue_obj)
     return f"Processed call {call_id} for {tenant_schema}"
+
+@shared_task
+def intraday_reforecast(tenant_schema):
+    """
+    Catches up the actuals and rescales the rest of today's forecast
+    (calls/intraday.py).
+    """
+    with schema_context(tenant_schema):
+        aggregate_actuals()
+        result = reforecast_today()
+    return f"Reforecast {result['updated']} intervals from slot {result['from_slot']} for {tenant_schema}"
+
+@shared_task
+def intraday_reforecast_all():
+    """Queues an intraday reforecast for every tenant (run every 15 minutes by beat)."""
+    schemas = Client.objects.exclude(schema_name=get_public_schema_name()).values_list('schema_name', flat=True)
+    for schema in schemas:
+        intraday_reforecast.delay(schema)
+    return f"Queued intraday reforecast for {len(schemas)} tenants"
@@ -1,12 +1,17 @@
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
-from .models import CallVolume, Queue, Call
+from .models import CallVolume, Queue, Call, ForecastRun
 from shifts.models import Shift
 from datetime import date, timedelta, datetime, time
 from django.db.models import Sum, Avg, Count
 import json
 from django.contrib import messages
-from .utils import aggregate_actuals, generate_forecast_data
+from .utils import aggregate_actuals
+from .forecast_runs import get_or_create_run, apply_run, CREATED, RESTORED
+from .requirements import load_requirements
+from .rollups import volume_totals, GRAIN_DAY
+from .forecasting import MODELS as FORECAST_MODELS
+from .shrinkage import apply_shrinkage
 from shifts.utils import generate_schedule
 from agents.utils import get_allowed_agents
 
@@ -18,9 +23,9 @@ def dashboard(request):
 
     today = date.today()
     # Metrics
-    # Only sum Actuals (is_forecast=False)
-    vols = CallVolume.objects.filter(date=today, is_forecast=False)
-    total_offered = sum([v.calls_offered for v in vols])
+    # Only sum Actuals (is_forecast=False), from the daily rollups
+    daily = {r['period']: r['calls_offered'] for r in volume_totals(today - timedelta(days=6), today, GRAIN_DAY)}
+    total_offered = daily.get(today, 0)
     
     # RBAC: Active shifts count scoped to user visibility
     allowed_agents = get_allowed_agents(request.user)
@@ -33,9 +38,8 @@ def dashboard(request):
     if request.user.role != 'admin' and not request.user.is_superuser:
         # Last 7 Days
         start_date = today - timedelta(days=6)
-        stats = Call.objects.filter(
-            agent__in=allowed_agents,
-            timestamp__date__range=[start_date, today]
+        stats = Call.objects.between(start_date, today).filter(
+            agent__in=allowed_agents
         ).aggregate(
             total_calls=Count('id'),
             avg_duration=Avg('duration')
@@ -51,9 +55,7 @@ def dashboard(request):
         for i in range(6, -1, -1):
             d = today - timedelta(days=i)
             chart_labels.append(d.strftime('%Y-%m-%d'))
-            vs = CallVolume.objects.filter(date=d, is_forecast=False)
-            s = sum([v.calls_offered for v in vs])
-            chart_data.append(s)
+            chart_data.append(daily.get(d, 0))
 
     context = {
         'total_offered': total_offered,
@@ -96,12 +98,31 @@ def forecast_view(request):
                     return redirect(f"{request.path}?start_date={start_date}&end_date={end_date}")
 
                 model_type = request.POST.get('forecast_model', 'simple_avg')
+                if model_type not in FORECAST_MODELS:
+                    model_type = 'simple_avg'
                 
-                count = generate_forecast_data(start_date, end_date, model_type=model_type)
-                messages.success(request, f"Tahmin oluşturuldu: {count} kayıt.")
+                run, status = get_or_create_run(start_date, end_date, model_type=model_type)
+                if status == CREATED:
+                    messages.success(request, f"Tahmin oluşturuldu: {run.row_count} kayıt.")
+                elif status == RESTORED:
+                    messages.success(request, f"Aynı girdilerle kayıtlı tahmin geri yüklendi: {run.row_count} kayıt.")
+                else:
+                    messages.info(request, "Veri ve parametreler değişmedi; mevcut tahmin kullanılıyor.")
+
+            elif 'apply_run' in request.POST:
+                run = ForecastRun.objects.filter(pk=request.POST.get('apply_run')).first()
+                if run:
+                    if run.start_date < today:
+                        messages.error(request, "Hata: Geçmiş tarihli tahmin oluşturulamaz.")
+                    else:
+                        apply_run(run)
+                        messages.success(request, f"Tahmin sürümü uygulandı: {run.row_count} kayıt.")
+                        start_date, end_date = run.start_date, run.end_date
                 
             elif 'run_schedule' in request.POST:
-                count = generate_schedule(None, start_date, end_date)
+                staffing_model = request.POST.get('staffing_model') or None
+                pooling = request.POST.get('pooling', 'sum')
+                count = generate_schedule(None, start_date, end_date, staffing_model=staffing_model, pooling=pooling)
                 messages.success(request, f"{count} vardiya atandı.")
                 return redirect('schedule')
             
@@ -134,9 +155,25 @@ def forecast_view(request):
             else:
                 data_map[key]['actual'] = (data_map[key]['actual'] or 0) + v.calls_offered
                 
+        # Required (net) and gross headcount from the persisted requirement
+        # table plus shrinkage (daily view: peak interval of the day)
+        required_map = {}
+        gross_map = {}
+        reqs = load_requirements(start_date, end_date, queue_id=q_filter.get('queue_id'))
+        if not reqs.empty:
+            reqs = apply_shrinkage(reqs)
+            per_slot = reqs.groupby(['date', 'interval_start'])[['required_agents', 'gross_agents']].sum()
+            for (d, t), row in per_slot.iterrows():
+                key = d.strftime('%Y-%m-%d') if is_daily_view else t.strftime('%H:%M')
+                required_map[key] = max(required_map.get(key, 0), int(row['required_agents']))
+                gross_map[key] = max(gross_map.get(key, 0), int(row['gross_agents']))
+                data_map.setdefault(key, {'actual': 0, 'forecast': 0})
+                
         labels = sorted(data_map.keys())
         actual_data = [data_map[k]['actual'] for k in labels]
         forecast_data = [data_map[k]['forecast'] for k in labels]
+        required_data = [required_map.get(k, 0) for k in labels]
+        gross_data = [gross_map.get(k, 0) for k in labels]
         
         context = {
             'start_date': start_date.strftime('%Y-%m-%d'),
@@ -144,8 +181,11 @@ def forecast_view(request):
             'labels': labels,
             'actual_data': actual_data,
             'forecast_data': forecast_data,
+            'required_data': required_data,
+            'gross_data': gross_data,
             'queues': queues,
-            'selected_queue_id': int(queue_id) if queue_id and queue_id.isdigit() else None
+            'selected_queue_id': int(queue_id) if queue_id and queue_id.isdigit() else None,
+            'forecast_runs': ForecastRun.objects.defer('intervals', 'params')[:10],
         }
         return render(request, 'forecast.html', context)
     except Exception as e:
@@ -185,11 +225,8 @@ def heatmap_view(request):
     if queue_id and queue_id.isdigit():
         queue_filter['queue_id'] = int(queue_id)
         
-    vols = CallVolume.objects.filter(
-        date__range=[start_date, end_date], 
-        is_forecast=False,
-        **queue_filter
-    ).order_by('date', 'interval_start')
+    # Metric: call volume (actuals) or required agents (requirement table)
+    metric = request.GET.get('metric', 'calls')
     
     # Get Queues for Dropdown
     queues = Queue.objects.all()
@@ -197,15 +234,28 @@ def heatmap_view(request):
     # Data Structure: Date -> Time -> Sum
     data_map = {}
     
-    for v in vols:
-        d_key = v.date
-        t_key = v.interval_start.strftime("%H:%M")
-        
-        if d_key not in data_map:
-            data_map[d_key] = {}
+    if metric == 'required':
+        reqs = load_requirements(start_date, end_date, queue_id=queue_filter.get('queue_id'))
+        if not reqs.empty:
+            per_slot = reqs.groupby(['date', 'interval_start'])['required_agents'].sum()
+            for (d_key, t), req in per_slot.items():
+                data_map.setdefault(d_key, {})[t.strftime("%H:%M")] = int(req)
+    else:
+        vols = CallVolume.objects.filter(
+            date__range=[start_date, end_date], 
+            is_forecast=False,
+            **queue_filter
+        ).order_by('date', 'interval_start')
         
-        # Sum if multiple queues
-        data_map[d_key][t_key] = data_map[d_key].get(t_key, 0) + v.calls_offered
+        for v in vols:
+            d_key = v.date
+            t_key = v.interval_start.strftime("%H:%M")
+            
+            if d_key not in data_map:
+                data_map[d_key] = {}
+            
+            # Sum if multiple queues
+            data_map[d_key][t_key] = data_map[d_key].get(t_key, 0) + v.calls_offered
     
     # Build Rows
     table_rows = []
@@ -232,6 +282,7 @@ def heatmap_view(request):
         'time_headers': time_headers,
         'table_rows': table_rows,
         'queues': queues,
+        'metric': metric,
         'selected_queue_id': int(queue_id) if queue_id and queue_id.isdigit() else None
     }
     return render(request, 'heatmap.html', context)
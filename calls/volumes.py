@@ -0,0 +1,117 @@
+"""
+Shared CallVolume writer.
+
+Rows are (queue_id, date, interval_start, calls_offered, aht_seconds)
+tuples from any iterable (a generator or a server-side query iterator) and
+are consumed in fixed-size batches, so memory stays bounded by the batch
+however long the range is.
+
+- upsert_volumes(): INSERT ... ON CONFLICT (queue_id, date, interval_start,
+  is_forecast) DO UPDATE per batch. Rows whose values did not change are not
+  rewritten, so repeating a write leaves no dead tuples behind.
+- replace_volumes(): makes the rows the complete set for a date range (and
+  optionally some queues). Batches are COPYed into a temporary staging
+  table, then one statement merges them and another deletes the range's
+  rows missing from it. Both run in one transaction, so readers keep
+  seeing the previous rows until it commits, never a half-empty range, and
+  unchanged rows are not touched.
+"""
+import csv
+import io
+import itertools
+
+from django.db import connection, transaction
+
+from .models import CallVolume
+
+WRITE_BATCH_SIZE = 2000
+STAGING_TABLE = 'callvolume_staging'
+
+_INSERT = (
+    'INSERT INTO {table} AS v (queue_id, date, interval_start, calls_offered, aht_seconds, is_forecast) '
+    '{source} ON CONFLICT (queue_id, date, interval_start, is_forecast) DO UPDATE SET '
+)
+_REPLACE = (
+    'calls_offered = EXCLUDED.calls_offered, aht_seconds = EXCLUDED.aht_seconds '
+    'WHERE (v.calls_offered, v.aht_seconds) IS DISTINCT FROM (EXCLUDED.calls_offered, EXCLUDED.aht_seconds)'
+)
+
+
+def _table():
+    return connection.ops.quote_name(CallVolume._meta.db_table)
+
+
+def batches(rows, size=WRITE_BATCH_SIZE):
+    """Lists of up to `size` items from any iterable."""
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def upsert_volumes(rows, is_forecast, batch_size=WRITE_BATCH_SIZE):
+    """
+    Upserts (queue_id, date, interval_start, calls, aht) rows. Returns the
+    rows inserted or changed.
+    """
+    sql = _INSERT + _REPLACE
+    changed = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        for batch in batches(rows, batch_size):
+            values = ', '.join(['(%s, %s, %s, %s, %s, %s)'] * len(batch))
+            params = [value for row in batch for value in (*row, is_forecast)]
+            cursor.execute(sql.format(table=_table(), source=f'VALUES {values}'), params)
+            changed += cursor.rowcount
+    return changed
+
+
+def replace_volumes(rows, is_forecast, start_date=None, end_date=None, queue_ids=None,
+                    batch_size=WRITE_BATCH_SIZE):
+    """
+    Replaces the is_forecast CallVolume of the date range (None =
+    unbounded) and queues (None = all) with `rows`. Returns the rows
+    staged, the rows inserted or changed and the rows deleted.
+    """
+    table, stage = _table(), connection.ops.quote_name(STAGING_TABLE)
+    staged = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE TEMP TABLE {stage} (queue_id bigint, date date, interval_start time, '
+            f'calls_offered integer, aht_seconds integer)'
+        )
+        for batch in batches(rows, batch_size):
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(batch)
+            buffer.seek(0)
+            cursor.copy_expert(f'COPY {stage} FROM STDIN WITH CSV', buffer)
+            staged += len(batch)
+        cursor.execute(f'ANALYZE {stage}')
+
+        cursor.execute(_INSERT.format(
+            table=table,
+            source=f'SELECT queue_id, date, interval_start, calls_offered, aht_seconds, %s FROM {stage}',
+        ) + _REPLACE, [is_forecast])
+        changed = cursor.rowcount
+
+        where, params = ['v.is_forecast = %s'], [is_forecast]
+        if start_date:
+            where.append('v.date >= %s')
+            params.append(start_date)
+        if end_date:
+            where.append('v.date <= %s')
+            params.append(end_date)
+        if queue_ids is not None:
+            where.append('v.queue_id = ANY(%s)')
+            params.append(list(queue_ids))
+        cursor.execute(
+            f'DELETE FROM {table} v WHERE {" AND ".join(where)} AND NOT EXISTS ('
+            f'SELECT 1 FROM {stage} s WHERE s.queue_id = v.queue_id AND s.date = v.date '
+            f'AND s.interval_start = v.interval_start)',
+            params,
+        )
+        deleted = cursor.rowcount
+        # Not left for commit: a second replace in the same transaction reuses the name
+        cursor.execute(f'DROP TABLE {stage}')
+    return {'rows': staged, 'changed': changed, 'deleted': deleted}
@@ -17,7 +17,7 @@ def process():
     
     with schema_context(tenant_name):
         print("Aggregating actuals from raw calls...")
-        aggregate_actuals()
+        aggregate_actuals(full=True)
         print("Aggregation complete.")
         
         # Forecast for next 4 weeks
@@ -12,7 +12,7 @@ from calls.utils import aggregate_actuals
 print("--- FIXING FORECAST DATA ---")
 print("Aggregating raw calls into 15-minute intervals...")
 try:
-    aggregate_actuals()
+    aggregate_actuals(full=True)
     print("[SUCCESS] Data aggregated successfully.")
     print("You can now use the 'Generate Forecast' button on the dashboard.")
 except Exception as e:
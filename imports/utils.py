@@ -209,8 +209,8 @@ def process_call_import(file_path):
                 
                 # 5. Create Call
                 from calls.models import Call
-                Call.objects.update_or_create(
-                    call_id=call_id,
+                Call.objects.update_or_create_by_call_id(
+                    call_id,
                     defaults={
                         'timestamp': timestamp,
                         'duration': duration,
@@ -1,7 +1,8 @@
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
 from shifts.models import Shift
-from calls.models import CallVolume, Call
+from calls.models import CallVolume, Call, StaffingRequirement
+from calls.rollups import volume_totals, GRAIN_DAY
 from agents.models import AgentProfile
 from django.db.models import Sum, Avg, Count, Max
 from django.db import models
@@ -33,12 +34,22 @@ def agent_performance_report(request):
     chart_calls = []
     chart_aht = []
     
+    # One grouped query each for calls and shifts instead of per-agent counts
+    call_stats = {
+        r['agent_id']: r for r in Call.objects.between(start_date, end_date).filter(agent__isnull=False)
+        .values('agent_id').annotate(total=Count('id'), aht=Avg('duration')).order_by()
+    }
+    shift_counts = dict(
+        Shift.objects.filter(date__range=[start_date, end_date]).values('agent_id')
+        .annotate(n=Count('id')).order_by().values_list('agent_id', 'n')
+    )
+
     for agent in agents:
-        calls = Call.objects.filter(agent=agent, timestamp__date__range=[start_date, end_date])
-        total_calls = calls.count()
-        avg_handling_time = calls.aggregate(Avg('duration'))['duration__avg'] or 0
+        stats = call_stats.get(agent.id, {})
+        total_calls = stats.get('total', 0)
+        avg_handling_time = stats.get('aht') or 0
         
-        shift_count = Shift.objects.filter(agent=agent, date__range=[start_date, end_date]).count()
+        shift_count = shift_counts.get(agent.id, 0)
         
         # Only add valid stats to display
         if total_calls > 0 or shift_count > 0:
@@ -85,10 +96,22 @@ def sla_report(request):
     start_date = request.GET.get('start_date', (date.today() - timedelta(days=30)).strftime('%Y-%m-%d'))
     end_date = request.GET.get('end_date', date.today().strftime('%Y-%m-%d'))
     
-    vols = CallVolume.objects.filter(date__range=[start_date, end_date], is_forecast=False).values('date').annotate(
-        total_offered=Sum('calls_offered'),
-        avg_aht=Avg('aht_seconds')
-    ).order_by('date')
+    # Daily totals from the day rows of the rollup table
+    vols = [
+        {'date': r['period'], 'total_offered': r['calls_offered'], 'avg_aht': r['aht_seconds']}
+        for r in volume_totals(date.fromisoformat(start_date), date.fromisoformat(end_date), GRAIN_DAY)
+    ]
+    
+    # Peak required headcount per day from the persisted requirement table
+    peak_required = {}
+    req_rows = StaffingRequirement.objects.filter(date__range=[start_date, end_date], is_forecast=False).values(
+        'date', 'interval_start'
+    ).annotate(total=Sum('required_agents'))
+    for r in req_rows:
+        peak_required[r['date']] = max(peak_required.get(r['date'], 0), r['total'])
+    
+    for v in vols:
+        v['peak_required'] = peak_required.get(v['date'], 0)
     
     # Chart Data
     chart_dates = []
@@ -104,9 +127,9 @@ def sla_report(request):
         response = HttpResponse(content_type='text/csv')
         response['Content-Disposition'] = f'attachment; filename="sla_report_{start_date}_{end_date}.csv"'
         writer = csv.writer(response)
-        writer.writerow(['Date', 'Total Calls', 'Avg AHT'])
+        writer.writerow(['Date', 'Total Calls', 'Avg AHT', 'Peak Required Agents'])
         for row in vols:
-            writer.writerow([row['date'], row['total_offered'], row['avg_aht']])
+            writer.writerow([row['date'], row['total_offered'], row['avg_aht'], row['peak_required']])
         return response
 
     context = {
@@ -177,9 +200,7 @@ def customer_journey_report(request):
     
     # 1. Aggregate calls by customer
     # Exclude null or empty customer numbers
-    customer_stats = Call.objects.filter(
-        timestamp__date__range=[start_date, end_date]
-    ).exclude(
+    customer_stats = Call.objects.between(start_date, end_date).exclude(
         customer_number__isnull=True
     ).exclude(
         customer_number=''
@@ -235,9 +256,7 @@ def queue_performance_report(request):
     
     # Aggregate by Queue
     # If queue is null, label as 'Unassigned'
-    stats = Call.objects.filter(
-        timestamp__date__range=[start_date, end_date]
-    ).values('queue__name').annotate(
+    stats = Call.objects.between(start_date, end_date).values('queue__name').annotate(
         total_calls=Count('id'),
         avg_aht=Avg('duration'),
         total_duration=Sum('duration')
@@ -294,10 +313,9 @@ def hourly_traffic_report(request):
     from django.db.models.functions import ExtractHour
     
     # Group by Hour
-    hourly_stats = Call.objects.filter(
-        timestamp__date__range=[start_date, end_date]
-    ).annotate(
-        hour=ExtractHour('timestamp')
+    # call_interval is already local time, so no per-row time zone conversion
+    hourly_stats = Call.objects.between(start_date, end_date).annotate(
+        hour=ExtractHour('call_interval')
     ).values('hour').annotate(
         total_calls=Count('id'),
         avg_aht=Avg('duration')
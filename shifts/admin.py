@@ -2,6 +2,7 @@ from django.contrib import admin
 from .models import Shift, ShiftChangeRequest, Notification, Adherence
 from django.contrib import messages
 from django.db import transaction
+from .projection import bump_schedule_version_on_commit
 
 @admin.register(Shift)
 class ShiftAdmin(admin.ModelAdmin):
@@ -11,6 +12,8 @@ class ShiftAdmin(admin.ModelAdmin):
 
     def publish_shifts(self, request, queryset):
         rows_updated = queryset.update(is_published=True)
+        # update() sends no signals; published-only projections depend on the flag
+        bump_schedule_version_on_commit()
         # Notify agents
         for shift in queryset:
             Notification.objects.create(
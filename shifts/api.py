@@ -0,0 +1,66 @@
+from rest_framework import viewsets, permissions, status
+from rest_framework.response import Response
+from datetime import date, timedelta
+import numpy as np
+
+from .projection import cached_projection, summarize
+
+
+def _clean(value):
+    # NaN / inf are not valid JSON
+    return None if value is None or not np.isfinite(value) else round(float(value), 4)
+
+
+class ProjectionViewSet(viewsets.ViewSet):
+    """
+    Projected SLA / ASA / occupancy per queue and 15-min interval for the
+    schedule in a date range.
+    Query params: start_date, end_date (default: current week), queue_id,
+    published=1 to only count published shifts.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def list(self, request):
+        today = date.today()
+        try:
+            start = date.fromisoformat(request.query_params.get('start_date', ''))
+        except ValueError:
+            start = today - timedelta(days=today.weekday())
+        try:
+            end = date.fromisoformat(request.query_params.get('end_date', ''))
+        except ValueError:
+            end = start + timedelta(days=6)
+        if end < start or (end - start).days > 62:
+            return Response({'error': 'Invalid date range (max 63 days)'}, status=status.HTTP_400_BAD_REQUEST)
+
+        projection = cached_projection(start, end, published_only=request.query_params.get('published') == '1')
+        queue_id = request.query_params.get('queue_id')
+        if queue_id and queue_id.isdigit():
+            projection = projection[projection['queue_id'] == int(queue_id)]
+
+        intervals = [{
+            'queue_id': int(row.queue_id),
+            'date': row.date.isoformat(),
+            'interval_start': row.interval_start.strftime('%H:%M'),
+            'calls': int(row.calls),
+            'agents': _clean(row.agents),
+            'service_level': _clean(row.service_level),
+            'asa': _clean(row.asa),
+            'abandon_rate': _clean(row.abandon_rate),
+            'occupancy': _clean(row.occupancy),
+        } for row in projection.itertuples(index=False)]
+        daily = [{
+            'date': row.date.isoformat(),
+            'calls': int(row.calls),
+            'service_level': _clean(row.service_level),
+            'asa': _clean(row.asa),
+            'occupancy': _clean(row.occupancy),
+            'sla_target_percent': _clean(row.sla_target_percent),
+        } for row in summarize(projection, ['date']).itertuples(index=False)] if len(projection) else []
+
+        return Response({
+            'start_date': start.isoformat(),
+            'end_date': end.isoformat(),
+            'daily': daily,
+            'intervals': intervals,
+        })
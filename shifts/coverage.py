@@ -0,0 +1,93 @@
+"""
+Staffed coverage implied by rostered Shift / ShiftActivity rows.
+
+Coverage is counted in agents per 15-min slot; an agent working only part of
+a slot counts for the worked fraction. Shifts without activities fall back to
+the shift span minus its break, as the simulator does. Shifts running past
+midnight are cut at the end of their day.
+"""
+import numpy as np
+import pandas as pd
+
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = 96
+DAY_MINUTES = SLOT_MINUTES * SLOTS_PER_DAY
+# Activities during which an agent can take contacts
+ON_PHONE_ACTIVITIES = ('WORK',)
+
+
+def _minutes(t, end=False):
+    m = t.hour * 60 + t.minute
+    return DAY_MINUTES if end and m == 0 else m
+
+
+def agent_day_coverage(start_date, end_date, published_only=False):
+    """
+    Per rostered (agent, date): a frame with agent_id / date and an array of
+    shape (rows, 96) holding the fraction of each slot the agent is on the
+    phone.
+    """
+    from shifts.models import Shift, ShiftActivity
+
+    shifts = Shift.objects.filter(date__range=(start_date, end_date))
+    if published_only:
+        shifts = shifts.filter(is_published=True)
+    shift_rows = list(shifts.values_list(
+        'id', 'agent_id', 'date', 'start_time', 'end_time', 'break_start', 'break_duration'))
+    days = pd.DataFrame([(agent_id, d) for _, agent_id, d, *_ in shift_rows], columns=['agent_id', 'date'])
+    days = days.drop_duplicates().reset_index(drop=True)
+    if days.empty:
+        return days, np.zeros((0, SLOTS_PER_DAY))
+    row_of = {(a, d): i for i, (a, d) in enumerate(days.itertuples(index=False))}
+
+    spans = []  # (row, start minute, end minute)
+    with_activities = set()
+    activities = ShiftActivity.objects.filter(shift__in=shifts, activity_type__in=ON_PHONE_ACTIVITIES)
+    for shift_id, agent_id, d, start, end in activities.values_list(
+            'shift_id', 'shift__agent_id', 'shift__date', 'start_time', 'end_time'):
+        with_activities.add(shift_id)
+        spans.append((row_of[(agent_id, d)], _minutes(start), _minutes(end, end=True)))
+    for shift_id, agent_id, d, start, end, break_start, break_duration in shift_rows:
+        if shift_id in with_activities:
+            continue
+        row, start, end = row_of[(agent_id, d)], _minutes(start), _minutes(end, end=True)
+        if break_start:
+            b_start = _minutes(break_start)
+            spans += [(row, start, b_start), (row, min(b_start + break_duration, DAY_MINUTES), end)]
+        else:
+            spans.append((row, start, end))
+
+    rows, starts, ends = (np.array(v, dtype=int) for v in zip(*spans))
+    # Spans that wrap past midnight are cut at the end of the day
+    ends = np.where(ends < starts, DAY_MINUTES, ends)
+    keep = ends > starts
+    minute_delta = np.zeros((len(days), DAY_MINUTES + 1))
+    np.add.at(minute_delta, (rows[keep], starts[keep]), 1)
+    np.add.at(minute_delta, (rows[keep], ends[keep]), -1)
+    on_phone = np.clip(np.cumsum(minute_delta, axis=1)[:, :DAY_MINUTES], 0, 1)
+    return days, on_phone.reshape(len(days), SLOTS_PER_DAY, SLOT_MINUTES).mean(axis=2)
+
+
+def coverage_matrix(start_date, end_date, published_only=False):
+    """
+    Agents on the phone per (day, slot) for every day in the range, shape
+    (days, 96).
+    """
+    dates = [d.date() for d in pd.date_range(start_date, end_date)]
+    days, coverage = agent_day_coverage(start_date, end_date, published_only=published_only)
+    matrix = np.zeros((len(dates), SLOTS_PER_DAY))
+    if len(days):
+        day_index = {d: i for i, d in enumerate(dates)}
+        np.add.at(matrix, days['date'].map(day_index).to_numpy(), coverage)
+    return matrix
+
+
+def split_by_traffic(staffed, traffic, axis):
+    """
+    Shares staffed agents between queues in proportion to their traffic
+    along `axis` (no skill routing). staffed must broadcast against traffic
+    with that axis of length 1.
+    """
+    total = traffic.sum(axis=axis, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(total > 0, staffed * traffic / total, 0.0)
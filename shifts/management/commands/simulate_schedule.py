@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from datetime import datetime
+import numpy as np
+
+class Command(BaseCommand):
+    help = 'Replays a forecast day against the scheduled shifts with a discrete-event simulator.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', type=str, default=datetime.now().strftime('%Y-%m-%d'))
+        parser.add_argument('--replications', type=int, default=30)
+        parser.add_argument('--workers', type=int, default=None)
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--published', action='store_true', help='Only use published shifts')
+
+    def handle(self, *args, **options):
+        from shifts.simulation import build_scenario, run_replications, INTERVAL_SECONDS
+
+        day = datetime.strptime(options['date'], '%Y-%m-%d').date()
+        scenario = build_scenario(day, published_only=options['published'])
+        self.stdout.write(
+            f"Simulating {day}: {len(scenario['agents'])} agents, {len(scenario['queues'])} queues, "
+            f"{int(scenario['calls'].sum())} forecast calls, {options['replications']} replications..."
+        )
+
+        start = datetime.now()
+        report = run_replications(
+            scenario, replications=options['replications'], workers=options['workers'], seed=options['seed']
+        )
+        elapsed = (datetime.now() - start).total_seconds()
+
+        for qi, q in enumerate(report['queues']):
+            offered = report['offered'][qi]
+            if offered.sum() == 0:
+                continue
+            self.stdout.write(self.style.MIGRATE_HEADING(f"Queue {q['name']}"))
+            for slot in np.flatnonzero(offered > 0):
+                minutes = slot * INTERVAL_SECONDS // 60
+                self.stdout.write(
+                    f"  {minutes // 60:02d}:{minutes % 60:02d}  offered {offered[slot]:7.1f}  "
+                    f"SL {report['service_level'][qi, slot]:6.1%} "
+                    f"(P10 {report['service_level_p10'][qi, slot]:6.1%} / P90 {report['service_level_p90'][qi, slot]:6.1%})  "
+                    f"abandon {report['abandon_rate'][qi, slot]:6.1%}  "
+                    f"occupancy {report['occupancy'][slot]:6.1%}"
+                )
+
+        self.stdout.write(self.style.SUCCESS(f"Done in {elapsed:.1f}s."))
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from datetime import datetime, timedelta
+import numpy as np
+
+class Command(BaseCommand):
+    help = 'Monte Carlo SLA risk bands (P10/P50/P90) for the published schedule.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=str, default=datetime.now().strftime('%Y-%m-%d'))
+        parser.add_argument('--days', type=int, default=7)
+        parser.add_argument('--samples', type=int, default=10000)
+        parser.add_argument('--workers', type=int, default=None)
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--absence', type=float, default=None, help='Absence rate (0-1); default from shrinkage rules')
+        parser.add_argument('--all-shifts', action='store_true', help='Include unpublished shifts')
+
+    def handle(self, *args, **options):
+        from shifts.risk import run_risk_analysis, SLOTS_PER_DAY
+
+        start = datetime.strptime(options['start'], '%Y-%m-%d').date()
+        end = start + timedelta(days=options['days'] - 1)
+        self.stdout.write(f"Sampling {options['samples']} scenarios for {start} - {end}...")
+
+        t0 = datetime.now()
+        report = run_risk_analysis(
+            start, end, samples=options['samples'], workers=options['workers'], seed=options['seed'],
+            published_only=not options['all_shifts'], absence_rate=options['absence'],
+        )
+        elapsed = (datetime.now() - t0).total_seconds()
+
+        if not report['empirical_errors']:
+            self.stdout.write(self.style.WARNING("Not enough forecast-vs-actual history; using a default error."))
+        for di, day in enumerate(report['dates']):
+            slots = np.flatnonzero(~np.isnan(report['target'][di]))
+            if not len(slots):
+                continue
+            self.stdout.write(self.style.MIGRATE_HEADING(day))
+            for slot in slots:
+                minutes = slot * 24 * 60 // SLOTS_PER_DAY
+                self.stdout.write(
+                    f"  {minutes // 60:02d}:{minutes % 60:02d}  "
+                    f"SL P10 {report['p10'][di, slot]:6.1%}  P50 {report['p50'][di, slot]:6.1%}  "
+                    f"P90 {report['p90'][di, slot]:6.1%}  target {report['target'][di, slot]:6.1%}  "
+                    f"P(hit) {report['hit_probability'][di, slot]:6.1%}"
+                )
+
+        period = report['period']
+        self.stdout.write(self.style.SUCCESS(
+            f"Period SL P10 {period['p10']:.1%} / P50 {period['p50']:.1%} / P90 {period['p90']:.1%}, "
+            f"P(hit {period['target']:.0%}) = {period['hit_probability']:.1%}. "
+            f"Absence {report['absence_rate']:.1%}. Done in {elapsed:.1f}s."
+        ))
@@ -13,82 +13,30 @@ class Shift(TenantAwareModel):
     is_published = models.BooleanField(default=False)
 
     def populate_activities(self):
-        from datetime import datetime, date, timedelta, time
-        # Helper to do time math
-        def add_time(t, delta):
-            dt = datetime.combine(date.today(), t) + delta
-            return dt.time()
-        
-        def diff_minutes(t1, t2):
-            dt1 = datetime.combine(date.today(), t1)
-            dt2 = datetime.combine(date.today(), t2)
-            return (dt2 - dt1).total_seconds() / 60
-
-        # Clear existing
+        """Replaces the shift's activities with its type's template (or the standard day)."""
         self.activities.all().delete()
+        ShiftActivity.objects.bulk_create(self.build_activities())
 
-        # Check for ShiftType Template
-        if self.shift_type and self.shift_type.template_activities.exists():
-            # Dynamic Logic
-            cursor = self.start_time
-            # Get defined breaks/lunches (and maybe explicit work blocks)
-            templates = self.shift_type.template_activities.all().order_by('start_offset_minutes')
-            
-            for tmpl in templates:
-                # Calculate activity start/end
-                act_start = add_time(self.start_time, timedelta(minutes=tmpl.start_offset_minutes))
-                act_end = add_time(act_start, timedelta(minutes=tmpl.duration_minutes))
-                
-                # 1. Fill gap with WORK if gap > 0
-                if diff_minutes(cursor, act_start) > 0:
-                    ShiftActivity.objects.create(
-                        shift=self, 
-                        activity_type='WORK', 
-                        start_time=cursor, 
-                        end_time=act_start
-                    )
-                
-                # 2. Create the defined activity
-                ShiftActivity.objects.create(
-                    shift=self,
-                    activity_type=tmpl.activity_type,
-                    start_time=act_start,
-                    end_time=act_end
-                )
-                
-                # Move cursor
-                cursor = act_end
-            
-            # 3. Fill remaining time with WORK
-            if diff_minutes(cursor, self.end_time) > 0:
-                ShiftActivity.objects.create(
-                     shift=self,
-                     activity_type='WORK',
-                     start_time=cursor,
-                     end_time=self.end_time
-                )
-        else:
-            # Fallback: Hardcoded Standard Logic
-            # 1. Work: Start -> Start + 3h
-            t1_end = add_time(self.start_time, timedelta(hours=3))
-            ShiftActivity.objects.create(shift=self, activity_type='WORK', start_time=self.start_time, end_time=t1_end)
-            
-            # 2. Lunch: 1h
-            t2_end = add_time(t1_end, timedelta(hours=1))
-            ShiftActivity.objects.create(shift=self, activity_type='LUNCH', start_time=t1_end, end_time=t2_end)
-            
-            # 3. Work: Lunch End -> Start + 6h
-            t3_end = add_time(self.start_time, timedelta(hours=6))
-            ShiftActivity.objects.create(shift=self, activity_type='WORK', start_time=t2_end, end_time=t3_end)
-            
-            # 4. Break: 15min
-            t4_end = add_time(t3_end, timedelta(minutes=15))
-            ShiftActivity.objects.create(shift=self, activity_type='BREAK', start_time=t3_end, end_time=t4_end)
-            
-            # 5. Work: Break End -> End
-            # If break end is before end time, add final work block
-            if t4_end < self.end_time:
-                ShiftActivity.objects.create(shift=self, activity_type='WORK', start_time=t4_end, end_time=self.end_time)
+    def build_activities(self, templates=None):
+        """
+        Unsaved ShiftActivity rows for the shift. templates are
+        (activity_type, start_offset_minutes, duration_minutes) tuples;
+        None reads them from the shift type.
+        """
+        from datetime import datetime, date, timedelta
+        from .scheduler import activity_offsets
+
+        if templates is None:
+            templates = list(self.shift_type.template_activities.values_list(
+                'activity_type', 'start_offset_minutes', 'duration_minutes')) if self.shift_type else []
+        start = datetime.combine(date.today(), self.start_time)
+        duration = int((datetime.combine(date.today(), self.end_time) - start).total_seconds() // 60) % (24 * 60)
+        return [
+            ShiftActivity(shift=self, activity_type=kind,
+                          start_time=(start + timedelta(minutes=a)).time(),
+                          end_time=(start + timedelta(minutes=b)).time())
+            for kind, a, b in activity_offsets(templates, duration)
+        ]
 
     @property
     def shift_name(self):
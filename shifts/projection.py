@@ -0,0 +1,170 @@
+"""
+Projected service level of a schedule.
+
+project_service_level() joins the staffed coverage of the Shift /
+ShiftActivity rows with the forecast requirement table and evaluates SLA,
+ASA and occupancy for every (queue, date, 15-min interval) in one batched
+engine call. Staffed agents are shared between queues in proportion to their
+traffic.
+
+cached_projection() keeps results in the Django cache (shared between
+processes when CACHE_URL is set). The key includes a per-tenant schedule
+version, bumped after commit whenever a Shift or ShiftActivity is written
+(see shifts.signals) or a bulk writer asks for it, a fingerprint of the
+shifts in the range read from the database - which catches bulk inserts,
+queryset updates and other processes' writes even without a bump - and a
+fingerprint of the CallVolume rows and queue settings, so any change is
+picked up on the next request.
+"""
+import hashlib
+
+import numpy as np
+import pandas as pd
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, F, Max, Q, Sum
+
+SLOTS_PER_DAY = 96
+CACHE_TIMEOUT = 24 * 3600
+
+
+def _schedule_version_key():
+    return f'projection:{connection.schema_name}:schedule_version'
+
+
+def bump_schedule_version():
+    """Invalidates every cached projection of the current tenant."""
+    _bump(_schedule_version_key())
+
+
+def bump_schedule_version_on_commit():
+    """
+    bump_schedule_version() once the current transaction commits, so a
+    concurrent reader cannot cache the old schedule under the new version.
+    """
+    key = _schedule_version_key()
+    transaction.on_commit(lambda: _bump(key))
+
+
+def _bump(key):
+    if cache.add(key, 1, timeout=None):
+        return
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+
+
+def _schedule_fingerprint(start_date, end_date, published_only):
+    from .models import Shift, ShiftActivity
+
+    shifts = Shift.objects.filter(date__range=(start_date, end_date))
+    if published_only:
+        shifts = shifts.filter(is_published=True)
+    stats = shifts.aggregate(rows=Count('id'), last=Max('id'), published=Count('id', filter=Q(is_published=True)))
+    activities = ShiftActivity.objects.filter(shift__in=shifts).aggregate(rows=Count('id'), last=Max('id'))
+    return hashlib.md5(repr((stats, activities)).encode()).hexdigest()
+
+
+def _input_fingerprint(start_date, end_date):
+    from calls.models import CallVolume, Queue
+
+    volumes = CallVolume.objects.filter(date__range=(start_date, end_date)).aggregate(
+        rows=Count('id'), calls=Sum('calls_offered'), handle=Sum(F('calls_offered') * F('aht_seconds')))
+    queues = list(Queue.objects.order_by('id').values_list(
+        'id', 'interval_minutes', 'sla_target_seconds', 'sla_target_percent', 'staffing_model',
+        'avg_patience_seconds', 'channel', 'concurrency', 'required_skill_id'))
+    return hashlib.md5(repr((volumes, queues)).encode()).hexdigest()
+
+
+def project_service_level(start_date, end_date, published_only=False, queue_id=None):
+    """
+    One row per (queue, date, interval) with forecast calls, traffic,
+    staffed agents, service_level, asa, abandon_rate and occupancy.
+    Deferred (email) queues get agents and occupancy but no SLA / ASA.
+    Read-only: the requirements are the stored ones, kept current by their
+    writers (aggregation, forecast runs, intraday reforecast).
+    """
+    from calls import staffing
+    from calls.requirements import load_requirements, DEFERRED_CHANNELS
+    from shifts.coverage import coverage_matrix, split_by_traffic
+
+    reqs = load_requirements(start_date, end_date)
+    columns = ['queue_id', 'date', 'slot', 'interval_start', 'calls', 'traffic', 'agents', 'service_level',
+               'asa', 'abandon_rate', 'occupancy', 'sla_target_percent']
+    if reqs.empty:
+        return pd.DataFrame(columns=columns)
+
+    dates = [d.date() for d in pd.date_range(start_date, end_date)]
+    staffed = coverage_matrix(start_date, end_date, published_only=published_only)
+    day = reqs['date'].map({d: i for i, d in enumerate(dates)}).to_numpy()
+    reqs['staffed'] = staffed[day, reqs['slot'].to_numpy()]
+
+    # Pivot to (interval, queue) so agents can be split across queues at once
+    traffic = reqs.pivot_table(index=['date', 'slot'], columns='queue_id', values='traffic_erlangs', fill_value=0)
+    slot_staff = reqs.groupby(['date', 'slot'])['staffed'].first().reindex(traffic.index).to_numpy()
+    agents = pd.DataFrame(split_by_traffic(slot_staff[:, None], traffic.to_numpy(), axis=1),
+                          index=traffic.index, columns=traffic.columns)
+    reqs['agents'] = agents.stack().reindex(
+        pd.MultiIndex.from_arrays([reqs['date'], reqs['slot'], reqs['queue_id']])).to_numpy()
+
+    seat_aht = (reqs['aht_seconds'] / reqs['concurrency'].clip(lower=1)).clip(lower=1).to_numpy()
+    patience = pd.to_numeric(reqs['patience_seconds'], errors='coerce').fillna(np.inf).to_numpy()
+    metrics = staffing.erlang_a_metrics(
+        reqs['traffic_erlangs'].to_numpy(), reqs['agents'].to_numpy(), seat_aht, patience,
+        reqs['sla_target_seconds'].to_numpy())
+
+    deferred = reqs['channel'].isin(DEFERRED_CHANNELS).to_numpy()
+    carried = reqs['traffic_erlangs'].to_numpy() * np.where(deferred, 1.0, 1.0 - metrics['abandon_rate'])
+    result = reqs.assign(
+        calls=reqs['calls_offered'],
+        traffic=reqs['traffic_erlangs'],
+        service_level=np.where(deferred, np.nan, metrics['service_level']),
+        asa=np.where(deferred, np.nan, metrics['asa']),
+        abandon_rate=np.where(deferred, np.nan, metrics['abandon_rate']),
+        occupancy=staffing.occupancy(carried, reqs['agents'].to_numpy()),
+    )[columns]
+    if queue_id:
+        result = result[result['queue_id'] == queue_id]
+    return result.reset_index(drop=True)
+
+
+def summarize(projection, by):
+    """
+    Call-weighted service level / ASA and traffic-weighted occupancy
+    grouped by `by` (e.g. ['date'] or ['date', 'slot']).
+    """
+    live = projection['service_level'].notna()
+    df = projection.assign(
+        live_calls=projection['calls'].where(live, 0),
+        answered=(projection['calls'] * projection['service_level']).where(live, 0),
+        wait=(projection['calls'] * projection['asa'].replace(np.inf, np.nan)).where(live, 0),
+        target=(projection['calls'] * projection['sla_target_percent']).where(live, 0),
+        carried=projection['occupancy'] * projection['agents'],
+    )
+    g = df.groupby(by).agg(
+        calls=('calls', 'sum'), live_calls=('live_calls', 'sum'), answered=('answered', 'sum'),
+        wait=('wait', 'sum'), target=('target', 'sum'), agents=('agents', 'sum'), carried=('carried', 'sum'))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out = pd.DataFrame({
+            'calls': g['calls'],
+            'agents': g['agents'],
+            'service_level': np.where(g['live_calls'] > 0, g['answered'] / g['live_calls'], np.nan),
+            'asa': np.where(g['live_calls'] > 0, g['wait'] / g['live_calls'], np.nan),
+            'occupancy': np.where(g['agents'] > 0, g['carried'] / g['agents'], np.nan),
+            'sla_target_percent': np.where(g['live_calls'] > 0, g['target'] / g['live_calls'], np.nan),
+        }, index=g.index)
+    return out.reset_index()
+
+
+def cached_projection(start_date, end_date, published_only=False):
+    """project_service_level() through the cache, keyed on schedule and input versions."""
+    version = cache.get(_schedule_version_key(), 0)
+    key = 'projection:{}:{}:{}:{}:{}:{}:{}'.format(
+        connection.schema_name, start_date, end_date, int(published_only), version,
+        _schedule_fingerprint(start_date, end_date, published_only), _input_fingerprint(start_date, end_date))
+    result = cache.get(key)
+    if result is None:
+        result = project_service_level(start_date, end_date, published_only=published_only)
+        cache.set(key, result, CACHE_TIMEOUT)
+    return result
@@ -0,0 +1,220 @@
+"""
+Monte Carlo service-level risk for a rostered schedule.
+
+Each sample perturbs the forecast with errors drawn from history (days that
+have both forecast and actual CallVolume: one day-level factor plus
+interval-level residuals) and removes absent agents, then evaluates the
+interval service level of every live queue against the Shift /
+ShiftActivity coverage. Samples are drawn in NumPy batches and the batches
+are split over a process pool; the result is P10 / P50 / P90 service level
+per interval and the probability of meeting the target.
+
+Agents are shared between queues in proportion to their traffic, so
+skill-based routing is not modelled here (see shifts.simulation for that).
+"""
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+SLOTS_PER_DAY = 96
+INTERVAL_SECONDS = 900
+DEFAULT_SAMPLES = 10000
+BATCH_SIZE = 250
+# Used until there is enough forecast-vs-actual history
+MIN_ERROR_DAYS = 7
+DEFAULT_ERROR_SIGMA = 0.10
+DEFAULT_ABSENCE_RATE = 0.05
+
+
+def forecast_errors():
+    """
+    Historical forecast errors as log(actual / forecast), from every
+    (queue, date, interval) that has both rows. Returns the day-level log
+    ratios and the interval residuals around them (two 1-D arrays).
+    """
+    from calls.models import CallVolume
+
+    df = pd.DataFrame.from_records(
+        CallVolume.objects.values_list('queue_id', 'date', 'interval_start', 'is_forecast', 'calls_offered'),
+        columns=['queue_id', 'date', 'interval_start', 'is_forecast', 'calls'],
+    )
+    if df.empty:
+        return np.array([]), np.array([])
+    pairs = df.pivot_table(index=['queue_id', 'date', 'interval_start'], columns='is_forecast',
+                           values='calls', aggfunc='sum').dropna()
+    if pairs.empty or True not in pairs.columns or False not in pairs.columns:
+        return np.array([]), np.array([])
+    pairs.columns = ['actual' if not c else 'forecast' for c in pairs.columns]
+
+    daily = pairs.groupby(level=['queue_id', 'date']).sum()
+    daily_log = np.log((daily['actual'] + 1) / (daily['forecast'] + 1))
+    interval_log = np.log((pairs['actual'] + 1) / (pairs['forecast'] + 1))
+    residual = interval_log - daily_log.reindex(interval_log.droplevel('interval_start').index).to_numpy()
+    return daily_log.to_numpy(), residual.to_numpy()
+
+
+def default_absence_rate():
+    """Unplanned shrinkage of the general (unscoped) shrinkage rules."""
+    from calls.models import ShrinkageRule
+
+    rate = ShrinkageRule.objects.filter(
+        is_active=True, team__isnull=True, queue__isnull=True, weekday__isnull=True,
+        start_time__isnull=True, end_time__isnull=True,
+    ).values_list('unplanned_percent', flat=True)
+    rate = list(rate)
+    return float(np.mean(rate)) if rate else DEFAULT_ABSENCE_RATE
+
+
+def build_risk_inputs(start_date, end_date, published_only=True, absence_rate=None):
+    """
+    Picklable input dict for sample_service_levels(): forecast per
+    (queue, day * 96 + slot), queue targets, per agent-day coverage and the
+    error pools.
+    """
+    from calls.requirements import load_requirements, DEFERRED_CHANNELS
+    from shifts.coverage import agent_day_coverage
+
+    dates = [d.date() for d in pd.date_range(start_date, end_date)]
+    horizon = len(dates) * SLOTS_PER_DAY
+    reqs = load_requirements(start_date, end_date)
+    if not reqs.empty:
+        # Deferred work has no live queue to measure
+        reqs = reqs[~reqs['channel'].isin(DEFERRED_CHANNELS)]
+
+    queue_ids = sorted(reqs['queue_id'].unique()) if not reqs.empty else []
+    calls = np.zeros((len(queue_ids), horizon))
+    seat_aht = np.full((len(queue_ids), horizon), 180.0)
+    targets = pd.DataFrame(index=queue_ids, columns=['sla_target_seconds', 'sla_target_percent', 'patience'])
+    if queue_ids:
+        day_index = {d: i for i, d in enumerate(dates)}
+        q = np.searchsorted(queue_ids, reqs['queue_id'].to_numpy())
+        t = reqs['date'].map(day_index).to_numpy() * SLOTS_PER_DAY + reqs['slot'].to_numpy()
+        calls[q, t] = reqs['calls_offered'].to_numpy()
+        seat_aht[q, t] = (reqs['aht_seconds'] / reqs['concurrency'].clip(lower=1)).clip(lower=1).to_numpy()
+        reqs = reqs.assign(patience=pd.to_numeric(reqs['patience_seconds'], errors='coerce').fillna(np.inf))
+        targets = reqs.groupby('queue_id')[['sla_target_seconds', 'sla_target_percent', 'patience']].last()
+
+    days, day_coverage = agent_day_coverage(start_date, end_date, published_only=published_only)
+    coverage = np.zeros((len(days), horizon), dtype=np.float32)
+    if len(days):
+        offset = days['date'].map({d: i for i, d in enumerate(dates)}).to_numpy() * SLOTS_PER_DAY
+        cols = offset[:, None] + np.arange(SLOTS_PER_DAY)
+        coverage[np.arange(len(days))[:, None], cols] = day_coverage
+
+    daily_errors, interval_errors = forecast_errors()
+    return {
+        'dates': [d.isoformat() for d in dates],
+        'queue_ids': [int(q) for q in queue_ids],
+        'calls': calls,
+        'seat_aht': seat_aht,
+        'target_seconds': targets['sla_target_seconds'].to_numpy(dtype=float)[:, None],
+        'target_percent': targets['sla_target_percent'].to_numpy(dtype=float),
+        'patience': targets['patience'].to_numpy(dtype=float)[:, None],
+        'coverage': coverage,
+        'absence_rate': default_absence_rate() if absence_rate is None else absence_rate,
+        # Too little history: fall back to a plain lognormal day-level error
+        'daily_errors': daily_errors if len(daily_errors) >= MIN_ERROR_DAYS else None,
+        'interval_errors': interval_errors if len(daily_errors) >= MIN_ERROR_DAYS else None,
+    }
+
+
+def sample_service_levels(inputs, samples, seed=None):
+    """
+    Draws `samples` scenarios in batches and returns
+    (interval service level (samples, horizon), horizon service level (samples,)).
+    Intervals without traffic are NaN.
+    """
+    from calls import staffing
+    from shifts.coverage import split_by_traffic
+
+    rng = np.random.default_rng(seed)
+    calls, seat_aht = inputs['calls'], inputs['seat_aht']
+    n_queues, horizon = calls.shape
+    n_days = horizon // SLOTS_PER_DAY
+    interval_sl = np.full((samples, horizon), np.nan, dtype=np.float32)
+    period_sl = np.full(samples, np.nan)
+
+    for lo in range(0, samples, BATCH_SIZE):
+        b = min(BATCH_SIZE, samples - lo)
+        if inputs['daily_errors'] is not None:
+            daily = rng.choice(inputs['daily_errors'], size=(b, n_queues, n_days))
+            noise = rng.choice(inputs['interval_errors'], size=(b, n_queues, horizon))
+        else:
+            daily = rng.normal(0.0, DEFAULT_ERROR_SIGMA, size=(b, n_queues, n_days))
+            noise = 0.0
+        sampled_calls = calls * np.exp(np.repeat(daily, SLOTS_PER_DAY, axis=2) + noise)
+
+        present = (rng.random((b, inputs['coverage'].shape[0])) >= inputs['absence_rate']).astype(np.float32)
+        staffed = present @ inputs['coverage']
+
+        traffic = sampled_calls * seat_aht / INTERVAL_SECONDS
+        agents = split_by_traffic(staffed[:, None, :], traffic, axis=1)
+        sl = staffing.erlang_a_metrics(
+            traffic, agents, seat_aht, inputs['patience'], inputs['target_seconds'])['service_level']
+
+        answered = (sampled_calls * sl).sum(axis=1)
+        offered = sampled_calls.sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            interval_sl[lo:lo + b] = np.where(offered > 0, answered / offered, np.nan)
+            period_sl[lo:lo + b] = answered.sum(axis=1) / offered.sum(axis=1)
+    return interval_sl, period_sl
+
+
+def _sample_args(args):
+    return sample_service_levels(*args)
+
+
+def run_risk_analysis(start_date, end_date, samples=DEFAULT_SAMPLES, workers=None, seed=None,
+                      published_only=True, absence_rate=None):
+    """
+    Service-level risk bands for the schedule in the range. Returns per
+    interval (days, 96) arrays p10 / p50 / p90, target and hit_probability,
+    and the same bands for the whole horizon under 'period'.
+    """
+    inputs = build_risk_inputs(start_date, end_date, published_only=published_only, absence_rate=absence_rate)
+    workers = workers or min(os.cpu_count() or 1, max(samples // BATCH_SIZE, 1))
+    chunks = [len(c) for c in np.array_split(np.arange(samples), workers) if len(c)]
+    jobs = [(inputs, n, s) for n, s in zip(chunks, np.random.SeedSequence(seed).spawn(len(chunks)))]
+
+    if len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=len(jobs)) as pool:
+            results = list(pool.map(_sample_args, jobs))
+    else:
+        results = [_sample_args(job) for job in jobs]
+    interval_sl = np.concatenate([r[0] for r in results])
+    period_sl = np.concatenate([r[1] for r in results])
+
+    # Target per interval: call-weighted across the queues that have traffic
+    calls = inputs['calls']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        target = (calls * inputs['target_percent'][:, None]).sum(axis=0) / calls.sum(axis=0)
+        period_target = float((calls.sum(axis=1) * inputs['target_percent']).sum() / calls.sum())
+
+    with warnings.catch_warnings():
+        # Intervals without traffic are all-NaN across samples
+        warnings.simplefilter('ignore', RuntimeWarning)
+        p10, p50, p90 = np.nanpercentile(interval_sl, [10, 50, 90], axis=0)
+        hit = np.where(np.isnan(target), np.nan, (interval_sl >= target - 1e-9).mean(axis=0))
+        period = np.nanpercentile(period_sl, [10, 50, 90])
+
+    n_days = len(inputs['dates'])
+    shape = (n_days, SLOTS_PER_DAY)
+    return {
+        'dates': inputs['dates'],
+        'samples': samples,
+        'absence_rate': inputs['absence_rate'],
+        'empirical_errors': inputs['daily_errors'] is not None,
+        'p10': p10.reshape(shape),
+        'p50': p50.reshape(shape),
+        'p90': p90.reshape(shape),
+        'target': target.reshape(shape),
+        'hit_probability': hit.reshape(shape),
+        'period': {
+            'p10': period[0], 'p50': period[1], 'p90': period[2],
+            'target': period_target,
+            'hit_probability': float((period_sl >= period_target - 1e-9).mean()),
+        },
+    }
@@ -0,0 +1,151 @@
+"""
+Requirement-matrix scheduling engine.
+
+The gross headcount to roster is one (days, 96) matrix of 15-min slots.
+Every ShiftType is turned once into its start options - a start every 15
+minutes from start_time_min to start_time_max - and a coverage vector per
+option: the fraction of each slot the agent is on the phone, with the
+type's template breaks / lunch (or the standard ones) taken off, cut at
+midnight as in shifts.coverage.
+
+Agents are then placed greedily, day by day, least-worked first. An
+agent's options are scored against the remaining deficit of the day in
+one array step (the unmet need each option would cover); options that
+break the rest rule are masked out, and the best option is taken when it
+covers anything. Each agent is offered at most one shift a day; worked
+hours (for the weekly cap) and the end of the last shift are per-agent
+arrays.
+
+Nothing here touches the database; shifts.utils.generate_schedule reads
+the inputs and writes the result.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+from .coverage import DAY_MINUTES, SLOT_MINUTES, SLOTS_PER_DAY
+
+MAX_WEEKLY_HOURS = 45
+MIN_REST_HOURS = 11
+# On-phone time beyond the need counts against an option at this rate, so a
+# shift is only added where enough of it covers missing agents
+OVERSTAFF_WEIGHT = 0.5
+# Unpaid part of a shift when counting worked hours
+UNPAID_HOURS = 1
+# Standard day when the shift type has no template: (activity, start offset, end offset) in minutes
+DEFAULT_ACTIVITIES = (('WORK', 0, 180), ('LUNCH', 180, 240), ('WORK', 240, 360), ('BREAK', 360, 375))
+
+
+def activity_offsets(templates, duration_minutes):
+    """
+    (activity_type, start, end) minute offsets from shift start for a shift
+    of the given length: the template activities (activity_type,
+    start_offset_minutes, duration_minutes) with WORK in between, or the
+    standard day when there are none.
+    """
+    if templates:
+        blocks = [(kind, offset, offset + length) for kind, offset, length in sorted(templates, key=lambda t: t[1])]
+    else:
+        blocks = list(DEFAULT_ACTIVITIES)
+    spans, cursor = [], 0
+    for kind, start, end in blocks:
+        start, end = min(start, duration_minutes), min(end, duration_minutes)
+        if start > cursor:
+            spans.append(('WORK', cursor, start))
+        if end > start:
+            spans.append((kind, start, end))
+        cursor = max(cursor, end)
+    if duration_minutes > cursor:
+        spans.append(('WORK', cursor, duration_minutes))
+    return spans
+
+
+@dataclass
+class ShiftOptions:
+    """Start options of one ShiftType and their coverage vectors."""
+    starts: np.ndarray       # start minute of each option
+    coverage: np.ndarray     # (options, 96) on-phone fraction per slot
+    duration_minutes: int
+    paid_hours: float
+    on_phone: np.ndarray     # slots on the phone per option (coverage row sums)
+    activities: list         # activity_offsets() of the type
+
+
+def start_minutes(start_min, start_max):
+    """Candidate start minutes (15-min steps, both ends included). A window
+    that wraps past midnight runs to the last slot of the day."""
+    first = start_min.hour * 60 + start_min.minute
+    last = start_max.hour * 60 + start_max.minute
+    if last < first:
+        last = DAY_MINUTES - SLOT_MINUTES
+    first = -(-first // SLOT_MINUTES) * SLOT_MINUTES
+    return np.arange(first, max(last, first) + 1, SLOT_MINUTES)
+
+
+def shift_options(start_min, start_max, duration_hours, templates=()):
+    """ShiftOptions for a shift type's start window, length and template activities."""
+    duration = int(round(duration_hours * 60))
+    activities = activity_offsets(list(templates), duration)
+    starts = start_minutes(start_min, start_max)
+
+    on_phone = np.zeros(duration, dtype=bool)
+    for kind, start, end in activities:
+        if kind == 'WORK':
+            on_phone[start:end] = True
+    minutes = np.zeros((len(starts), DAY_MINUTES + duration))
+    minutes[:, :duration] = on_phone
+    # Row i shifted right by starts[i]; minutes past midnight fall off
+    rows = np.arange(len(starts))[:, None]
+    cols = (np.arange(DAY_MINUTES)[None, :] - starts[:, None]) % minutes.shape[1]
+    day = minutes[rows, cols]
+    coverage = day.reshape(len(starts), SLOTS_PER_DAY, SLOT_MINUTES).mean(axis=2)
+    return ShiftOptions(starts, coverage, duration, max(0.0, duration_hours - UNPAID_HOURS), coverage.sum(axis=1),
+                        activities)
+
+
+def assign_shifts(required, weekdays, agent_options, options, max_weekly_hours=MAX_WEEKLY_HOURS,
+                  min_rest_hours=MIN_REST_HOURS, overstaff_weight=OVERSTAFF_WEIGHT):
+    """
+    Greedy roster over a (days, 96) gross requirement matrix.
+
+    weekdays gives the weekday of every day (weekly hours restart on
+    Monday), agent_options the index into `options` (ShiftOptions) of each
+    agent. Returns (assignments, coverage): (agent, day, option) index
+    triples and the resulting (days, 96) on-phone coverage.
+    """
+    required = np.asarray(required, dtype=float)
+    agent_options = np.asarray(agent_options, dtype=int)
+    n_agents = len(agent_options)
+    days = required.shape[0]
+    coverage = np.zeros_like(required)
+    hours = np.zeros(n_agents)
+    # Absolute minute (from the first day) each agent's last shift ended
+    last_end = np.full(n_agents, -np.inf)
+    min_rest = min_rest_hours * 60
+    assignments = []
+
+    for d in range(days):
+        if d and weekdays[d] == 0:
+            hours[:] = 0
+        deficit = required[d] - coverage[d]
+        if not (deficit > 0).any():
+            continue
+        day_start = d * DAY_MINUTES
+        for agent in np.argsort(hours, kind='stable'):
+            opt = options[agent_options[agent]]
+            if hours[agent] + opt.paid_hours > max_weekly_hours:
+                continue
+            covered = np.minimum(opt.coverage, np.clip(deficit, 0, None)).sum(axis=1)
+            gain = covered - overstaff_weight * (opt.on_phone - covered)
+            gain[day_start + opt.starts - last_end[agent] < min_rest] = -1
+            best = int(np.argmax(gain))
+            if gain[best] <= 0:
+                continue
+            assignments.append((int(agent), d, best))
+            deficit -= opt.coverage[best]
+            hours[agent] += opt.paid_hours
+            last_end[agent] = day_start + opt.starts[best] + opt.duration_minutes
+            if not (deficit > 0).any():
+                break
+        coverage[d] = required[d] - deficit
+    return assignments, coverage
@@ -0,0 +1,12 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Shift, ShiftActivity
+from .projection import bump_schedule_version_on_commit
+
+
+@receiver([post_save, post_delete], sender=Shift)
+@receiver([post_save, post_delete], sender=ShiftActivity)
+def schedule_changed(sender, **kwargs):
+    # Cached SLA projections are computed from shift coverage
+    bump_schedule_version_on_commit()
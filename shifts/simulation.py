@@ -0,0 +1,349 @@
+"""
+Discrete-event contact-center simulator.
+
+Replays one forecast day against a candidate schedule with skill-based
+routing, which no closed-form Erlang formula captures once queues share
+agents through AgentSkill / Queue.required_skill.
+
+The engine works on a plain, picklable scenario dict (see build_scenario) so
+independent replications can be fanned out over a process pool.
+"""
+import heapq
+import os
+import warnings
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+INTERVAL_SECONDS = 900
+SLOTS_PER_DAY = 96
+DAY_SECONDS = INTERVAL_SECONDS * SLOTS_PER_DAY
+
+# Event types
+_END_SERVICE = 0
+_AGENT_ON = 1
+_AGENT_OFF = 2
+_ABANDON = 3
+
+# Key used for queues without a required skill: every agent can serve them
+ANY_SKILL = None
+
+
+def _seconds(t):
+    return t.hour * 3600 + t.minute * 60 + t.second
+
+
+def build_scenario(day, published_only=False):
+    """
+    Loads the simulation input for `day` from the current tenant schema:
+    forecast CallVolume (actuals if no forecast exists), the day's Shift /
+    ShiftActivity rows as agent work periods, and AgentSkill levels.
+    """
+    from calls.models import CallVolume, Queue
+    from agents.models import AgentSkill
+    from shifts.models import Shift, ShiftActivity
+
+    # Email is deferred work with no live queue to replay
+    queues = list(Queue.objects.exclude(channel='email').order_by('id'))
+    q_index = {q.id: i for i, q in enumerate(queues)}
+    concurrency = {q.id: max(q.concurrency, 1) for q in queues}
+
+    vols = CallVolume.objects.filter(date=day, is_forecast=True)
+    if not vols.exists():
+        vols = CallVolume.objects.filter(date=day, is_forecast=False)
+
+    calls = np.zeros((len(queues), SLOTS_PER_DAY))
+    aht = np.full((len(queues), SLOTS_PER_DAY), 180.0)
+    for queue_id, interval_start, offered, aht_seconds in vols.values_list(
+            'queue_id', 'interval_start', 'calls_offered', 'aht_seconds'):
+        slot = _seconds(interval_start) // INTERVAL_SECONDS
+        if queue_id not in q_index:
+            continue
+        calls[q_index[queue_id], slot] += offered
+        # A chat agent's concurrent sessions are replayed as one faster seat
+        aht[q_index[queue_id], slot] = (aht_seconds or 180) / concurrency[queue_id]
+
+    shifts = Shift.objects.filter(date=day)
+    if published_only:
+        shifts = shifts.filter(is_published=True)
+    shifts = list(shifts)
+
+    work_periods = {}
+    activities = ShiftActivity.objects.filter(shift__in=shifts, activity_type='WORK')
+    for shift_id, agent_id, start, end in activities.values_list('shift_id', 'shift__agent_id', 'start_time', 'end_time'):
+        work_periods.setdefault(agent_id, []).append((_seconds(start), _seconds(end) or DAY_SECONDS))
+    for s in shifts:
+        if s.agent_id in work_periods:
+            continue
+        # No activities yet: whole shift minus its break
+        start, end = _seconds(s.start_time), _seconds(s.end_time) or DAY_SECONDS
+        if s.break_start:
+            b_start = _seconds(s.break_start)
+            b_end = b_start + s.break_duration * 60
+            work_periods[s.agent_id] = [(start, b_start), (b_end, end)]
+        else:
+            work_periods[s.agent_id] = [(start, end)]
+
+    skills = {}
+    for agent_id, skill_id, level in AgentSkill.objects.filter(agent_id__in=work_periods.keys()).values_list(
+            'agent_id', 'skill_id', 'level'):
+        skills.setdefault(agent_id, {})[skill_id] = level
+
+    return {
+        'date': day.isoformat(),
+        'queues': [{
+            'id': q.id,
+            'name': q.name,
+            'skill': q.required_skill_id,
+            'target_seconds': q.sla_target_seconds,
+            # Only Erlang A queues are configured with a meaningful patience
+            'patience': q.avg_patience_seconds if q.staffing_model == 'erlang_a' else None,
+        } for q in queues],
+        'calls': calls,
+        'aht': aht,
+        'agents': [{
+            'id': agent_id,
+            'skills': skills.get(agent_id, {}),
+            'periods': sorted((s, e) for s, e in periods if e > s),
+        } for agent_id, periods in work_periods.items()],
+    }
+
+
+def _add_span(acc, start, end):
+    """Adds the seconds of [start, end) to the per-slot accumulator."""
+    end = min(end, DAY_SECONDS)
+    while start < end:
+        slot = int(start // INTERVAL_SECONDS)
+        slot_end = (slot + 1) * INTERVAL_SECONDS
+        acc[slot] += min(end, slot_end) - start
+        start = slot_end
+
+
+class _Call:
+    __slots__ = ('queue', 'slot', 'arrival', 'service', 'done')
+
+    def __init__(self, queue, slot, arrival, service):
+        self.queue = queue
+        self.slot = slot
+        self.arrival = arrival
+        self.service = service
+        self.done = False
+
+
+def simulate_day(scenario, seed=None):
+    """
+    One replication. Returns per (queue, slot) offered / answered /
+    answered-within-target / abandoned / wait-seconds counts plus per-slot
+    busy and available agent-seconds.
+    """
+    rng = np.random.default_rng(seed)
+    queues = scenario['queues']
+    agents = scenario['agents']
+    n_q = len(queues)
+
+    # --- Arrivals, generated in bulk and consumed in time order
+    counts = rng.poisson(np.asarray(scenario['calls'], dtype=float))
+    q_idx, slot_idx = np.nonzero(counts)
+    reps = counts[q_idx, slot_idx]
+    arr_queue = np.repeat(q_idx, reps)
+    arr_slot = np.repeat(slot_idx, reps)
+    arr_time = arr_slot * INTERVAL_SECONDS + rng.random(arr_queue.size) * INTERVAL_SECONDS
+    arr_service = rng.exponential(np.asarray(scenario['aht'], dtype=float)[arr_queue, arr_slot])
+    patience = np.array([q['patience'] or np.inf for q in queues], dtype=float)
+    arr_patience = rng.exponential(1.0, arr_queue.size) * patience[arr_queue]
+    order = np.argsort(arr_time, kind='stable')
+    arrivals = list(zip(arr_time[order].tolist(), arr_queue[order].tolist(), arr_slot[order].tolist(),
+                        arr_service[order].tolist(), arr_patience[order].tolist()))
+
+    # --- Routing tables
+    # queue -> skill key; skill key -> queues requiring it
+    q_skill = [q['skill'] for q in queues]
+    target = [q['target_seconds'] for q in queues]
+    # agent -> [(level, [queue indexes])] best level first
+    agent_routes = []
+    for a in agents:
+        by_level = {}
+        for qi, skill in enumerate(q_skill):
+            if skill is ANY_SKILL:
+                level = 0
+            elif skill in a['skills']:
+                level = a['skills'][skill]
+            else:
+                continue
+            by_level.setdefault(level, []).append(qi)
+        agent_routes.append(sorted(by_level.items(), key=lambda x: -x[0]))
+
+    # skill key -> heap of idle agents (-level, idle_since, agent, version)
+    idle = {}
+    version = [0] * len(agents)
+    on_shift = [False] * len(agents)
+    busy = [False] * len(agents)
+
+    def make_idle(ai, now):
+        version[ai] += 1
+        for skill, level in agents[ai]['skills'].items():
+            heapq.heappush(idle.setdefault(skill, []), (-level, now, ai, version[ai]))
+        heapq.heappush(idle.setdefault(ANY_SKILL, []), (0, now, ai, version[ai]))
+
+    def pop_idle(skill):
+        heap = idle.get(skill)
+        while heap:
+            _, _, ai, ver = heapq.heappop(heap)
+            if ver == version[ai] and on_shift[ai] and not busy[ai]:
+                return ai
+        return None
+
+    # --- Stats
+    offered = np.zeros((n_q, SLOTS_PER_DAY), dtype=int)
+    answered = np.zeros((n_q, SLOTS_PER_DAY), dtype=int)
+    within = np.zeros((n_q, SLOTS_PER_DAY), dtype=int)
+    abandoned = np.zeros((n_q, SLOTS_PER_DAY), dtype=int)
+    wait_sum = np.zeros((n_q, SLOTS_PER_DAY))
+    busy_seconds = np.zeros(SLOTS_PER_DAY)
+    available_seconds = np.zeros(SLOTS_PER_DAY)
+
+    events = []
+    seq = 0
+    for ai, a in enumerate(agents):
+        for start, end in a['periods']:
+            _add_span(available_seconds, start, end)
+            events.append((start, seq, _AGENT_ON, ai))
+            events.append((end, seq + 1, _AGENT_OFF, ai))
+            seq += 2
+    heapq.heapify(events)
+
+    waiting = [deque() for _ in range(n_q)]
+
+    def start_service(ai, call, now):
+        call.done = True
+        busy[ai] = True
+        version[ai] += 1
+        wait = now - call.arrival
+        answered[call.queue, call.slot] += 1
+        wait_sum[call.queue, call.slot] += wait
+        if wait <= target[call.queue]:
+            within[call.queue, call.slot] += 1
+        _add_span(busy_seconds, now, now + call.service)
+        nonlocal seq
+        seq += 1
+        heapq.heappush(events, (now + call.service, seq, _END_SERVICE, ai))
+
+    def next_call_for(ai):
+        for _, queue_ids in agent_routes[ai]:
+            best = None
+            for qi in queue_ids:
+                dq = waiting[qi]
+                while dq and dq[0].done:
+                    dq.popleft()
+                if dq and (best is None or dq[0].arrival < waiting[best][0].arrival):
+                    best = qi
+            if best is not None:
+                return waiting[best].popleft()
+        return None
+
+    def agent_free(ai, now):
+        busy[ai] = False
+        if not on_shift[ai]:
+            return
+        call = next_call_for(ai)
+        if call is not None:
+            start_service(ai, call, now)
+        else:
+            make_idle(ai, now)
+
+    ptr = 0
+    n_arr = len(arrivals)
+    while ptr < n_arr or events:
+        if ptr < n_arr and (not events or arrivals[ptr][0] <= events[0][0]):
+            now, qi, slot, service, pat = arrivals[ptr]
+            ptr += 1
+            offered[qi, slot] += 1
+            call = _Call(qi, slot, now, service)
+            ai = pop_idle(q_skill[qi])
+            if ai is not None:
+                start_service(ai, call, now)
+            else:
+                waiting[qi].append(call)
+                if pat != np.inf:
+                    seq += 1
+                    heapq.heappush(events, (now + pat, seq, _ABANDON, call))
+            continue
+
+        now, _, kind, obj = heapq.heappop(events)
+        if kind == _END_SERVICE:
+            agent_free(obj, now)
+        elif kind == _AGENT_ON:
+            on_shift[obj] = True
+            if not busy[obj]:
+                agent_free(obj, now)
+        elif kind == _AGENT_OFF:
+            on_shift[obj] = False
+            version[obj] += 1
+        elif kind == _ABANDON and not obj.done:
+            obj.done = True
+            abandoned[obj.queue, obj.slot] += 1
+
+    # Calls still waiting at end of day count as abandoned
+    for dq in waiting:
+        for call in dq:
+            if not call.done:
+                abandoned[call.queue, call.slot] += 1
+
+    return {
+        'offered': offered,
+        'answered': answered,
+        'within_target': within,
+        'abandoned': abandoned,
+        'wait_seconds': wait_sum,
+        'busy_seconds': busy_seconds,
+        'available_seconds': available_seconds,
+    }
+
+
+def _simulate_args(args):
+    return simulate_day(*args)
+
+
+def run_replications(scenario, replications=30, workers=None, seed=None):
+    """
+    Runs independent replications in a process pool and returns the
+    per-interval mean report:
+    service_level / abandon_rate / asa per (queue, slot), occupancy per slot,
+    plus service_level P10/P90 across replications.
+    """
+    seeds = np.random.SeedSequence(seed).spawn(replications)
+    workers = workers or min(replications, os.cpu_count() or 1)
+    jobs = [(scenario, s) for s in seeds]
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_simulate_args, jobs))
+    else:
+        results = [_simulate_args(job) for job in jobs]
+
+    stacked = {k: np.stack([r[k] for r in results]) for k in results[0]}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sl_runs = np.where(stacked['offered'] > 0, stacked['within_target'] / stacked['offered'], np.nan)
+        offered = stacked['offered'].sum(axis=0)
+        answered = stacked['answered'].sum(axis=0)
+        report = {
+            'offered': offered / replications,
+            'abandoned': stacked['abandoned'].sum(axis=0) / replications,
+            'service_level': np.where(offered > 0, stacked['within_target'].sum(axis=0) / offered, np.nan),
+            'abandon_rate': np.where(offered > 0, stacked['abandoned'].sum(axis=0) / offered, np.nan),
+            'asa': np.where(answered > 0, stacked['wait_seconds'].sum(axis=0) / answered, np.nan),
+            'occupancy': np.where(
+                stacked['available_seconds'].sum(axis=0) > 0,
+                stacked['busy_seconds'].sum(axis=0) / stacked['available_seconds'].sum(axis=0),
+                np.nan,
+            ),
+        }
+    with warnings.catch_warnings():
+        # Intervals without traffic are all-NaN across replications
+        warnings.simplefilter('ignore', RuntimeWarning)
+        report['service_level_p10'] = np.nanpercentile(sl_runs, 10, axis=0)
+        report['service_level_p90'] = np.nanpercentile(sl_runs, 90, axis=0)
+    report['queues'] = scenario['queues']
+    report['replications'] = replications
+    return report
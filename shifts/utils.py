@@ -1,48 +1,47 @@
 import pandas as pd
 import numpy as np
-from datetime import timedelta, datetime, time
-from calls.models import CallVolume, Queue
-from calls.utils import calculate_required_agents
-from shifts.models import Shift
-from agents.models import AgentProfile
+from datetime import time
+from calls.requirements import refresh_staffing_requirements, load_requirements, combine_requirements, POOLING_SUM
+from calls.shrinkage import apply_shrinkage
+from shifts.models import Shift, ShiftActivity
+from shifts.projection import bump_schedule_version_on_commit
+from shifts.scheduler import assign_shifts, shift_options, SLOTS_PER_DAY, DAY_MINUTES
+from agents.models import AgentProfile, ShiftType, ShiftTemplateActivity
 from django.db import transaction
 
-def generate_schedule(ignored_tenant, start_date, end_date):
+WRITE_BATCH_SIZE = 2000
+
+def generate_schedule(ignored_tenant, start_date, end_date, staffing_model=None, pooling=POOLING_SUM):
     """
     Generates a schedule for the given range respecting Shift Types.
+    staffing_model forces 'erlang_c' or 'erlang_a' for every queue;
+    None uses each queue's own Queue.staffing_model.
+    pooling decides how queues of the same skill group are combined:
+    'sum' adds per-queue needs, 'pooled' sizes the group as one Erlang queue.
+    The roster itself is built by shifts.scheduler on a (day x 15-min slot)
+    requirement matrix.
     """
     dates = pd.date_range(start_date, end_date)
-    requirements = {} # (date, hour) -> required_agents
-    
-    queues = Queue.objects.all()
-    
-    # Pre-fetch ShiftTypes to minimize DB hits later? Not critical for small N.
-    
-    for d in dates:
-        d_date = d.date()
-        for h in range(24):
-            # Fetch Volumes (Forecast or Actual)
-            # Try to match hour exactly. 
-            # Note: interval_start is TimeField.
-            calls_list = CallVolume.objects.filter(date=d_date, interval_start__hour=h)
-            
-            agg_vol = sum([v.calls_offered for v in calls_list])
-            if agg_vol > 0:
-                # Weighted AHT
-                total_product = sum([v.calls_offered * v.aht_seconds for v in calls_list])
-                avg_aht = total_product / agg_vol
-                req = calculate_required_agents(agg_vol, 3600, avg_aht, 20, 0.8)
-                requirements[(d_date, h)] = req
-            else:
-                requirements[(d_date, h)] = 0
+    day_index = {d: i for i, d in enumerate(dates.date)}
+
+    # Requirements are persisted per queue and 15-min interval. Refreshing only
+    # recomputes intervals whose volume changed, then we read them back.
+    refresh_staffing_requirements(start_date, end_date)
+    reqs = load_requirements(start_date, end_date)
 
-    # 2. Get Agents
-    # Determine shift capabilities
-    # If agent has no shift type, assign a default "Standard 09-18"
-    
-    agents = list(AgentProfile.objects.filter(user__is_active=True))
-    from agents.models import ShiftType
-    
+    required = np.zeros((len(dates), SLOTS_PER_DAY))
+    if not reqs.empty:
+        # Net seats -> gross headcount. Template breaks are left out because
+        # the coverage vectors already take agents off during their break.
+        reqs = apply_shrinkage(reqs, include_breaks=False)
+        # Need per slot, summed over skill groups
+        groups = combine_requirements(reqs, pooling=pooling, staffing_model=staffing_model)
+        per_slot = groups.groupby(['date', 'slot'])['gross_agents'].sum().reset_index()
+        np.add.at(required, (per_slot['date'].map(day_index).to_numpy(), per_slot['slot'].to_numpy(dtype=int)),
+                  per_slot['gross_agents'].to_numpy(dtype=float))
+
+    # Agents without a shift type work the default "Standard 09-18"
+    agents = list(AgentProfile.objects.filter(user__is_active=True).order_by('id').values_list('id', 'shift_type_id'))
     default_st, _ = ShiftType.objects.get_or_create(
         name="Standard 09-18",
         defaults={
@@ -51,107 +50,62 @@ def generate_schedule(ignored_tenant, start_date, end_date):
             'duration_hours': 9.0
         }
     )
-    
-    agent_states = {a.id: {'hours_week': 0, 'last_shift_end': None} for a in agents}
-    
+
+    # Start options and coverage vectors, once per shift type
+    templates = {}
+    for st_id, kind, offset, length in ShiftTemplateActivity.objects.values_list(
+            'shift_type_id', 'activity_type', 'start_offset_minutes', 'duration_minutes'):
+        templates.setdefault(st_id, []).append((kind, offset, length))
+    type_ids = sorted({st_id or default_st.id for _, st_id in agents})
+    types = ShiftType.objects.in_bulk(type_ids)
+    options = [
+        shift_options(types[t].start_time_min, types[t].start_time_max, types[t].duration_hours, templates.get(t, ()))
+        for t in type_ids
+    ]
+    option_of = {t: i for i, t in enumerate(type_ids)}
+    agent_options = [option_of[st_id or default_st.id] for _, st_id in agents]
+
+    assignments, _ = assign_shifts(required, dates.weekday.to_numpy(), agent_options, options)
+
     shifts_to_create = []
+    for agent, d, choice in assignments:
+        opt = options[agent_options[agent]]
+        start = int(opt.starts[choice])
+        # Shifts are cut at the end of their day
+        end = min(start + opt.duration_minutes, DAY_MINUTES - 1)
+        breaks = [(a, b) for kind, a, b in opt.activities if kind != 'WORK' and start + a < end]
+        shift = Shift(
+            agent_id=agents[agent][0],
+            shift_type_id=type_ids[agent_options[agent]],
+            date=dates[d].date(),
+            start_time=time(start // 60, start % 60),
+            end_time=time(end // 60, end % 60),
+        )
+        if breaks:
+            b_start = start + breaks[0][0]
+            shift.break_start = time(b_start // 60, b_start % 60)
+            shift.break_duration = breaks[0][1] - breaks[0][0]
+        shifts_to_create.append(shift)
 
-    for d in dates:
-        d_date = d.date()
-        daily_req = {h: requirements[(d_date, h)] for h in range(24)}
-        coverage = {h: 0 for h in range(24)}
-        
-        # Sort agents by "least hours worked" to balance?
-        agents.sort(key=lambda a: agent_states[a.id]['hours_week'])
-        
-        # Iterate Agents to assign ONE shift per day max
-        for agent in agents:
-            # Check weekly limit
-            if agent_states[agent.id]['hours_week'] >= 45:
-                continue
-                
-            # Rest check (11 hours)
-            if agent_states[agent.id]['last_shift_end']:
-                last_end = agent_states[agent.id]['last_shift_end']
-                # Assume earliest possible start is ... 00:00?
-                # We check this inside the candidate start time loop
-                pass
-            
-            st = agent.shift_type if agent.shift_type else default_st
-            
-            # Determine feasible start times
-            # start_time_min to start_time_max
-            # For simplicity, step by hour
-            
-            s_min = st.start_time_min.hour
-            s_max = st.start_time_max.hour
-            
-            # Handling overnight shifts? Simplified: assume same day start.
-            if s_max < s_min: s_max = 23 # End of day wrap? Ignore for now
-            
-            feasible_starts = range(s_min, s_max + 1)
-            
-            best_start = -1
-            max_impact = -1
-            
-            # Find best start time to cover deficits
-            for s_hour in feasible_starts:
-                # Rest Check
-                potential_start_dt = datetime.combine(d_date, time(s_hour, 0))
-                if agent_states[agent.id]['last_shift_end']:
-                    diff = (potential_start_dt - agent_states[agent.id]['last_shift_end']).total_seconds()
-                    if diff < 11 * 3600:
-                        continue
-                
-                # Check impact
-                impact = 0
-                shift_len = int(st.duration_hours)
-                break_offset = int(shift_len / 2) # Break in middle
-                
-                # Check coverage vs requirement
-                for i in range(shift_len):
-                    h = s_hour + i
-                    if h >= 24: break # Next day logic skipped for simplicity
-                    
-                    if i == break_offset: continue # Break
-                    
-                    if coverage.get(h, 0) < daily_req.get(h, 0):
-                        impact += 1
-                
-                if impact > max_impact:
-                    max_impact = impact
-                    best_start = s_hour
-            
-            # Assign if beneficial (impact > 0) OR if we want to force minimum hours?
-            # Greedy: Only assign if needed.
-            if max_impact > 0:
-                shift_len = int(st.duration_hours)
-                break_offset = int(shift_len / 2)
-                
-                shifts_to_create.append(Shift(
-                    agent=agent,
-                    date=d_date,
-                    start_time=time(best_start, 0),
-                    end_time=time(best_start + shift_len if best_start + shift_len < 24 else 23, 59), # Clipped
-                    break_start=time(best_start + break_offset, 0)
-                ))
-                
-                # Update State
-                agent_states[agent.id]['hours_week'] += max(0, st.duration_hours - 1)
-                agent_states[agent.id]['last_shift_end'] = datetime.combine(d_date, time(best_start, 0)) + timedelta(hours=shift_len)
-                
-                # Update Coverage
-                for i in range(shift_len):
-                    h = best_start + i
-                    if h < 24 and i != break_offset:
-                        coverage[h] += 1
-                        
     with transaction.atomic():
+        # Bulk writes send no signals; cached projections are invalidated once committed
+        bump_schedule_version_on_commit()
         Shift.objects.filter(date__range=(start_date, end_date)).delete()
-        created_shifts = Shift.objects.bulk_create(shifts_to_create)
-        
-        # Populate Activities (Breaks, Lunch) for each shift
-        for s in created_shifts:
-            s.populate_activities()
+        created_shifts = Shift.objects.bulk_create(shifts_to_create, batch_size=WRITE_BATCH_SIZE)
+
+        # Activities (work, breaks, lunch) from each shift's type template;
+        # shifts of one type and start share the same activity times
+        spans = {}
+        activities = []
+        for shift, (agent, _, choice) in zip(created_shifts, assignments):
+            key = (agent_options[agent], choice)
+            if key not in spans:
+                spans[key] = [(a.activity_type, a.start_time, a.end_time)
+                              for a in shift.build_activities(templates.get(shift.shift_type_id, ()))]
+            activities.extend(
+                ShiftActivity(shift=shift, activity_type=kind, start_time=start, end_time=end)
+                for kind, start, end in spans[key]
+            )
+        ShiftActivity.objects.bulk_create(activities, batch_size=WRITE_BATCH_SIZE)
 
     return len(shifts_to_create)
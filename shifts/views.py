@@ -20,6 +20,8 @@ from datetime import date, timedelta
 from django.contrib import messages
 from django.http import JsonResponse
 from .rta_utils import get_live_adherence_data
+from .projection import cached_projection, summarize
+from calls.models import Queue
 
 @login_required
 def schedule_view(request):
@@ -123,3 +125,49 @@ def rta_view(request):
         'initial_data': get_live_adherence_data()
     }
     return render(request, 'rta_dashboard.html', context)
+
+@login_required
+def projection_view(request):
+    """
+    Projected SLA / ASA / occupancy of the schedule, one week at a time.
+    """
+    today = date.today()
+    try:
+        start = date.fromisoformat(request.GET.get('start_date', ''))
+    except ValueError:
+        start = today - timedelta(days=today.weekday())
+    end = start + timedelta(days=6)
+    published_only = request.GET.get('published') == '1'
+    queue_id = request.GET.get('queue_id')
+    selected_queue_id = int(queue_id) if queue_id and queue_id.isdigit() else None
+
+    projection = cached_projection(start, end, published_only=published_only)
+    if selected_queue_id:
+        projection = projection[projection['queue_id'] == selected_queue_id]
+
+    daily_rows = []
+    table_rows = []
+    if len(projection):
+        daily_rows = summarize(projection, ['date']).to_dict('records')
+        per_slot = summarize(projection, ['date', 'slot'])
+        for d in daily_rows:
+            cells = [None] * 96
+            day_slots = per_slot[per_slot['date'] == d['date']]
+            for slot, sl, target in zip(day_slots['slot'], day_slots['service_level'], day_slots['sla_target_percent']):
+                if sl == sl:  # skip NaN (no live traffic)
+                    cells[slot] = {'sl': round(sl * 100), 'ok': sl >= target - 1e-9}
+            table_rows.append({'date': d['date'], 'cells': cells})
+
+    context = {
+        'start_date': start,
+        'end_date': end,
+        'prev_week': start - timedelta(days=7),
+        'next_week': start + timedelta(days=7),
+        'published_only': published_only,
+        'queues': Queue.objects.all(),
+        'selected_queue_id': selected_queue_id,
+        'daily_rows': daily_rows,
+        'table_rows': table_rows,
+        'time_headers': [f"{h:02d}:{m:02d}" for h in range(24) for m in (0, 15, 30, 45)],
+    }
+    return render(request, 'projection.html', context)
@@ -59,6 +59,12 @@ CELERY_ACCEPT_CONTENT = ['application/json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'Europe/Istanbul'
+CELERY_BEAT_SCHEDULE = {
+    'intraday-reforecast': {
+        'task': 'calls.tasks.intraday_reforecast_all',
+        'schedule': 15 * 60,
+    },
+}
 
 IYZICO_API_KEY = os.getenv('IYZICO_API_KEY', '')
 IYZICO_SECRET_KEY = os.getenv('IYZICO_SECRET_KEY', '')
@@ -140,6 +146,16 @@ DATABASES = {
         'PORT': os.getenv('DB_PORT', '5432'),
     }
 }
+# Cache shared by all web / worker processes (cached SLA projections and
+# their schedule version). Without CACHE_URL each process keeps its own.
+if os.getenv('CACHE_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('CACHE_URL'),
+        }
+    }
+
 # SECURITY SETTINGS
 # ------------------------------------------------------------------------------
 if not DEBUG:
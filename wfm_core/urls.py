@@ -2,10 +2,12 @@ from django.contrib import admin
 from django.urls import path, include
 from django.contrib.auth.views import LogoutView
 from calls.views import dashboard, forecast_view, heatmap_view, integration_view, live_monitor_view, live_monitor_partial
-from shifts.views import schedule_view, rta_view
+from shifts.views import schedule_view, rta_view, projection_view
+from shifts.api import ProjectionViewSet
 from imports.views import import_data
 from agents.views import (
     agent_list, settings_view, create_team, create_skill, create_queue, create_shift_type, edit_shift_type,
+    create_shrinkage_rule, create_special_day, delete_special_day,
     org_chart_view, update_hierarchy, create_department, agent_detail_view, user_management_view
 )
 from users.views import CustomLoginView, register_view
@@ -18,6 +20,7 @@ from rest_framework.routers import DefaultRouter
 router = DefaultRouter()
 router.register(r'event/push', EventPushViewSet, basename='event-push')
 router.register(r'integrations', IntegrationConfigViewSet, basename='integrations')
+router.register(r'projection', ProjectionViewSet, basename='projection')
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -26,6 +29,9 @@ urlpatterns = [
     path('settings/team/add/', create_team, name='create_team'),
     path('settings/skill/add/', create_skill, name='create_skill'),
     path('settings/queue/add/', create_queue, name='create_queue'),
+    path('settings/shrinkage/add/', create_shrinkage_rule, name='create_shrinkage_rule'),
+    path('settings/special-day/add/', create_special_day, name='create_special_day'),
+    path('settings/special-day/<int:pk>/delete/', delete_special_day, name='delete_special_day'),
     path('settings/shift-type/add/', create_shift_type, name='create_shift_type'),
     path('settings/shift-type/<int:pk>/', edit_shift_type, name='edit_shift_type'),
     path('org-chart/', org_chart_view, name='org_chart'),
@@ -38,6 +44,7 @@ urlpatterns = [
     path('rta/', rta_view, name='rta_view'),
     path('forecast/', forecast_view, name='forecast'),
     path('heatmap/', heatmap_view, name='heatmap'),
+    path('projection/', projection_view, name='projection'),
     path('billing/', include('billing.urls')),
     path('login/', CustomLoginView.as_view(), name='login'),
     path('register/', register_view, name='register'), # New Registration